@@ -6,6 +6,51 @@ load_dotenv()
 
 # Blockchain configuration
 RPC_URL = os.getenv('RPC_URL', 'http://localhost:8545')
+RPC_TIMEOUT_SECONDS = float(os.getenv('RPC_TIMEOUT_SECONDS', '10'))
+# Multicall3 is deployed at the same address on most EVM chains, set empty to read call by call
+MULTICALL3_ADDRESS = os.getenv('MULTICALL3_ADDRESS', '0xcA11bde05977b3631167028862bE2a173976CA11')
+# Calls per aggregate3 eth_call
+MULTICALL_CHUNK_SIZE = int(os.getenv('MULTICALL_CHUNK_SIZE', '500'))
+# Contract reads are cached per block, the poller checks for a new block this often
+BLOCK_POLL_SECONDS = float(os.getenv('BLOCK_POLL_SECONDS', '1'))
+# Reads bypass the cache when the poller has not seen a block for this long
+BLOCK_CACHE_MAX_AGE_SECONDS = float(os.getenv('BLOCK_CACHE_MAX_AGE_SECONDS', '10'))
+
+# Event indexer keeping users, share balances and weights in SQLite
+INDEXER_ENABLED = os.getenv('INDEXER_ENABLED', 'False').lower() in ('true', '1', 't')
+# Contract deployment block, the first block to index
+INDEXER_START_BLOCK = int(os.getenv('INDEXER_START_BLOCK', '0'))
+# Blocks per eth_getLogs request, bounded by the RPC provider's range limit
+INDEXER_CHUNK_BLOCKS = int(os.getenv('INDEXER_CHUNK_BLOCKS', '100'))
+INDEXER_WORKERS = int(os.getenv('INDEXER_WORKERS', '4'))
+INDEXER_CONFIRMATIONS = int(os.getenv('INDEXER_CONFIRMATIONS', '2'))
+# Checkpoint hashes kept to find the fork point after a reorg
+INDEXER_REORG_DEPTH = int(os.getenv('INDEXER_REORG_DEPTH', '64'))
+# Reads fall back to the chain when the index is further behind the head than this
+INDEXER_MAX_LAG_BLOCKS = int(os.getenv('INDEXER_MAX_LAG_BLOCKS', '20'))
+INDEXER_POLL_SECONDS = float(os.getenv('INDEXER_POLL_SECONDS', '5'))
+
+# Weight publishing: chunks of batchUpdateUserWeights sized to a fraction of the block gas limit
+WEIGHT_CHUNK_GAS_FRACTION = float(os.getenv('WEIGHT_CHUNK_GAS_FRACTION', '0.5'))
+WEIGHT_CHUNK_PROBE_SIZE = int(os.getenv('WEIGHT_CHUNK_PROBE_SIZE', '20'))
+WEIGHT_MAX_CHUNK_SIZE = int(os.getenv('WEIGHT_MAX_CHUNK_SIZE', '500'))
+WEIGHT_PUBLISH_RETRIES = int(os.getenv('WEIGHT_PUBLISH_RETRIES', '2'))
+# /api/rewards/apy pages and Cache-Control max-age for the latest and for an explicit epoch
+REWARDS_PAGE_SIZE = int(os.getenv('REWARDS_PAGE_SIZE', '100'))
+REWARDS_MAX_PAGE_SIZE = int(os.getenv('REWARDS_MAX_PAGE_SIZE', '1000'))
+REWARDS_CACHE_SECONDS = int(os.getenv('REWARDS_CACHE_SECONDS', '30'))
+REWARDS_EPOCH_CACHE_SECONDS = int(os.getenv('REWARDS_EPOCH_CACHE_SECONDS', '86400'))
+# Default factor applied to the annualized APY for display (staking is not live on Monad yet)
+REWARDS_DISPLAY_SCALE_FACTOR = int(os.getenv('REWARDS_DISPLAY_SCALE_FACTOR', '10'))
+# Transaction outbox: queued contract calls sent with locally allocated nonces and tracked in the background
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '2'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '20'))
+# Headroom on each transaction's eth_estimateGas result
+OUTBOX_GAS_BUFFER = float(os.getenv('OUTBOX_GAS_BUFFER', '1.2'))
+# A transaction still pending after this long is resent with the same nonce and a higher gas price
+OUTBOX_BUMP_AFTER_SECONDS = float(os.getenv('OUTBOX_BUMP_AFTER_SECONDS', '30'))
+OUTBOX_FEE_BUMP = float(os.getenv('OUTBOX_FEE_BUMP', '1.125'))
+OUTBOX_MAX_BUMPS = int(os.getenv('OUTBOX_MAX_BUMPS', '5'))
 CONTRACT_ADDRESS = os.getenv('CONTRACT_ADDRESS')
 PRIVATE_KEY = os.getenv('PRIVATE_KEY')
 STAKED_MON_ADDRESS = os.getenv('STAKED_MON_ADDRESS')
@@ -13,14 +58,47 @@ SYMBOL = os.getenv('SYMBOL')
 
 # Database configuration
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'database.db')
+DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', '8'))
+DATABASE_BUSY_TIMEOUT_MS = int(os.getenv('DATABASE_BUSY_TIMEOUT_MS', '5000'))
+# 'text' stores epoch/round times as 'YYYY-MM-DD HH:MM:SS', 'integer' as UTC epoch seconds.
+# Switching the value converts existing rows on the next startup.
+TIMESTAMP_STORAGE = os.getenv('TIMESTAMP_STORAGE', 'text').lower()
 
 # Application configuration
 DEBUG = os.getenv('DEBUG', 'True').lower() in ('true', '1', 't')
 HOST = os.getenv('HOST', '0.0.0.0')
 PORT = int(os.getenv('PORT', '5000'))
+# /api/admin/* expose queued transactions, nonces and the leader lease: off unless enabled,
+# and when ADMIN_API_KEY is set only served to requests sending it in the X-Admin-Key header
+ADMIN_ENDPOINTS_ENABLED = os.getenv('ADMIN_ENDPOINTS_ENABLED', 'False').lower() in ('true', '1', 't')
+ADMIN_API_KEY = os.getenv('ADMIN_API_KEY')
 
 # Price API configuration
 PRICE_API_URL = os.getenv('PRICE_API_URL', 'https://api.binance.com/api/v3/ticker/price?symbol=')
+# Comma-separated sources queried in parallel: binance, okx, bybit, or fake:<price> for offline use
+PRICE_SOURCES = os.getenv('PRICE_SOURCES', 'binance')
+# A source that has not answered after this long gets a second, hedged request
+PRICE_HEDGE_AFTER_SECONDS = float(os.getenv('PRICE_HEDGE_AFTER_SECONDS', '0.3'))
+# Answers further than this fraction from the median are dropped
+PRICE_MAX_DEVIATION = float(os.getenv('PRICE_MAX_DEVIATION', '0.01'))
+# Fewer agreeing answers than this fails the fetch; use e.g. binance,okx,bybit with 2 for a quorum
+PRICE_MIN_SOURCES = int(os.getenv('PRICE_MIN_SOURCES', '1'))
+PRICE_API_TIMEOUT_SECONDS = float(os.getenv('PRICE_API_TIMEOUT_SECONDS', '5'))
+# Overall budget for one fetch_price call including retries
+PRICE_FETCH_DEADLINE_SECONDS = float(os.getenv('PRICE_FETCH_DEADLINE_SECONDS', '10'))
+# A live fetch pricing a round boundary gives up this long after the boundary
+PRICE_BOUNDARY_DEADLINE_SECONDS = float(os.getenv('PRICE_BOUNDARY_DEADLINE_SECONDS', '5'))
+PRICE_BREAKER_FAILURES = int(os.getenv('PRICE_BREAKER_FAILURES', '5'))
+PRICE_BREAKER_RESET_SECONDS = float(os.getenv('PRICE_BREAKER_RESET_SECONDS', '30'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+PRICE_POLL_SECONDS = float(os.getenv('PRICE_POLL_SECONDS', '1'))
+PRICE_CACHE_TTL_SECONDS = float(os.getenv('PRICE_CACHE_TTL_SECONDS', '10'))
+PRICE_TICK_BUFFER_SIZE = int(os.getenv('PRICE_TICK_BUFFER_SIZE', '3600'))
+# Maximum distance between a round boundary and the tick used to price it
+PRICE_TICK_TOLERANCE_SECONDS = float(os.getenv('PRICE_TICK_TOLERANCE_SECONDS', '2'))
+PRICE_TICK_FLUSH_SECONDS = float(os.getenv('PRICE_TICK_FLUSH_SECONDS', '5'))
+# Raw ticks and 1s candles are kept this long, 1m candles 60x longer, 10m candles 600x longer
+PRICE_TICK_RETENTION_SECONDS = int(os.getenv('PRICE_TICK_RETENTION_SECONDS', str(24 * 60 * 60)))
 
 # Epoch and round configuration
 EPOCH_DURATION_SECONDS = int(os.getenv('EPOCH_DURATION_SECONDS', '600'))
@@ -29,6 +107,29 @@ EPOCH_CALCULATING_SECONDS = int(os.getenv('EPOCH_CALCULATING_SECONDS', '10'))
 ROUNDS_COUNT = int(os.getenv('ROUNDS_COUNT', '10'))
 ROUND_LOCK_PERCENTAGE = float(os.getenv('ROUND_LOCK_SECONDS', '0.5'))
 ROUND_CALCULATING_SECONDS = int(os.getenv('ROUND_CALCULATING_SECONDS', '10'))
+SCHEDULE_HORIZON_SECONDS = int(os.getenv('SCHEDULE_HORIZON_SECONDS', str(24 * 60 * 60)))
+# Transitions due within this horizon are held in memory; the window is extended every refresh
+LIFECYCLE_HORIZON_SECONDS = int(os.getenv('LIFECYCLE_HORIZON_SECONDS', '900'))
+LIFECYCLE_REFRESH_SECONDS = float(os.getenv('LIFECYCLE_REFRESH_SECONDS', '60'))
+# Missed transitions are replayed at startup, after a failure and every interval, up to the lookback;
+# older ones are marked completed. Replayed rounds are priced from ticks within the tolerance.
+CATCHUP_INTERVAL_SECONDS = float(os.getenv('CATCHUP_INTERVAL_SECONDS', '300'))
+CATCHUP_LOOKBACK_SECONDS = int(os.getenv('CATCHUP_LOOKBACK_SECONDS', str(24 * 60 * 60)))
+CATCHUP_PRICE_TOLERANCE_SECONDS = float(os.getenv('CATCHUP_PRICE_TOLERANCE_SECONDS', '60'))
+# Worker threads per scheduler lane (chain I/O, price I/O, database-only) and queued tasks per lane
+LANE_CHAIN_WORKERS = int(os.getenv('LANE_CHAIN_WORKERS', '3'))
+LANE_PRICE_WORKERS = int(os.getenv('LANE_PRICE_WORKERS', '2'))
+LANE_DB_WORKERS = int(os.getenv('LANE_DB_WORKERS', '1'))
+LANE_MAX_QUEUE = int(os.getenv('LANE_MAX_QUEUE', '100'))
+# Transitions starting later than this after their planned time count as misfires
+SCHEDULER_MISFIRE_SECONDS = float(os.getenv('SCHEDULER_MISFIRE_SECONDS', '1'))
+# How long transition runs are kept in the lifecycle_runs table
+SCHEDULER_RUNS_RETENTION_SECONDS = int(os.getenv('SCHEDULER_RUNS_RETENTION_SECONDS', str(7 * 24 * 60 * 60)))
+# With several API workers on one database, only the holder of the scheduler lease runs the
+# lifecycle, outbox and write jobs. The lease lasts LEADER_LEASE_SECONDS and is renewed every heartbeat.
+LEADER_ELECTION_ENABLED = os.getenv('LEADER_ELECTION_ENABLED', 'True').lower() in ('true', '1', 't')
+LEADER_LEASE_SECONDS = float(os.getenv('LEADER_LEASE_SECONDS', '15'))
+LEADER_HEARTBEAT_SECONDS = float(os.getenv('LEADER_HEARTBEAT_SECONDS', '5'))
 
 proxy_user = os.getenv("PROXY_USER")
 proxy_password = os.getenv("PROXY_PASSWORD")
@@ -18,10 +18,27 @@ def fix_imports():
         ('src/app.py', r'from backend\.config import', 'from config import'),
         ('src/models.py', r'from backend\.config import', 'from config import'),
         ('src/blockchain.py', r'from backend\.config import', 'from config import'),
+        ('src/blockchain.py', r'from backend\.src import', 'from src import'),
         ('src/tasks.py', r'from backend\.src import', 'from src import'),
         ('src/tasks.py', r'from backend\.config import', 'from config import'),
         ('src/routes.py', r'from backend\.src import', 'from src import'),
         ('src/routes.py', r'from backend\.src\.tasks import', 'from src.tasks import'),
+        ('src/routes.py', r'from backend\.config import', 'from config import'),
+        ('src/prices.py', r'from backend\.config import', 'from config import'),
+        ('src/httpclient.py', r'from backend\.src import', 'from src import'),
+        ('src/pricesources.py', r'from backend\.src import', 'from src import'),
+        ('src/pricesources.py', r'from backend\.config import', 'from config import'),
+        ('src/chaincache.py', r'from backend\.config import', 'from config import'),
+        ('src/indexer.py', r'from backend\.src import', 'from src import'),
+        ('src/indexer.py', r'from backend\.config import', 'from config import'),
+        ('src/publisher.py', r'from backend\.src import', 'from src import'),
+        ('src/publisher.py', r'from backend\.config import', 'from config import'),
+        ('src/outbox.py', r'from backend\.src import', 'from src import'),
+        ('src/outbox.py', r'from backend\.config import', 'from config import'),
+        ('src/lifecycle.py', r'from backend\.src import', 'from src import'),
+        ('src/lanes.py', r'from backend\.src import', 'from src import'),
+        ('src/lanes.py', r'from backend\.config import', 'from config import'),
+        ('src/leader.py', r'from backend\.src import', 'from src import'),
     ]
     
     for file_path, pattern, replacement in files:
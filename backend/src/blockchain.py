@@ -1,6 +1,12 @@
 from web3 import Web3
 import json
 import os
+import threading
+import requests
+from backend.src import httpclient
+from backend.src import models
+from backend.src import multicall
+from backend.src import chaincache
 from backend.config import config
 import logging
 
@@ -22,74 +28,135 @@ except FileNotFoundError:
     logger.error("PredictVault_abi.json not found. Make sure the file exists in the project root or /app/abi directory.")
     contract_abi = None
 
+# Process-wide client for config.RPC_URL, rebuilt after a connection error
+_client_lock = threading.Lock()
+_client = None
+
+
+def _build_client():
+    """Create a Web3 client on a pooled keep-alive session"""
+    session = httpclient.create_session(config.HTTP_POOL_SIZE)
+    provider = Web3.HTTPProvider(
+        config.RPC_URL,
+        request_kwargs={'timeout': config.RPC_TIMEOUT_SECONDS},
+        session=session
+    )
+    return {
+        'rpc_url': config.RPC_URL,
+        'session': session,
+        'w3': Web3(provider),
+        'connected': False,
+        'contract_address': None,
+        'contract': None
+    }
+
+
+def _get_client():
+    """Shared client, checking connectivity on first use only"""
+    global _client
+    with _client_lock:
+        if _client is not None and _client['rpc_url'] != config.RPC_URL:
+            _client['session'].close()
+            _client = None
+        if _client is None:
+            _client = _build_client()
+        if not _client['connected']:
+            if not _client['w3'].is_connected():
+                logger.error(f"Failed to connect to RPC URL: {config.RPC_URL}")
+                return None
+            _client['connected'] = True
+        return _client
+
+
+def reset_web3():
+    """Drop the shared client so the next call reconnects"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client['session'].close()
+        _client = None
+
+
+def _handle_rpc_error(e):
+    """Rebuild the client on the next call if e means the connection is broken"""
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        logger.warning(f"RPC connection error, resetting Web3 client: {e}")
+        reset_web3()
+
+
 # Initialize Web3 connection
 def get_web3():
     """Get Web3 connection"""
     try:
-        w3 = Web3(Web3.HTTPProvider(config.RPC_URL))
-        if not w3.is_connected():
-            logger.error(f"Failed to connect to RPC URL: {config.RPC_URL}")
-            return None
-        return w3
+        client = _get_client()
+        return client['w3'] if client else None
     except Exception as e:
         logger.error(f"Error initializing Web3: {e}")
+        _handle_rpc_error(e)
         return None
 
 # Get contract instance
 def get_contract():
     """Get contract instance"""
-    w3 = get_web3()
-    if not w3 or not contract_abi or not config.CONTRACT_ADDRESS:
+    if not contract_abi or not config.CONTRACT_ADDRESS:
         return None
-    
+
     try:
-        contract_address = Web3.to_checksum_address(config.CONTRACT_ADDRESS)
-        contract = w3.eth.contract(address=contract_address, abi=contract_abi)
-        return contract
+        client = _get_client()
+        if not client:
+            return None
+        with _client_lock:
+            # Built once per client and contract address
+            if client['contract'] is None or client['contract_address'] != config.CONTRACT_ADDRESS:
+                contract_address = Web3.to_checksum_address(config.CONTRACT_ADDRESS)
+                client['contract'] = client['w3'].eth.contract(address=contract_address, abi=contract_abi)
+                client['contract_address'] = config.CONTRACT_ADDRESS
+            return client['contract']
     except Exception as e:
         logger.error(f"Error getting contract instance: {e}")
+        _handle_rpc_error(e)
+        return None
+
+# Read a view function through the block cache
+def _read(contract, fn_name, *args):
+    """Call a contract view, cached per block number"""
+    return chaincache.contract_cache.get(
+        fn_name, args, lambda block: getattr(contract.functions, fn_name)(*args).call(block_identifier=block)
+    )
+
+# Track the latest block for the read cache
+def refresh_block():
+    """Poll the latest block number, invalidating cached reads when it moved"""
+    w3 = get_web3()
+    if not w3:
+        return None
+
+    try:
+        block = w3.eth.block_number
+    except Exception as e:
+        logger.error(f"Error getting block number: {e}")
+        _handle_rpc_error(e)
         return None
+    chaincache.contract_cache.set_block(block)
+    return block
 
 # Update user weights
 def update_user_weights(user_addresses, weights):
-    """Update user weights on the contract"""
-    w3 = get_web3()
-    contract = get_contract()
-    
-    if not w3 or not contract or not config.PRIVATE_KEY:
+    """Queue a batchUpdateUserWeights call in the transaction outbox.
+
+    Returns the outbox id, which the outbox job sends and confirms, or None on error.
+    """
+    if not get_contract() or not config.PRIVATE_KEY:
         logger.error("Missing required configuration for blockchain interaction")
-        return False
-    
+        return None
+
     try:
         # Convert addresses to checksum format
         checksum_addresses = [Web3.to_checksum_address(addr) for addr in user_addresses]
-        
-        # Prepare transaction
-        account = w3.eth.account.from_key(config.PRIVATE_KEY)
-        nonce = w3.eth.get_transaction_count(account.address)
-        
-        # Build transaction
-        tx = contract.functions.batchUpdateUserWeights(
-            checksum_addresses, weights
-        ).build_transaction({
-            'from': account.address,
-            'nonce': nonce,
-            'gas': 2000000,
-            'gasPrice': w3.eth.gas_price
-        })
-        
-        # Sign and send transaction
-        signed_tx = w3.eth.account.sign_transaction(tx, config.PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)       
-         
-        # Wait for transaction receipt
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        
-        logger.info(f"Transaction successful: {receipt.transactionHash.hex()}")
-        return True
+        return models.enqueue_transaction('batchUpdateUserWeights', [checksum_addresses, list(weights)], reference='weights')
     except Exception as e:
-        logger.error(f"Error updating user weights: {e}")
-        return False
+        logger.error(f"Error queueing user weights update: {e}")
+        return None
 
 # Get total MON in vault
 def get_total_mon():
@@ -99,9 +166,10 @@ def get_total_mon():
         return 0
     
     try:
-        return contract.functions.totalMON().call()
+        return _read(contract, 'totalMON')
     except Exception as e:
         logger.error(f"Error getting total MON: {e}")
+        _handle_rpc_error(e)
         return 0
 
 # Get total shMON in vault
@@ -112,9 +180,10 @@ def get_total_shmon():
         return 0
     
     try:
-        return contract.functions.totalshMON().call()
+        return _read(contract, 'totalshMON')
     except Exception as e:
         logger.error(f"Error getting total shMON: {e}")
+        _handle_rpc_error(e)
         return 0
     
 
@@ -126,11 +195,12 @@ def get_users():
         return []
     
     try:
-        users = contract.functions.getUsers().call()
+        users = _read(contract, 'getUsers')
         logger.info(f"Fetched {len(users)} active users from smart contract that are eligible to predict")
         return users
     except Exception as e:
         logger.error(f"Error getting users: {e}")
+        _handle_rpc_error(e)
         return []
         
 
@@ -143,9 +213,10 @@ def get_user_balance(address):
     
     try:
         checksum_address = Web3.to_checksum_address(address)
-        return contract.functions.balanceOf(checksum_address).call()
+        return _read(contract, 'balanceOf', checksum_address)
     except Exception as e:
         logger.error(f"Error getting user balance: {e}")
+        _handle_rpc_error(e)
         return 0
 
 # Get user weight
@@ -157,9 +228,10 @@ def get_user_weight(address):
     
     try:
         checksum_address = Web3.to_checksum_address(address)
-        return contract.functions.userWeights(checksum_address).call()
+        return _read(contract, 'userWeights', checksum_address)
     except Exception as e:
         logger.error(f"Error getting user weight: {e}")
+        _handle_rpc_error(e)
         return 0
 
 # Get epoch baseline
@@ -170,9 +242,10 @@ def get_epoch_baseline():
         return 0
     
     try:
-        return contract.functions.epochBaseline().call()
+        return _read(contract, 'epochBaseline')
     except Exception as e:
         logger.error(f"Error getting epoch baseline: {e}")
+        _handle_rpc_error(e)
         return 0
 
 # Get epoch total supply
@@ -183,150 +256,101 @@ def get_epoch_total_supply():
         return 0
     
     try:
-        return contract.functions.epochTotalSupply().call()
+        return _read(contract, 'epochTotalSupply')
     except Exception as e:
         logger.error(f"Error getting epoch total supply: {e}")
+        _handle_rpc_error(e)
         return 0
 
-# Calculate user rewards and APY for an epoch
-def calculate_users_rewards_and_apy(display_scale_factor=10):
+# Read users, balances and weights at one block
+def read_reward_snapshot(block_identifier=None):
     """
-    Calculate all users rewards and APY for a completed epoch
-    
-    Args:
-        display_scale_factor: Scale the display staking rewards (to show significant numbers as staking is not live on Monad yet)
-        
+    Read everything the reward calculation needs at a single block
+
+    Per-user balanceOf and userWeights calls go through Multicall3 in chunks of
+    MULTICALL_CHUNK_SIZE calls. Without MULTICALL3_ADDRESS they are read one by
+    one, still pinned to the same block.
+
     Returns:
-        Dictionary with rewards and APY information for each user
+        Dictionary with block, total_mon, epoch_baseline, epoch_total_supply and
+        users mapping each address to {"balance", "weight"}
     """
-    # Validate display_scale_factor
-    if display_scale_factor <= 0:
-        logger.error(f"Invalid display_scale_factor: {display_scale_factor}. Must be positive.")
-        return {"error": "display_scale_factor must be positive"}
-    
+    w3 = get_web3()
     contract = get_contract()
-    if not contract:
-        logger.error("Contract not available. Check RPC connection and contract address.")
-        return {"error": "Contract not available"}
-    
-    try:
-        # Get epoch data
-        current_total_mon = get_total_mon()
-        epoch_baseline = get_epoch_baseline()
-        epoch_total_supply = get_epoch_total_supply()
-        
-        # Get all users and their weights
-        users = get_users()
-
-        # If no rewards generated, return early
-        if current_total_mon <= epoch_baseline:
-            return {u: {
-                        "rewards": 0,
-                        "apy": 0,
-                        "annualized_apy": 0,
-                        "display_apy": 0,
-                        "epoch_rewards": 0
-                    }
-                    for u in users
-            }
-        
-        # 1. Calculate total rewards generated during the epoch
-        epoch_rewards = current_total_mon - epoch_baseline
-                
-        # 2. Calculate denominator: sum of (weight * deposited_mon) for all users
-        denominator = 0
+    if not w3 or not contract:
+        return None
+
+    block = block_identifier
+    if block is None:
+        block = chaincache.contract_cache.block or w3.eth.block_number
+    functions = contract.functions
+    snapshot = {
+        'block': block,
+        'total_mon': functions.totalMON().call(block_identifier=block),
+        'epoch_baseline': functions.epochBaseline().call(block_identifier=block),
+        'epoch_total_supply': functions.epochTotalSupply().call(block_identifier=block),
+        'users': {}
+    }
+    users = functions.getUsers().call(block_identifier=block)
+
+    if config.MULTICALL3_ADDRESS:
+        calls = []
         for user in users:
-            user_balance = contract.functions.balanceOf(user).call()
-            user_weight = contract.functions.userWeights(user).call()
-            
-            # Skip users with zero balance
-            if user_balance == 0:
-                continue
-            
-            # Calculate deposited MON using the formula from the smart contract
-            deposited_mon = (user_balance * epoch_baseline) // epoch_total_supply
-            denominator += user_weight * deposited_mon
-        
-        if denominator == 0:
-            return {u: {
-                        "rewards": 0,
-                        "apy": 0,
-                        "annualized_apy": 0,
-                        "display_apy": 0,
-                        "epoch_rewards": epoch_rewards
-                    }
-                    for u in users
+            calls.append((contract.address, contract.encodeABI(fn_name='balanceOf', args=[user])))
+            calls.append((contract.address, contract.encodeABI(fn_name='userWeights', args=[user])))
+        results = multicall.aggregate(
+            multicall.get_multicall(w3, config.MULTICALL3_ADDRESS), calls, block, config.MULTICALL_CHUNK_SIZE
+        )
+        values = [w3.codec.decode(['uint256'], data)[0] for data in results]
+        for i, user in enumerate(users):
+            snapshot['users'][user] = {'balance': values[2 * i], 'weight': values[2 * i + 1]}
+    else:
+        for user in users:
+            snapshot['users'][user] = {
+                'balance': functions.balanceOf(user).call(block_identifier=block),
+                'weight': functions.userWeights(user).call(block_identifier=block)
             }
-        
-        result = {}
-        for user_address in users:
-            # Get user's balance and weight
-            user_balance = contract.functions.balanceOf(user_address).call()
-            user_weight = contract.functions.userWeights(user_address).call()
-            
-            # Calculate user's deposited MON
-            deposited_mon = (user_balance * epoch_baseline) // epoch_total_supply
-            
-            # 3. Calculate user's rewards using the formula
-            user_reward = (epoch_rewards * user_weight * deposited_mon) // denominator
-            
-            # 4. Calculate APY (rewards / deposited_mon)
-            apy = 0
-            if deposited_mon > 0:
-                apy = (user_reward * 100) / deposited_mon  # As percentage
-            
-            # 5. Annualize the APY (1 epoch = 10 minutes, so multiply by 6*24*365)
-            # This assumes 6 epochs per hour, 24 hours per day, 365 days per year
-            annualized_apy = apy * 6 * 24 * 365
-            
-            # 6. Multiply by 10 for display (as per requirement)
-            display_apy = annualized_apy * 10
-            result[user_address] = {
-                                    "rewards": user_reward,
-                                    "apy": apy,
-                                    "annualized_apy": annualized_apy,
-                                    "display_apy": display_apy,
-                                    "epoch_rewards": epoch_rewards
-                                }
-            
-        return result
-    
-    except Exception as e:
-        logger.error(f"Error calculating user rewards: {e}")
-        return {"error": str(e)}
 
-# Update epoch
-def update_epoch():
-    """Update epoch on the contract"""
+    logger.info(f"Read reward snapshot for {len(users)} users at block {block}")
+    return snapshot
+
+# Read many user weights at one block
+def read_user_weights(users, block_identifier='latest'):
+    """
+    Read userWeights for each of users at a single block
+
+    Goes through Multicall3 in chunks of MULTICALL_CHUNK_SIZE calls when
+    MULTICALL3_ADDRESS is set, else reads them one by one.
+
+    Returns:
+        Dictionary mapping each checksum address to its weight
+    """
     w3 = get_web3()
     contract = get_contract()
-    
-    if not w3 or not contract or not config.PRIVATE_KEY:
+    if not w3 or not contract:
+        return None
+
+    users = [Web3.to_checksum_address(user) for user in users]
+    if config.MULTICALL3_ADDRESS:
+        calls = [(contract.address, contract.encodeABI(fn_name='userWeights', args=[user])) for user in users]
+        results = multicall.aggregate(
+            multicall.get_multicall(w3, config.MULTICALL3_ADDRESS), calls, block_identifier, config.MULTICALL_CHUNK_SIZE
+        )
+        return {user: w3.codec.decode(['uint256'], data)[0] for user, data in zip(users, results)}
+    return {user: contract.functions.userWeights(user).call(block_identifier=block_identifier) for user in users}
+
+# Update epoch
+def update_epoch():
+    """Queue an updateEpoch call in the transaction outbox.
+
+    Returns the outbox id, which the outbox job sends and confirms, or None on error.
+    """
+    if not get_contract() or not config.PRIVATE_KEY:
         logger.error("Missing required configuration for blockchain interaction")
-        return False
-    
+        return None
+
     try:
-        # Prepare transaction
-        account = w3.eth.account.from_key(config.PRIVATE_KEY)
-        nonce = w3.eth.get_transaction_count(account.address)
-        
-        # Build transaction
-        tx = contract.functions.updateEpoch().build_transaction({
-            'from': account.address,
-            'nonce': nonce,
-            'gas': 2000000,
-            'gasPrice': w3.eth.gas_price
-        })
-        
-        # Sign and send transaction
-        signed_tx = w3.eth.account.sign_transaction(tx, config.PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        
-        # Wait for transaction receipt
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        
-        logger.info(f"Epoch update transaction successful: {receipt.transactionHash.hex()}")
-        return True
+        return models.enqueue_transaction('updateEpoch', [], reference='updateEpoch')
     except Exception as e:
-        logger.error(f"Error updating epoch: {e}")
-        return False
+        logger.error(f"Error queueing epoch update: {e}")
+        return None
@@ -0,0 +1,111 @@
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from backend.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BlockCache:
+    """Read-through cache of contract reads keyed by (name, args, block number).
+
+    A block poller calls set_block; moving to a new block drops every cached
+    value. Concurrent misses for the same key share one loader call. While no
+    block is known, or the last one is older than max_age_seconds (the poller
+    stopped), reads bypass the cache and go to 'latest'.
+    """
+
+    def __init__(self, max_age_seconds):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._block = None
+        self._block_seen_at = 0.0
+        self._values = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.invalidations = 0
+
+    @property
+    def block(self):
+        """Current block number, or None when unknown or stale"""
+        with self._lock:
+            return self._current_block()
+
+    def _current_block(self):
+        if self._block is None or time.monotonic() - self._block_seen_at > self.max_age_seconds:
+            return None
+        return self._block
+
+    def set_block(self, block):
+        """Record the latest block number, invalidating the cache when it moved"""
+        with self._lock:
+            self._block_seen_at = time.monotonic()
+            if block == self._block:
+                return False
+            self._block = block
+            self._values.clear()
+            self.invalidations += 1
+            return True
+
+    def get(self, name, args, loader):
+        """Cached loader(block) for (name, args) at the current block"""
+        with self._lock:
+            block = self._current_block()
+            if block is None:
+                self.bypassed += 1
+                flight = None
+            else:
+                key = (name, tuple(args), block)
+                if key in self._values:
+                    self.hits += 1
+                    return self._values[key]
+                flight = self._inflight.get(key)
+                if flight is not None:
+                    self.coalesced += 1
+                    leader = False
+                else:
+                    self.misses += 1
+                    flight = self._inflight[key] = Future()
+                    leader = True
+
+        if flight is None:
+            return loader('latest')
+        if not leader:
+            return flight.result()
+
+        try:
+            value = loader(block)
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if block == self._block:
+                self._values[key] = value
+        flight.set_result(value)
+        return value
+
+    def status(self):
+        with self._lock:
+            return {
+                'block': self._block,
+                'block_age_seconds': round(time.monotonic() - self._block_seen_at, 3) if self._block is not None else None,
+                'entries': len(self._values),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'bypassed': self.bypassed,
+                'invalidations': self.invalidations
+            }
+
+
+# Process-wide cache for reads of config.CONTRACT_ADDRESS
+contract_cache = BlockCache(config.BLOCK_CACHE_MAX_AGE_SECONDS)
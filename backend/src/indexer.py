@@ -0,0 +1,269 @@
+import threading
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from web3 import Web3
+from backend.src import models
+from backend.src import blockchain
+from backend.src import chaincache
+from backend.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# PredictVault events that change users, share balances or weights
+INDEXED_EVENTS = ('Staked', 'Unstaked', 'UserWeightUpdated', 'Transfer')
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+# Only one sync runs at a time
+_sync_lock = threading.Lock()
+
+
+def empty_state():
+    return {'is_member': False, 'balance': 0, 'weight': 0, 'updated_block': 0}
+
+
+def apply_event(states, event):
+    """Fold one event into states (address -> state), mirroring PredictVault's bookkeeping"""
+    name = event['event']
+    user = event['user_address']
+    value = int(event['value'])
+
+    if name == 'Transfer':
+        # Mints come from and burns go to the zero address
+        sender, receiver = user, event['counterparty']
+        if sender != ZERO_ADDRESS:
+            states[sender]['balance'] -= value
+            states[sender]['updated_block'] = event['block_number']
+        if receiver != ZERO_ADDRESS:
+            states[receiver]['balance'] += value
+            states[receiver]['updated_block'] = event['block_number']
+        return
+
+    state = states[user]
+    state['updated_block'] = event['block_number']
+    if name == 'Staked':
+        # depositNative adds the receiver to the users array
+        state['is_member'] = True
+    elif name == 'UserWeightUpdated':
+        state['weight'] = value
+    elif name == 'Unstaked':
+        # withdrawNative removes the owner and its weight once the balance is zero.
+        # The burn Transfer precedes Unstaked in the same transaction.
+        if state['is_member'] and state['balance'] == 0:
+            state['is_member'] = False
+            state['weight'] = 0
+
+
+def event_topics(contract):
+    """Map of topic0 hex to event name for INDEXED_EVENTS"""
+    topics = {}
+    for item in contract.abi:
+        if item.get('type') == 'event' and item['name'] in INDEXED_EVENTS:
+            signature = f"{item['name']}({','.join(arg['type'] for arg in item['inputs'])})"
+            topics[Web3.to_hex(Web3.keccak(text=signature))] = item['name']
+    return topics
+
+
+def _event_row(name, log, args):
+    """Flatten a decoded log into a vault_events row"""
+    if name == 'Transfer':
+        user, counterparty, value = args['from'], args['to'], args['value']
+    elif name == 'UserWeightUpdated':
+        user, counterparty, value = args['user'], None, args['newWeight']
+    else:
+        user, counterparty, value = args['user'], None, args['amount']
+    return {
+        'block_number': log['blockNumber'],
+        'log_index': log['logIndex'],
+        'block_hash': Web3.to_hex(log['blockHash']),
+        'tx_hash': Web3.to_hex(log['transactionHash']),
+        'event': name,
+        'user_address': user,
+        'counterparty': counterparty,
+        'value': str(value)
+    }
+
+
+def fetch_events(w3, contract, start, end):
+    """Decoded INDEXED_EVENTS logs of the contract in [start, end], in chain order"""
+    topics = event_topics(contract)
+    logs = w3.eth.get_logs({
+        'address': contract.address,
+        'fromBlock': start,
+        'toBlock': end,
+        'topics': [list(topics)]
+    })
+    rows = []
+    for log in logs:
+        name = topics[Web3.to_hex(log['topics'][0])]
+        decoded = getattr(contract.events, name)().process_log(log)
+        rows.append(_event_row(name, log, decoded['args']))
+    rows.sort(key=lambda row: (row['block_number'], row['log_index']))
+    return rows
+
+
+def get_block_hash(w3, number):
+    return Web3.to_hex(w3.eth.get_block(number)['hash'])
+
+
+def block_ranges(start, end, size):
+    """Split [start, end] into consecutive ranges of at most size blocks"""
+    return [(first, min(first + size - 1, end)) for first in range(start, end + 1, size)]
+
+
+def refold(addresses):
+    """Recompute the state of addresses from their remaining indexed events"""
+    states = defaultdict(empty_state, {address: empty_state() for address in addresses})
+    for event in models.get_vault_events_for(addresses):
+        apply_event(states, event)
+    models.save_vault_users({address: states[address] for address in addresses})
+
+
+def handle_reorg(w3, checkpoint):
+    """Rewind to the newest recorded block still on the canonical chain.
+
+    Returns True if the index was rewound.
+    """
+    if get_block_hash(w3, checkpoint['number']) == checkpoint['hash']:
+        return False
+
+    fork = None
+    for number, block_hash in models.get_index_block_hashes():
+        if get_block_hash(w3, number) == block_hash:
+            fork = number
+            break
+
+    with models.db_session():
+        if fork is None:
+            logger.error(f"Reorg deeper than {config.INDEXER_REORG_DEPTH} checkpoints, reindexing from block {config.INDEXER_START_BLOCK}")
+            models.reset_index()
+        else:
+            logger.warning(f"Reorg detected at block {checkpoint['number']}, rewinding index to block {fork}")
+            refold(models.rewind_index(fork))
+    return True
+
+
+def sync(max_ranges=None):
+    """Index new PredictVault events up to the chain head minus INDEXER_CONFIRMATIONS.
+
+    Block ranges of INDEXER_CHUNK_BLOCKS are fetched INDEXER_WORKERS at a time in
+    parallel, then applied in order in one transaction per window together with
+    the new checkpoint. Returns the last indexed block, or None if not synced.
+    """
+    w3 = blockchain.get_web3()
+    contract = blockchain.get_contract()
+    if not w3 or not contract:
+        return None
+    if not _sync_lock.acquire(blocking=False):
+        logger.info("Indexer sync already running")
+        return None
+
+    try:
+        head = w3.eth.block_number - config.INDEXER_CONFIRMATIONS
+        checkpoint = models.get_index_checkpoint()
+        if checkpoint and handle_reorg(w3, checkpoint):
+            checkpoint = models.get_index_checkpoint()
+        last = checkpoint['number'] if checkpoint else config.INDEXER_START_BLOCK - 1
+
+        ranges = block_ranges(last + 1, head, config.INDEXER_CHUNK_BLOCKS)
+        if max_ranges is not None:
+            ranges = ranges[:max_ranges]
+
+        with ThreadPoolExecutor(max_workers=config.INDEXER_WORKERS, thread_name_prefix='indexer') as executor:
+            for i in range(0, len(ranges), config.INDEXER_WORKERS):
+                window = ranges[i:i + config.INDEXER_WORKERS]
+                end = window[-1][1]
+                # Hash taken before the logs: a reorg in between leaves a stale
+                # checkpoint that the next sync detects and rewinds
+                end_hash = get_block_hash(w3, end)
+                batches = list(executor.map(lambda r: fetch_events(w3, contract, *r), window))
+                events = [event for batch in batches for event in batch]
+
+                touched = {event['user_address'] for event in events}
+                touched |= {event['counterparty'] for event in events if event['counterparty']}
+                touched.discard(ZERO_ADDRESS)
+
+                with models.db_session():
+                    states = defaultdict(empty_state, models.get_vault_users(touched))
+                    for event in events:
+                        apply_event(states, event)
+                    states.pop(ZERO_ADDRESS, None)
+                    models.save_index_batch(events, dict(states), end, end_hash)
+                last = end
+                logger.info(f"Indexed {len(events)} vault events up to block {end} (head {head})")
+        return last
+    except Exception as e:
+        logger.error(f"Error syncing vault events: {e}")
+        blockchain._handle_rpc_error(e)
+        return None
+    finally:
+        _sync_lock.release()
+
+
+def indexed_block():
+    """Last indexed block if the index is within INDEXER_MAX_LAG_BLOCKS of the chain head, else None"""
+    if not config.INDEXER_ENABLED:
+        return None
+    checkpoint = models.get_index_checkpoint()
+    if not checkpoint:
+        return None
+
+    head = chaincache.contract_cache.block
+    if head is None:
+        w3 = blockchain.get_web3()
+        if not w3:
+            return None
+        head = w3.eth.block_number
+    if head - checkpoint['number'] > config.INDEXER_MAX_LAG_BLOCKS:
+        return None
+    return checkpoint['number']
+
+
+def get_users():
+    """Addresses in the contract's users array, from the index when fresh, else from the chain"""
+    try:
+        if indexed_block() is not None:
+            return list(models.get_vault_members())
+    except Exception as e:
+        logger.error(f"Error reading indexed users: {e}")
+    return blockchain.get_users()
+
+
+def get_user_state(address):
+    """(balance, weight) of a user, from the index when fresh, else from the chain"""
+    try:
+        if indexed_block() is not None:
+            address = Web3.to_checksum_address(address)
+            state = models.get_vault_users([address]).get(address, empty_state())
+            return state['balance'], state['weight']
+    except Exception as e:
+        logger.error(f"Error reading indexed user {address}: {e}")
+    return blockchain.get_user_balance(address), blockchain.get_user_weight(address)
+
+
+def read_reward_snapshot(block_identifier=None):
+    """Reward snapshot at the last indexed block with users from the index.
+
+    Falls back to blockchain.read_reward_snapshot when the index is disabled or lagging.
+    """
+    block = indexed_block()
+    if block is None:
+        return blockchain.read_reward_snapshot(block_identifier)
+
+    contract = blockchain.get_contract()
+    if not contract:
+        return None
+    functions = contract.functions
+    return {
+        'block': block,
+        'total_mon': functions.totalMON().call(block_identifier=block),
+        'epoch_baseline': functions.epochBaseline().call(block_identifier=block),
+        'epoch_total_supply': functions.epochTotalSupply().call(block_identifier=block),
+        'users': {
+            address: {'balance': state['balance'], 'weight': state['weight']}
+            for address, state in models.get_vault_members().items()
+        }
+    }
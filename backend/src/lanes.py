@@ -0,0 +1,201 @@
+import heapq
+import itertools
+import threading
+import time
+import logging
+from collections import deque
+from backend.src import utils
+from backend.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Lower runs first: side effects of lifecycle transitions go ahead of periodic jobs
+PRIORITY_TRANSITION = 0
+PRIORITY_JOB = 1
+
+
+class Lane:
+    """Bounded executor for one kind of scheduler workload.
+
+    A fixed number of worker threads take tasks from a priority queue of at
+    most max_queue entries, so a slow workload (chain I/O) can only tie up its
+    own workers. A task submitted with a key is dropped while another task
+    with the same key is queued or running, which coalesces periodic jobs.
+    Transition tasks (PRIORITY_TRANSITION) are never dropped: they are not
+    bounded by max_queue and stop() runs the queued ones before returning.
+    Until start() is called, tasks run inline on the caller.
+    """
+
+    def __init__(self, name, workers, max_queue, window=1000):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._heap = []
+        self._order = itertools.count()
+        self._keys = set()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._waits = deque(maxlen=window)
+        self.running = 0
+        self.max_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, priority=PRIORITY_JOB, key=None):
+        """Queue fn(*args). Returns False when coalesced into a pending task, the queue is full or the lane is stopping."""
+        if not self._threads:
+            with self._cond:
+                self.submitted += 1
+                self.running += 1
+            self._run(fn, args, time.time(), key=None)
+            return True
+
+        with self._cond:
+            if self._stopping:
+                self.rejected += 1
+                logger.warning(f"Lane {self.name} stopping, dropping {getattr(fn, '__name__', fn)}")
+                return False
+            if key is not None and key in self._keys:
+                self.coalesced += 1
+                return False
+            if priority > PRIORITY_TRANSITION and len(self._heap) >= self.max_queue:
+                self.rejected += 1
+                logger.warning(f"Lane {self.name} queue full ({self.max_queue}), dropping {getattr(fn, '__name__', fn)}")
+                return False
+            heapq.heappush(self._heap, (priority, next(self._order), time.time(), key, fn, args))
+            if key is not None:
+                self._keys.add(key)
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, len(self._heap))
+            self._cond.notify()
+        return True
+
+    def pending(self, key):
+        """Whether a task submitted with key is queued or running"""
+        with self._cond:
+            return key in self._keys
+
+    def _run(self, fn, args, queued_at, key):
+        """Run a task already counted as running"""
+        self._waits.append(time.time() - queued_at)
+        try:
+            fn(*args)
+            ok = True
+        except Exception as e:
+            ok = False
+            logger.error(f"Error in lane {self.name} running {getattr(fn, '__name__', fn)}: {e}")
+        with self._cond:
+            self.running -= 1
+            self._keys.discard(key)
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._cond.notify_all()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopping:
+                    self._cond.wait()
+                # Stopping workers still run the transitions left in the queue
+                if not self._heap:
+                    return
+                _, _, queued_at, key, fn, args = heapq.heappop(self._heap)
+                self.running += 1
+            self._run(fn, args, queued_at, key)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'lane-{self.name}-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def drain(self, timeout=None):
+        """Wait until no task is queued or running. Returns False if timeout expired first."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._heap or self.running:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=5):
+        """Stop the workers once they have run the queued transitions. Other queued tasks are dropped."""
+        with self._cond:
+            self._stopping = True
+            kept = [entry for entry in self._heap if entry[0] <= PRIORITY_TRANSITION]
+            dropped = len(self._heap) - len(kept)
+            self._heap = kept
+            heapq.heapify(self._heap)
+            self._keys = {entry[3] for entry in kept if entry[3] is not None}
+            self._cond.notify_all()
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.time()))
+        with self._cond:
+            lost = len(self._heap)
+            self._heap = []
+            self._keys.clear()
+        self._threads = []
+        if dropped:
+            logger.warning(f"Lane {self.name} stopped with {dropped} queued tasks dropped")
+        if lost:
+            logger.error(f"Lane {self.name} stopped before running {lost} queued transitions")
+
+    def status(self):
+        """Queue depth, concurrency and wait-time percentiles of the lane"""
+        with self._cond:
+            waits = list(self._waits)
+            status = {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': len(self._heap),
+                'running': self.running,
+                'max_depth': self.max_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected
+            }
+        status['wait_p50_ms'] = utils.percentile(waits, 50, scale=1000)
+        status['wait_p99_ms'] = utils.percentile(waits, 99, scale=1000)
+        return status
+
+
+# Chain I/O: contract reads, event indexing, the outbox and the chain side of epoch transitions
+chain_lane = Lane('chain', config.LANE_CHAIN_WORKERS, config.LANE_MAX_QUEUE)
+# Price I/O: polling the price sources
+price_lane = Lane('price', config.LANE_PRICE_WORKERS, config.LANE_MAX_QUEUE)
+# Database-only jobs: tick flushes, retention and schedule generation
+db_lane = Lane('db', config.LANE_DB_WORKERS, config.LANE_MAX_QUEUE)
+
+LANES = (chain_lane, price_lane, db_lane)
+
+
+def start():
+    for lane in LANES:
+        lane.start()
+
+
+def stop():
+    for lane in LANES:
+        lane.stop()
+
+
+def status():
+    return {lane.name: lane.status() for lane in LANES}
@@ -0,0 +1,134 @@
+import os
+import socket
+import threading
+import time
+import uuid
+import logging
+from backend.src import models
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LeaderElector:
+    """Elects one process among the workers sharing the database through a lease row.
+
+    Every heartbeat_seconds the process tries to take or renew the lease for
+    ttl_seconds (models.acquire_lease). The holder runs on_elected() when it
+    gets the lease and on_demoted() when it loses it. A leader that cannot
+    renew steps down heartbeat_seconds before its lease expires, so its
+    duties stop before another process can take over. Once the lease expires,
+    any other process takes it over on its next heartbeat.
+    """
+
+    def __init__(self, name, ttl_seconds, heartbeat_seconds, on_elected, on_demoted, holder=None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.holder = holder or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.is_leader = False
+        self.term = None
+        self.expires_at = None
+        # Replaced as a whole so fence() can be read without the lock, e.g. while duties stop
+        self._fence = None
+        self.elections = 0
+        self.demotions = 0
+        self.last_error = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _elect(self, lease):
+        self.is_leader = True
+        self.term = lease['term']
+        self._fence = (self.name, self.holder, self.term)
+        self.elections += 1
+        logger.info(f"{self.holder} elected {self.name} leader for term {self.term}")
+        try:
+            self.on_elected()
+        except Exception as e:
+            logger.error(f"Error starting {self.name} leader duties, handing the lease over: {e}")
+            self._demote('duties failed to start')
+            models.release_lease(self.name, self.holder)
+
+    def _demote(self, reason):
+        self.is_leader = False
+        self._fence = None
+        self.demotions += 1
+        logger.warning(f"{self.holder} stepping down as {self.name} leader: {reason}")
+        try:
+            self.on_demoted()
+        except Exception as e:
+            logger.error(f"Error stopping {self.name} leader duties: {e}")
+
+    def heartbeat(self, now=None):
+        """Take or renew the lease and start or stop the leader duties accordingly. Returns is_leader."""
+        now = time.time() if now is None else now
+        with self._lock:
+            try:
+                lease = models.acquire_lease(self.name, self.holder, self.ttl_seconds, now)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error renewing the {self.name} lease: {e}")
+                if self.is_leader and now >= self.expires_at - self.heartbeat_seconds:
+                    self._demote('lease could not be renewed')
+                return self.is_leader
+
+            self.last_error = None
+            if lease is not None:
+                self.expires_at = lease['expires_at']
+                # The lease lapsed before this renewal: the old term's duties and fence end with it
+                if self.is_leader and lease['term'] != self.term:
+                    self._demote('lease lapsed before it was renewed')
+                if not self.is_leader:
+                    self._elect(lease)
+            elif self.is_leader:
+                self._demote('lease taken over by another process')
+            return self.is_leader
+
+    def fence(self):
+        """(name, holder, term) while this process leads, for fencing its side effects, else None"""
+        return self._fence
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            self.heartbeat()
+
+    def start(self):
+        """Run a first election now, then keep heartbeating from a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name='leader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop heartbeating, stop the duties and release the lease for the other processes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            if self.is_leader:
+                self._demote('shutting down')
+                try:
+                    models.release_lease(self.name, self.holder)
+                except Exception as e:
+                    logger.error(f"Error releasing the {self.name} lease: {e}")
+
+    def status(self):
+        """This process's view of the election, and the lease row as stored"""
+        return {
+            'holder': self.holder,
+            'is_leader': self.is_leader,
+            'term': self.term,
+            'expires_at': self.expires_at,
+            'elections': self.elections,
+            'demotions': self.demotions,
+            'last_error': self.last_error,
+            'lease': models.get_lease(self.name)
+        }
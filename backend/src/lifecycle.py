@@ -0,0 +1,310 @@
+import heapq
+import threading
+import time
+import logging
+from collections import deque
+from backend.src import models
+from backend.src import utils
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Order of transitions due in the same second: wind rounds and epochs down before starting new ones
+TRANSITION_ORDER = (
+    'process_round_completed_start',
+    'process_round_calculating_start',
+    'process_round_lock_start',
+    'process_epoch_completed_start',
+    'process_epoch_calculating_start',
+    'process_epoch_lock_start',
+    'process_epoch_start',
+    'process_round_start',
+)
+TRANSITION_RANK = {event_type: rank for rank, event_type in enumerate(TRANSITION_ORDER)}
+
+# Upper bounds in seconds of the start lag histogram buckets, the last bucket is unbounded
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class TransitionMetrics:
+    """Start lag, duration and outcome of lifecycle transitions per event type.
+
+    Lag is the actual start minus the planned time. A run counts as a misfire
+    when it started more than misfire_seconds late, which includes every
+    transition replayed by catch-up. Retries count the failed attempts made
+    at the same transition before this run. Percentiles cover the last
+    `window` runs of each type; the histogram and counters cover all of them.
+    """
+
+    def __init__(self, misfire_seconds, window=1000):
+        self.misfire_seconds = misfire_seconds
+        self.window = window
+        self._lock = threading.Lock()
+        self._types = {}
+        self._failures = {}
+
+    def _stats(self, event_type):
+        stats = self._types.get(event_type)
+        if stats is None:
+            stats = self._types[event_type] = {
+                'runs': 0,
+                'outcomes': {},
+                'misfires': 0,
+                'retries': 0,
+                'histogram': [0] * (len(LAG_BUCKETS) + 1),
+                'lags': deque(maxlen=self.window),
+                'durations': deque(maxlen=self.window),
+                'last': None
+            }
+        return stats
+
+    def record(self, event_type, id, planned, started, finished, outcome, error=None):
+        """Record one run and return it as a dict"""
+        lag = started - planned
+        key = (event_type, id)
+        with self._lock:
+            if outcome == 'failed':
+                retries = self._failures.get(key, 0)
+                self._failures[key] = retries + 1
+            else:
+                retries = self._failures.pop(key, 0)
+
+            run = {
+                'event_type': event_type,
+                'entity_id': id,
+                'planned_at': planned,
+                'started_at': started,
+                'lag': lag,
+                'duration': finished - started,
+                'outcome': outcome,
+                'retries': retries,
+                'error': error
+            }
+            stats = self._stats(event_type)
+            stats['runs'] += 1
+            stats['outcomes'][outcome] = stats['outcomes'].get(outcome, 0) + 1
+            stats['retries'] += retries
+            if lag > self.misfire_seconds:
+                stats['misfires'] += 1
+            stats['histogram'][next((i for i, bound in enumerate(LAG_BUCKETS) if lag <= bound), len(LAG_BUCKETS))] += 1
+            stats['lags'].append(lag)
+            stats['durations'].append(run['duration'])
+            stats['last'] = run
+        return run
+
+    def status(self):
+        """Per event type counters, lag histogram and lag and duration percentiles"""
+        result = {}
+        with self._lock:
+            for event_type, stats in self._types.items():
+                lags = stats['lags']
+                result[event_type] = {
+                    'runs': stats['runs'],
+                    'outcomes': dict(stats['outcomes']),
+                    'misfires': stats['misfires'],
+                    'retries': stats['retries'],
+                    'lag_p50_ms': utils.percentile(lags, 50, scale=1000),
+                    'lag_p99_ms': utils.percentile(lags, 99, scale=1000),
+                    'lag_max_ms': round(max(lags) * 1000, 3) if lags else None,
+                    'duration_p50_ms': utils.percentile(stats['durations'], 50, scale=1000),
+                    'duration_p99_ms': utils.percentile(stats['durations'], 99, scale=1000),
+                    'lag_histogram': {
+                        **{f'le_{bound}s': count for bound, count in zip(LAG_BUCKETS, stats['histogram'])},
+                        'inf': stats['histogram'][-1]
+                    },
+                    'last': stats['last']
+                }
+        return result
+
+
+class LifecycleDriver:
+    """Runs epoch and round transitions at their scheduled time from one thread.
+
+    Pending transitions sit in a heap ordered by (time, TRANSITION_ORDER).
+    Rows are pulled from the database incrementally: each refill loads the
+    transitions between the watermark (end of the last loaded window) and
+    now + horizon_seconds, so the queue only ever holds the near-term horizon.
+
+    Every run is recorded through record_run into `metrics`, and passed to
+    on_run(run) when given, which is how runs reach the rolling table.
+
+    catch_up(now) replays transitions due by now that never ran. It is called
+    on this thread when the driver starts, every catch_up_seconds and after a
+    failed transition, so it never overlaps a live transition. Queued
+    transitions due by then are dropped afterwards since catch_up covered them.
+    """
+
+    def __init__(self, handlers, horizon_seconds, refresh_seconds, catch_up=None, catch_up_seconds=None,
+                 metrics=None, on_run=None):
+        self.handlers = handlers
+        self.metrics = metrics if metrics is not None else TransitionMetrics(float('inf'))
+        self.on_run = on_run
+        self.horizon_seconds = horizon_seconds
+        self.refresh_seconds = refresh_seconds
+        self.catch_up = catch_up
+        self.catch_up_seconds = catch_up_seconds
+        self._catch_up_due = catch_up is not None
+        self._last_catch_up = None
+        self._heap = []
+        self._watermark = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self.ran = 0
+        self.failed = 0
+
+    def refill(self, now=None):
+        """Load transitions from the watermark up to now + horizon_seconds. Returns how many were added."""
+        now = int(time.time() if now is None else now)
+        with self._lock:
+            if self._watermark is None:
+                self._watermark = now
+            end = now + self.horizon_seconds
+            # Extend the window once per refresh_seconds rather than on every wakeup
+            if end - self._watermark < self.refresh_seconds:
+                return 0
+            rows = models.get_lifecycle_transitions(self._watermark, end)
+            for row in rows:
+                if row['event_type'] in self.handlers:
+                    heapq.heappush(self._heap, (row['time'], TRANSITION_RANK[row['event_type']], row['id'], row['event_type']))
+            self._watermark = end
+        if rows:
+            logger.info(f"Queued {len(rows)} lifecycle transitions up to {end}")
+        return len(rows)
+
+    def reload(self):
+        """Drop queued future transitions so the next refill reads them again, picking up schedule changes"""
+        with self._lock:
+            if self._watermark is not None:
+                now = int(time.time())
+                self._heap = [entry for entry in self._heap if entry[0] <= now]
+                heapq.heapify(self._heap)
+                self._watermark = min(self._watermark, now)
+        self._wakeup.set()
+
+    def _pop_due(self, now):
+        with self._lock:
+            if self._heap and self._heap[0][0] <= now:
+                return heapq.heappop(self._heap)
+            return None
+
+    def run_due(self, now=None):
+        """Run every queued transition due by now, in order. Returns how many ran.
+
+        With a catch_up hook, stops after a failed transition so catch_up can
+        repair it before the next one runs.
+        """
+        now = time.time() if now is None else now
+        count = 0
+        while True:
+            entry = self._pop_due(now)
+            if entry is None:
+                return count
+            due, _, id, event_type = entry
+            started = time.time()
+            try:
+                self.handlers[event_type](id)
+                self.ran += 1
+                self.record_run(event_type, id, due, started, time.time(), 'ok')
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error running {event_type} for id {id} due at {due}: {e}")
+                self.record_run(event_type, id, due, started, time.time(), 'failed', str(e))
+                if self.catch_up is not None:
+                    self._catch_up_due = True
+                    return count + 1
+            count += 1
+
+    def record_run(self, event_type, id, planned, started, finished, outcome, error=None):
+        """Record a transition run in the metrics and hand it to on_run"""
+        run = self.metrics.record(event_type, id, planned, started, finished, outcome, error)
+        if self.on_run is not None:
+            try:
+                self.on_run(run)
+            except Exception as e:
+                logger.error(f"Error recording the {event_type} run for id {id}: {e}")
+        return run
+
+    def run_catch_up(self, now=None):
+        """Replay missed transitions due by now and drop the queued ones catch_up covered"""
+        now = time.time() if now is None else now
+        self._catch_up_due = False
+        self._last_catch_up = now
+        try:
+            self.catch_up(now)
+        except Exception as e:
+            logger.error(f"Error catching up lifecycle transitions: {e}")
+        with self._lock:
+            self._heap = [entry for entry in self._heap if entry[0] > int(now)]
+            heapq.heapify(self._heap)
+
+    def _catch_up_pending(self, now):
+        if self.catch_up is None:
+            return False
+        if self._catch_up_due:
+            return True
+        return self.catch_up_seconds is not None and now - self._last_catch_up >= self.catch_up_seconds
+
+    def next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def _run(self):
+        while not self._stopping:
+            now = time.time()
+            if self._catch_up_pending(now):
+                self.run_catch_up(now)
+            try:
+                self.refill(now)
+            except Exception as e:
+                logger.error(f"Error loading lifecycle transitions: {e}")
+            self.run_due(now)
+
+            # Sleep until the earliest transition or the next refill, whichever comes first
+            wait = 0 if self._catch_up_due else self.refresh_seconds
+            next_due = self.next_due()
+            if next_due is not None:
+                wait = min(wait, max(0.0, next_due - time.time()))
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # Start from a clean queue, catch-up covers whatever happened while stopped
+        with self._lock:
+            self._heap = []
+            self._watermark = None
+        self._catch_up_due = self.catch_up is not None
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='lifecycle', daemon=True)
+        self._thread.start()
+        logger.info("Lifecycle driver started")
+
+    def stop(self, timeout=5):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("Lifecycle driver stopped")
+
+    def status(self, limit=20):
+        """Watermark, counters and the next queued transitions"""
+        with self._lock:
+            upcoming = heapq.nsmallest(limit, self._heap)
+            queued = len(self._heap)
+            watermark = self._watermark
+        return {
+            'watermark': watermark,
+            'queued': queued,
+            'ran': self.ran,
+            'failed': self.failed,
+            'last_catch_up': self._last_catch_up,
+            'upcoming': [
+                {'time': due, 'event_type': event_type, 'id': id}
+                for due, _, id, event_type in upcoming
+            ]
+        }
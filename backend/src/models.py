@@ -1,6 +1,11 @@
 import sqlite3
+import json
 import logging
-from datetime import datetime, timedelta, timezone
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from itertools import repeat
 from backend.config import config
 
 logging.basicConfig(level=logging.INFO)
@@ -15,308 +20,725 @@ def dict_factory(cursor, row):
     return d
 
 def get_db_connection():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(config.DATABASE_PATH)
+    """Open a new database connection with row factory, WAL journal and busy timeout"""
+    conn = sqlite3.connect(
+        config.DATABASE_PATH,
+        timeout=config.DATABASE_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False
+    )
     conn.row_factory = dict_factory
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA busy_timeout={config.DATABASE_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous=NORMAL')  # Safe with WAL, avoids an fsync per commit
     return conn
 
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        """Take an idle connection, opening a new one while under the pool size"""
+        if not self._slots.acquire(timeout=config.DATABASE_BUSY_TIMEOUT_MS / 1000):
+            raise sqlite3.OperationalError("Timed out waiting for a pooled database connection")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return get_db_connection()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+def get_pool():
+    """Get the process-wide connection pool for the configured database"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != config.DATABASE_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(config.DATABASE_PATH, config.DATABASE_POOL_SIZE)
+        return _pool
+
+def close_pool():
+    """Close the connection pool (used on shutdown and in tests)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+@contextmanager
+def db_session():
+    """Unit of work on a pooled connection.
+
+    Nested sessions on the same thread reuse the outer connection, so helpers
+    like create_user called from create_prediction share one transaction.
+    The outermost session commits on success and rolls back on error.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _local.conn = None
+        pool.release(conn)
+
 def init_db():
     """Initialize database with tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_session() as conn:
+        cursor = conn.cursor()
     
-    # Create users table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        address TEXT PRIMARY KEY,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
+        # Create users table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            address TEXT PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
     
-    # Create epochs table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS epochs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        start_time TIMESTAMP UNIQUE,
-        end_time TIMESTAMP,
-        lock_start TIMESTAMP,
-        lock_end TIMESTAMP,
-        status TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-
-    # Adding trigger to make sure that we won't have more than one locked, active, calculating at the time 
-    cursor.execute('''
-    CREATE TRIGGER IF NOT EXISTS enforce_uniqueness_epochs
-    BEFORE UPDATE ON epochs
-    FOR EACH ROW
-    WHEN NEW.status IN ('active', 'locked', 'calculating')
-    BEGIN
-        SELECT RAISE(ABORT, 'Only one round can have status active, calculating, locked')
-        FROM epochs
-        WHERE status = NEW.status AND id != NEW.id;
-    END
-    ''')
-
-    # Adding trigger that updates updated_at on row update
-    cursor.execute('''
-    CREATE TRIGGER IF NOT EXISTS update_epochs_timestamp
-    AFTER UPDATE ON epochs
-    FOR EACH ROW
-    BEGIN
-        UPDATE epochs SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-    END
-    ''')
-
-    # Create rounds table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS rounds (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        epoch_id INTEGER,
-        start_time TIMESTAMP UNIQUE,
-        end_time TIMESTAMP,
-        lock_start TIMESTAMP,
-        lock_end TIMESTAMP,
-        starting_price REAL,
-        ending_price REAL,
-        status TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (epoch_id) REFERENCES epochs (id)
-    )
-    ''')
-
-    # Adding trigger to make sure that we won't have more than one round active, locked or calculating at the time 
-    cursor.execute('''
-    CREATE TRIGGER IF NOT EXISTS enforce_uniqueness_rounds
-    BEFORE UPDATE ON rounds
-    FOR EACH ROW
-    WHEN NEW.status IN ('active', 'locked', 'calculating')
-    BEGIN
-        SELECT RAISE(ABORT, 'Only one round can have status active, calculating, locked')
-        FROM rounds
-        WHERE status = NEW.status AND id != NEW.id;
-    END
-    ''')
-
-    # Adding trigger that updates updated_at on row update
-    cursor.execute('''
-    CREATE TRIGGER IF NOT EXISTS update_rounds_timestamp
-    AFTER UPDATE ON rounds
-    FOR EACH ROW
-    BEGIN
-        UPDATE rounds SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-    END
-    ''')
-
-    # Create user epoch table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_epoch (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_address TEXT,
-        epoch_id INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_address) REFERENCES users (address),
-        FOREIGN KEY (epoch_id) REFERENCES epochs (id),
-        UNIQUE (user_address, epoch_id)
-    )
-    ''')
-
-    # Adding trigger that updates updated_at on row update
-    cursor.execute('''
-    CREATE TRIGGER IF NOT EXISTS update_user_epoch_timestamp
-    AFTER UPDATE ON user_epoch
-    FOR EACH ROW
-    BEGIN
-        UPDATE user_epoch SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-    END
-    ''')
-
-
-    # Create predictions table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS predictions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_address TEXT,
-        round_id INTEGER,
-        direction TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        is_correct BOOLEAN,
-        FOREIGN KEY (user_address) REFERENCES users (address),
-        FOREIGN KEY (round_id) REFERENCES rounds (id)
-    )
-    ''')
+        # Create epochs table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS epochs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_time TIMESTAMP UNIQUE,
+            end_time TIMESTAMP,
+            lock_start TIMESTAMP,
+            lock_end TIMESTAMP,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # Adding trigger that updates updated_at on row update
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS update_epochs_timestamp
+        AFTER UPDATE ON epochs
+        FOR EACH ROW
+        BEGIN
+            UPDATE epochs SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
+        END
+        ''')
+
+        # Create rounds table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rounds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            epoch_id INTEGER,
+            start_time TIMESTAMP UNIQUE,
+            end_time TIMESTAMP,
+            lock_start TIMESTAMP,
+            lock_end TIMESTAMP,
+            starting_price REAL,
+            ending_price REAL,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (epoch_id) REFERENCES epochs (id)
+        )
+        ''')
+
+        # Adding trigger that updates updated_at on row update
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS update_rounds_timestamp
+        AFTER UPDATE ON rounds
+        FOR EACH ROW
+        BEGIN
+            UPDATE rounds SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
+        END
+        ''')
+
+        # Create user epoch table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_epoch (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_address TEXT,
+            epoch_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_address) REFERENCES users (address),
+            FOREIGN KEY (epoch_id) REFERENCES epochs (id),
+            UNIQUE (user_address, epoch_id)
+        )
+        ''')
+
+        # Adding trigger that updates updated_at on row update
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS update_user_epoch_timestamp
+        AFTER UPDATE ON user_epoch
+        FOR EACH ROW
+        BEGIN
+            UPDATE user_epoch SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
+        END
+        ''')
+
+
+        # Create predictions table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS predictions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_address TEXT,
+            round_id INTEGER,
+            direction TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_correct BOOLEAN,
+            FOREIGN KEY (user_address) REFERENCES users (address),
+            FOREIGN KEY (round_id) REFERENCES rounds (id)
+        )
+        ''')
     
     
 
-    # Create user_epoch_stats table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_epoch_stats (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_address TEXT,
-        epoch_id INTEGER,
-        correct_predictions INTEGER DEFAULT 0,
-        total_predictions INTEGER DEFAULT 0,
-        weight REAL DEFAULT 0,
-        FOREIGN KEY (user_address) REFERENCES users (address),
-        FOREIGN KEY (epoch_id) REFERENCES epochs (id),
-        UNIQUE (user_address, epoch_id)  
-    )
-    ''')
+        # Create user_epoch_stats table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_epoch_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_address TEXT,
+            epoch_id INTEGER,
+            correct_predictions INTEGER DEFAULT 0,
+            total_predictions INTEGER DEFAULT 0,
+            weight REAL DEFAULT 0,
+            FOREIGN KEY (user_address) REFERENCES users (address),
+            FOREIGN KEY (epoch_id) REFERENCES epochs (id),
+            UNIQUE (user_address, epoch_id)  
+        )
+        ''')
+
 
-   
-    conn.commit()
-    conn.close()
+        migrate_db(conn)
+        convert_time_columns(conn)
+        backfill_round_price_times(conn)
 
     generate_epochs_and_rounds()
 
-def insert_epoch(start_time, end_time, lock_start, lock_end, status):
-    """Insert epoch, ignoring conflicts"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            """INSERT INTO epochs (start_time, end_time, lock_start, lock_end, status)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(start_time) DO NOTHING
-            """,
-            (start_time, end_time, lock_start, lock_end, status)
+# Statuses that at most one epoch and at most one round can hold at a time
+EXCLUSIVE_STATUSES = ('active', 'locked', 'calculating')
+
+# Schema migrations, applied in order on top of the base tables created by init_db.
+# The applied version is tracked in PRAGMA user_version. Append new steps, never edit old ones.
+SCHEMA_MIGRATIONS = [
+    # 1: indexes and uniqueness for the predictions and user_epoch_stats hot paths.
+    # Duplicate predictions are dropped and the stats of the users who had them recounted
+    [
+        '''
+        CREATE TEMP TABLE duplicate_prediction_stats AS
+        SELECT DISTINCT user_address, epoch_id FROM (
+            SELECT p.user_address, r.epoch_id
+            FROM predictions p
+            JOIN rounds r ON r.id = p.round_id
+            GROUP BY p.user_address, p.round_id
+            HAVING COUNT(*) > 1
         )
-        conn.commit()
-        return cursor.lastrowid
-    finally:
-        conn.close()
-
-def insert_rounds(rounds_data):
-    """Insert rounds"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.executemany(
-            'INSERT INTO rounds (epoch_id, start_time, end_time, lock_start, lock_end, starting_price, ending_price, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-            rounds_data
+        ''',
+        '''
+        DELETE FROM predictions
+        WHERE id NOT IN (SELECT MIN(id) FROM predictions GROUP BY user_address, round_id)
+        ''',
+        '''
+        UPDATE user_epoch_stats
+        SET total_predictions = counted.total, correct_predictions = counted.correct
+        FROM (
+            SELECT p.user_address, r.epoch_id, COUNT(*) AS total, COALESCE(SUM(p.is_correct = 1), 0) AS correct
+            FROM predictions p
+            JOIN rounds r ON r.id = p.round_id
+            JOIN duplicate_prediction_stats d ON d.user_address = p.user_address AND d.epoch_id = r.epoch_id
+            GROUP BY p.user_address, r.epoch_id
+        ) AS counted
+        WHERE user_epoch_stats.user_address = counted.user_address
+          AND user_epoch_stats.epoch_id = counted.epoch_id
+        ''',
+        'DROP TABLE duplicate_prediction_stats',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_predictions_user_round ON predictions (user_address, round_id)',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_round ON predictions (round_id, is_correct, direction, user_address)',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_user_created ON predictions (user_address, created_at)',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_user_epoch_stats_leaderboard
+        ON user_epoch_stats (epoch_id, correct_predictions DESC, total_predictions DESC)
+        ''',
+    ],
+    # 2: time-column indexes for the scheduling queries, and partial unique indexes on status
+    # replacing the enforce_uniqueness_* triggers that scanned the whole table on every update
+    [
+        'DROP TRIGGER IF EXISTS enforce_uniqueness_epochs',
+        'DROP TRIGGER IF EXISTS enforce_uniqueness_rounds',
+        *[
+            f'''
+            UPDATE {table} SET status = 'aligned'
+            WHERE status = '{status}'
+              AND id != (SELECT MAX(id) FROM {table} WHERE status = '{status}')
+            '''
+            for table in ('epochs', 'rounds') for status in EXCLUSIVE_STATUSES
+        ],
+        *[
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_{status} ON {table} (status) WHERE status = '{status}'"
+            for table in ('epochs', 'rounds') for status in EXCLUSIVE_STATUSES
+        ],
+        'CREATE INDEX IF NOT EXISTS idx_epochs_lock_start ON epochs (lock_start)',
+        'CREATE INDEX IF NOT EXISTS idx_epochs_end_time ON epochs (end_time)',
+        'CREATE INDEX IF NOT EXISTS idx_rounds_lock_start ON rounds (lock_start)',
+        'CREATE INDEX IF NOT EXISTS idx_rounds_lock_end ON rounds (lock_end)',
+    ],
+    # 3: timestamps (UTC epoch seconds) of the price ticks used to settle each round
+    [
+        'ALTER TABLE rounds ADD COLUMN starting_price_at REAL',
+        'ALTER TABLE rounds ADD COLUMN ending_price_at REAL',
+    ],
+    # 4: append-only price history and OHLC candles pre-aggregated per resolution
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS price_ticks (
+            ts REAL PRIMARY KEY,
+            price REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS price_candles (
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            ticks INTEGER NOT NULL,
+            PRIMARY KEY (resolution, bucket)
+        ) WITHOUT ROWID
+        ''',
+    ],
+    # 5: local index of PredictVault events and the vault state folded from them.
+    # uint256 amounts are stored as decimal TEXT since they overflow SQLite integers
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS vault_events (
+            block_number INTEGER NOT NULL,
+            log_index INTEGER NOT NULL,
+            block_hash TEXT NOT NULL,
+            tx_hash TEXT NOT NULL,
+            event TEXT NOT NULL,
+            user_address TEXT NOT NULL,
+            counterparty TEXT,
+            value TEXT NOT NULL,
+            PRIMARY KEY (block_number, log_index)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_vault_events_user ON vault_events (user_address)',
+        'CREATE INDEX IF NOT EXISTS idx_vault_events_counterparty ON vault_events (counterparty)',
+        '''
+        CREATE TABLE IF NOT EXISTS vault_users (
+            address TEXT PRIMARY KEY,
+            is_member INTEGER NOT NULL DEFAULT 0,
+            balance TEXT NOT NULL DEFAULT '0',
+            weight TEXT NOT NULL DEFAULT '0',
+            updated_block INTEGER NOT NULL
         )
-        conn.commit()
-    finally:
-        conn.close()        
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_vault_users_member ON vault_users (is_member)',
+        '''
+        CREATE TABLE IF NOT EXISTS indexer_blocks (
+            number INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL
+        )
+        ''',
+    ],
+    # 6: per-chunk report of each epoch's batchUpdateUserWeights publication
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS weight_publications (
+            epoch_id INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            entries INTEGER NOT NULL,
+            tx_hash TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            gas_limit INTEGER,
+            gas_used INTEGER,
+            latency_seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (epoch_id, chunk_index),
+            FOREIGN KEY (epoch_id) REFERENCES epochs (id)
+        )
+        ''',
+    ],
+    # 7: persisted queue of contract transactions, and weight chunks sent through it
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS tx_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reference TEXT,
+            fn_name TEXT NOT NULL,
+            args TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            nonce INTEGER,
+            gas_limit INTEGER,
+            gas_price INTEGER,
+            tx_hash TEXT,
+            tx_hashes TEXT NOT NULL DEFAULT '[]',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_retries INTEGER NOT NULL DEFAULT 0,
+            bumps INTEGER NOT NULL DEFAULT 0,
+            gas_used INTEGER,
+            block_number INTEGER,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            submitted_at REAL,
+            confirmed_at REAL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_tx_outbox_status ON tx_outbox (status, id)',
+        'ALTER TABLE weight_publications ADD COLUMN outbox_id INTEGER REFERENCES tx_outbox (id)',
+    ],
+    # 8: rewards and APY of every vault user, snapshotted when an epoch completes
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS epoch_reward_snapshots (
+            epoch_id INTEGER PRIMARY KEY,
+            block_number INTEGER,
+            total_mon TEXT NOT NULL,
+            epoch_baseline TEXT NOT NULL,
+            epoch_total_supply TEXT NOT NULL,
+            epoch_rewards TEXT NOT NULL,
+            users INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (epoch_id) REFERENCES epochs (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS epoch_rewards (
+            epoch_id INTEGER NOT NULL,
+            user_address TEXT NOT NULL,
+            balance TEXT NOT NULL,
+            weight TEXT NOT NULL,
+            rewards TEXT NOT NULL,
+            apy REAL NOT NULL,
+            annualized_apy REAL NOT NULL,
+            PRIMARY KEY (epoch_id, user_address)
+        ) WITHOUT ROWID
+        ''',
+    ],
+    # 9: rolling log of lifecycle transition runs with their planned and actual start (UTC epoch seconds)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS lifecycle_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            planned_at REAL NOT NULL,
+            started_at REAL NOT NULL,
+            lag REAL NOT NULL,
+            duration REAL NOT NULL,
+            outcome TEXT NOT NULL,
+            retries INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_lifecycle_runs_started ON lifecycle_runs (started_at)',
+    ],
+    # 10: named leases for electing the one process that runs the scheduler; term grows on every takeover
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            term INTEGER NOT NULL,
+            acquired_at REAL NOT NULL,
+            heartbeat_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        ''',
+    ],
+    # 11: when each round's predictions were settled, and when catch-up gave up on a round no price was
+    # recorded for. Rounds priced at both ends were settled in the same step before, so they count as settled
+    [
+        'ALTER TABLE rounds ADD COLUMN settled_at REAL',
+        'ALTER TABLE rounds ADD COLUMN voided_at REAL',
+        "UPDATE rounds SET settled_at = CAST(strftime('%s', 'now') AS REAL) WHERE starting_price != 0 AND ending_price != 0",
+    ],
+    # 12: when the chain side effect of each epoch transition finished: eligible users of the lock,
+    # weight publication of calculating, rewards snapshot of completed. Catch-up also sets them when it
+    # skips an epoch a later one superseded. Epochs past a transition before count as done
+    [
+        'ALTER TABLE epochs ADD COLUMN eligible_users_at REAL',
+        'ALTER TABLE epochs ADD COLUMN weights_at REAL',
+        'ALTER TABLE epochs ADD COLUMN rewards_at REAL',
+        '''
+        UPDATE epochs SET eligible_users_at = CAST(strftime('%s', 'now') AS REAL)
+        WHERE status IN ('locked', 'active', 'calculating', 'completed')
+        ''',
+        "UPDATE epochs SET weights_at = CAST(strftime('%s', 'now') AS REAL) WHERE status IN ('calculating', 'completed')",
+        "UPDATE epochs SET rewards_at = CAST(strftime('%s', 'now') AS REAL) WHERE status = 'completed'",
+    ],
+]
+
+def migrate_db(conn):
+    """Apply pending schema migrations, each one atomically"""
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA user_version')
+    version = cursor.fetchone()['user_version']
+
+    for target, statements in enumerate(SCHEMA_MIGRATIONS, start=1):
+        if target <= version:
+            continue
+        cursor.execute('SAVEPOINT schema_migration')
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(f'PRAGMA user_version = {target}')
+            cursor.execute('RELEASE schema_migration')
+        except Exception:
+            cursor.execute('ROLLBACK TO schema_migration')
+            cursor.execute('RELEASE schema_migration')
+            raise
+        logger.info(f"Applied schema migration {target}")
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Epoch and round columns whose storage follows config.TIMESTAMP_STORAGE
+TIME_COLUMNS = ('start_time', 'end_time', 'lock_start', 'lock_end')
+
+def integer_timestamps():
+    """True when time columns are stored as integer UTC epoch seconds"""
+    return config.TIMESTAMP_STORAGE == 'integer'
+
+def format_time(ts):
+    """Format UTC epoch seconds as a TEXT time column value"""
+    return time.strftime(TIME_FORMAT, time.gmtime(ts))
+
+def to_db_time(ts):
+    """Convert UTC epoch seconds to the configured time column storage"""
+    if integer_timestamps():
+        return int(ts)
+    return format_time(ts)
+
+def seconds_sql(column):
+    """SQL expression reading a time column as integer UTC epoch seconds"""
+    if integer_timestamps():
+        return column
+    return f"CAST(strftime('%s', {column}) AS INTEGER)"
+
+def convert_time_columns(conn):
+    """Convert epoch and round time columns to the configured storage.
+
+    Only rows still in the other representation are touched, so this is a
+    no-op once a database has been migrated, and switching
+    TIMESTAMP_STORAGE back converts the data back.
+    """
+    cursor = conn.cursor()
+    if integer_timestamps():
+        source_type = 'text'
+        convert = "CAST(strftime('%s', {column}) AS INTEGER)"
+    else:
+        source_type = 'integer'
+        convert = "strftime('%Y-%m-%d %H:%M:%S', {column}, 'unixepoch')"
+
+    for table in ('epochs', 'rounds'):
+        set_clause = ', '.join(f"{column} = {convert.format(column=column)}" for column in TIME_COLUMNS)
+        cursor.execute(f"UPDATE {table} SET {set_clause} WHERE typeof(start_time) = ?", (source_type,))
+        if cursor.rowcount > 0:
+            logger.info(f"Converted {cursor.rowcount} {table} rows to {config.TIMESTAMP_STORAGE} timestamps")
+
+def backfill_round_price_times(conn):
+    """Set the tick times of rounds priced before migration 3 to their boundaries.
+
+    Otherwise catch-up treats them as unpriced. Unpriced rounds hold 0
+    prices and rounds priced since then always have a tick time, so this only
+    touches old rows. Runs after convert_time_columns so seconds_sql matches
+    the storage.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        f'''
+        UPDATE rounds
+        SET starting_price_at = {seconds_sql('start_time')}
+        WHERE starting_price_at IS NULL AND starting_price != 0
+        '''
+    )
+    count = cursor.rowcount
+    cursor.execute(
+        f'''
+        UPDATE rounds
+        SET ending_price_at = {seconds_sql('lock_end')} - ?
+        WHERE ending_price_at IS NULL AND ending_price != 0
+        ''',
+        (config.ROUND_CALCULATING_SECONDS,)
+    )
+    count += cursor.rowcount
+    if count > 0:
+        logger.info(f"Backfilled {count} round price tick times")
+
+def build_schedule(first_start, num_epochs):
+    """Build epoch and round rows for num_epochs consecutive epochs.
+
+    Works on integer UTC epoch seconds in a single pass and converts each
+    value to the configured storage once. Epoch rows are
+    (start_time, end_time, lock_start, lock_end, status) and round rows are
+    (start_time, end_time, lock_start, lock_end, epoch_start_time).
+    """
+    epoch_duration = config.EPOCH_DURATION_SECONDS
+    round_duration = epoch_duration // config.ROUNDS_COUNT
+    lockdown_start_seconds = int(round_duration * (1 - config.ROUND_LOCK_PERCENTAGE))
+    last_round = config.ROUNDS_COUNT - 1
 
-def generate_epochs_and_rounds():
-    """Pregenerating epochs & rounds"""
-    logger.info("Generating future epochs and rounds")
     epochs = []
-    num_epochs = int(24*60*60/config.EPOCH_DURATION_SECONDS) #calculating number of epochs to be enough for 36 hours
-    current_start_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
-
+    rounds = []
+    epoch_start = first_start
     for _ in range(num_epochs):
-        epoch_end_time = current_start_time + timedelta(seconds=config.EPOCH_DURATION_SECONDS)
-
-        lock_start_time = current_start_time - timedelta(seconds=config.EPOCH_LOCK_SECONDS)
-        lock_end_time = current_start_time
-            
+        epoch_end = epoch_start + epoch_duration
+        epoch_key = to_db_time(epoch_start)
         epochs.append((
-            current_start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            epoch_end_time.strftime('%Y-%m-%d %H:%M:%S'),
-            lock_start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            lock_end_time.strftime('%Y-%m-%d %H:%M:%S'),
+            epoch_key,
+            to_db_time(epoch_end),
+            to_db_time(epoch_start - config.EPOCH_LOCK_SECONDS),
+            epoch_key,
             'scheduled'
         ))
-        current_start_time = epoch_end_time
-    
-    logger.info(f"Generated {len(epochs)} epochs")
-    for epoch in epochs:
-        epoch_id = insert_epoch(epoch[0],epoch[1],epoch[2],epoch[3],epoch[4])
-        if epoch_id != 0:
-            round_starts = datetime.strptime(epoch[0], "%Y-%m-%d %H:%M:%S") # epoch_start
-            epoch_end = datetime.strptime(epoch[1], "%Y-%m-%d %H:%M:%S")
-            round_duration = timedelta(seconds=config.EPOCH_DURATION_SECONDS//config.ROUNDS_COUNT)
-            rounds = [] 
-            for i in range(config.ROUNDS_COUNT):
-                lockdown_start_seconds = int(round_duration.total_seconds() * (1-config.ROUND_LOCK_PERCENTAGE)) 
-                lockdown_start = round_starts + timedelta(seconds=lockdown_start_seconds)
-                
-                lockdown_end = round_starts + round_duration  # Lockdown ends when the round ends
-                
-                round_end = lockdown_start
-                
-                # If it's the last round, ensure it ends at epoch_ends
-                if i == config.ROUNDS_COUNT - 1:
-                    lockdown_end = epoch_end
-
-                rounds.append((
-                    epoch_id,
-                    round_starts.strftime('%Y-%m-%d %H:%M:%S'),
-                    round_end.strftime('%Y-%m-%d %H:%M:%S'),
-                    lockdown_start.strftime('%Y-%m-%d %H:%M:%S'),
-                    lockdown_end.strftime('%Y-%m-%d %H:%M:%S'),
-                    0,
-                    0,
-                    'scheduled'
-                ))
-
-                round_starts = lockdown_end 
-            logger.info(f"For epoch {epoch_id} generated {len(rounds)} rounds")
-            insert_rounds(rounds)
+
+        round_start = epoch_start
+        for i in range(config.ROUNDS_COUNT):
+            lockdown_start = round_start + lockdown_start_seconds
+            # Lockdown ends when the round ends, the last round ends with the epoch
+            lockdown_end = epoch_end if i == last_round else round_start + round_duration
+            rounds.append((
+                to_db_time(round_start),
+                to_db_time(lockdown_start),  # Round (prediction window) ends when lockdown starts
+                to_db_time(lockdown_start),
+                to_db_time(lockdown_end),
+                epoch_key
+            ))
+            round_start = lockdown_end
+
+        epoch_start = epoch_end
+
+    return epochs, rounds
+
+def generate_epochs_and_rounds():
+    """Pregenerating epochs & rounds.
+
+    Covers config.SCHEDULE_HORIZON_SECONDS from the start of the current hour,
+    written in one transaction with one bulk insert per table. Slots already
+    present are skipped by the unique start_time indexes, so gaps anywhere in
+    the horizon are filled. Returns early when every slot is already there.
+    """
+    first_start = int(time.time()) // 3600 * 3600
+    num_epochs = config.SCHEDULE_HORIZON_SECONDS // config.EPOCH_DURATION_SECONDS
+    if num_epochs <= 0:
+        return 0
+    first = to_db_time(first_start)
+    last_start = to_db_time(first_start + (num_epochs - 1) * config.EPOCH_DURATION_SECONDS)
+    last_round_start = to_db_time(first_start + num_epochs * config.EPOCH_DURATION_SECONDS - 1)
+
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT
+                (SELECT COUNT(*) FROM epochs WHERE start_time >= ? AND start_time <= ?) AS epochs,
+                (SELECT COUNT(*) FROM rounds WHERE start_time >= ? AND start_time <= ?) AS rounds
+            ''',
+            (first, last_start, first, last_round_start)
+        )
+        counts = cursor.fetchone()
+        if counts['epochs'] >= num_epochs and counts['rounds'] >= num_epochs * config.ROUNDS_COUNT:
+            logger.info(f"Schedule already covers {last_start}, nothing to generate")
+            return 0
+
+        epochs, rounds = build_schedule(first_start, num_epochs)
+        cursor.executemany(
+            '''
+            INSERT INTO epochs (start_time, end_time, lock_start, lock_end, status)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(start_time) DO NOTHING
+            ''',
+            epochs
+        )
+        new_epochs = cursor.rowcount
+        cursor.executemany(
+            '''
+            INSERT INTO rounds (epoch_id, start_time, end_time, lock_start, lock_end, starting_price, ending_price, status)
+            SELECT id, ?, ?, ?, ?, 0, 0, 'scheduled' FROM epochs WHERE start_time = ?
+            ON CONFLICT(start_time) DO NOTHING
+            ''',
+            rounds
+        )
+        new_rounds = cursor.rowcount
+
+    logger.info(f"Generated {new_epochs} epochs and {new_rounds} rounds up to {last_start}")
+    return new_epochs
 
 
 # User functions
 def create_user(address):
     """Create a new user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             'INSERT OR IGNORE INTO users (address) VALUES (?)',
             (address,)
         )
-        conn.commit()
         return cursor.lastrowid
-    finally:
-        conn.close()
 
 def get_user(address):
     """Get user by address"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE address = ?', (address,))
         return cursor.fetchone()
-    finally:
-        conn.close()
 
 def get_active_epoch():
     """Get the current active epoch"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM epochs WHERE status = "active" ORDER BY id DESC LIMIT 1')
         return cursor.fetchone()
-    finally:
-        conn.close()
 
 def get_epoch_by_id(epoch_id):
     """Get epoch by ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM epochs WHERE id = ?', (epoch_id,))
         return cursor.fetchone()
-    finally:
-        conn.close()
 
 def update_epoch(epoch_id, data):
     """Update epoch data"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         set_clause = ', '.join([f'{key} = ?' for key in data.keys()])
         values = list(data.values())
         values.append(epoch_id)
@@ -325,39 +747,46 @@ def update_epoch(epoch_id, data):
             f'UPDATE epochs SET {set_clause} WHERE id = ?',
             values
         )
-        conn.commit()
         return cursor.rowcount
-    finally:
-        conn.close()
 
 def get_active_round():
     """Get the current active round"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM rounds WHERE status = "active" ORDER BY id DESC LIMIT 1')
         return cursor.fetchone()
-    finally:
-        conn.close()
 
 def get_round_by_id(round_id):
     """Get round by ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM rounds WHERE id = ?', (round_id,))
         return cursor.fetchone()
-    finally:
-        conn.close()
+
+def void_round(round_id, now=None):
+    """Give up on settling a round no price was recorded for, its predictions stay unsettled"""
+    now = time.time() if now is None else now
+    return update_round(round_id, {'voided_at': now})
+
+def get_round_times(round_id):
+    """Get round boundaries as UTC epoch seconds"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f'''
+            SELECT id, {seconds_sql('start_time')} AS start_time, {seconds_sql('lock_start')} AS lock_start,
+                   {seconds_sql('lock_end')} AS lock_end
+            FROM rounds
+            WHERE id = ?
+            ''',
+            (round_id,)
+        )
+        return cursor.fetchone()
 
 def update_round(round_id, data):
     """Update round data"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         set_clause = ', '.join([f'{key} = ?' for key in data.keys()])
         values = list(data.values())
         values.append(round_id)
@@ -366,18 +795,16 @@ def update_round(round_id, data):
             f'UPDATE rounds SET {set_clause} WHERE id = ?',
             values
         )
-        conn.commit()
         return cursor.rowcount
-    finally:
-        conn.close()
 
 # Prediction functions
 def create_prediction(user_address, round_id, direction):
-    """Create a new prediction"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    """Create a new prediction.
+
+    Returns the prediction id, or None if the user already predicted this round.
+    """
+    with db_session() as conn:
+        cursor = conn.cursor()
         # Ensure user exists
         create_user(user_address)
         
@@ -386,11 +813,16 @@ def create_prediction(user_address, round_id, direction):
         round_data = cursor.fetchone()
         epoch_id = round_data['epoch_id']
         
-        # Create prediction
+        # Create prediction, the unique (user_address, round_id) index rejects duplicates
         cursor.execute(
-            'INSERT INTO predictions (user_address, round_id, direction) VALUES (?, ?, ?)',
+            '''
+            INSERT INTO predictions (user_address, round_id, direction) VALUES (?, ?, ?)
+            ON CONFLICT(user_address, round_id) DO NOTHING
+            ''',
             (user_address, round_id, direction)
         )
+        if cursor.rowcount == 0:
+            return None
         prediction_id = cursor.lastrowid
         
         # Ensure user_epoch_stats entry exists
@@ -412,66 +844,66 @@ def create_prediction(user_address, round_id, direction):
             (user_address, epoch_id)
         )
         
-        conn.commit()
         return prediction_id
-    finally:
-        conn.close()
 
 def evaluate_predictions(round_id, correct_direction):
-    """Evaluate predictions for a round"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Get epoch_id for this round
-        cursor.execute('SELECT epoch_id FROM rounds WHERE id = ?', (round_id,))
-        round_data = cursor.fetchone()
-        epoch_id = round_data['epoch_id']
-        
-        # Mark predictions as correct/incorrect
+    """Evaluate predictions for a round.
+
+    Settles the round with a fixed number of set-based statements in one
+    transaction, whatever the number of predictions. Only predictions that
+    are not yet settled are counted, so re-running a round is a no-op.
+    The round's settled_at is set, which takes it off the lagging transitions.
+
+    Returns a dict with row counts and elapsed time.
+    """
+    started = time.perf_counter()
+    with db_session() as conn:
+        cursor = conn.cursor()
+        # Credit correct, not yet settled predictions to user_epoch_stats in one aggregate update
         cursor.execute(
             '''
-            UPDATE predictions
-            SET is_correct = (direction = ?)
-            WHERE round_id = ?
+            UPDATE user_epoch_stats
+            SET correct_predictions = correct_predictions + settled.correct
+            FROM (
+                SELECT p.user_address, r.epoch_id, COUNT(*) AS correct
+                FROM predictions p
+                JOIN rounds r ON r.id = p.round_id
+                WHERE p.round_id = ? AND p.is_correct IS NULL AND p.direction = ?
+                GROUP BY p.user_address, r.epoch_id
+            ) AS settled
+            WHERE user_epoch_stats.user_address = settled.user_address
+              AND user_epoch_stats.epoch_id = settled.epoch_id
             ''',
-            (correct_direction, round_id)
+            (round_id, correct_direction)
         )
-        
-        # Get all predictions for this round
+        users_updated = cursor.rowcount
+
+        # Mark predictions as correct/incorrect
         cursor.execute(
             '''
-            SELECT user_address, is_correct
-            FROM predictions
-            WHERE round_id = ?
+            UPDATE predictions
+            SET is_correct = (direction = ?)
+            WHERE round_id = ? AND is_correct IS NULL
             ''',
-            (round_id,)
+            (correct_direction, round_id)
         )
-        predictions = cursor.fetchall()
-        logger.info(f"Found {len(predictions)} predictions for round {round_id}")
-        # Update user_epoch_stats for correct predictions
-        for prediction in predictions:
-            if prediction['is_correct']:
-                cursor.execute(
-                    '''
-                    UPDATE user_epoch_stats
-                    SET correct_predictions = correct_predictions + 1
-                    WHERE user_address = ? AND epoch_id = ?
-                    ''',
-                    (prediction['user_address'], epoch_id)
-                )
-        
-        conn.commit()
-    finally:
-        conn.close()
+        predictions_settled = cursor.rowcount
+        cursor.execute('UPDATE rounds SET settled_at = ? WHERE id = ?', (time.time(), round_id))
+
+    result = {
+        'round_id': round_id,
+        'predictions_settled': predictions_settled,
+        'users_updated': users_updated,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+    logger.info(f"Settled round {round_id}: {predictions_settled} predictions, {users_updated} users credited in {result['elapsed_ms']} ms")
+    return result
 
 # Stats functions
 def get_user_stats(user_address, epoch_id):
     """Get user stats for an epoch"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             SELECT *
@@ -490,15 +922,11 @@ def get_user_stats(user_address, epoch_id):
                 stats['accuracy'] = 0
         
         return stats
-    finally:
-        conn.close()
 
 def get_user_epoch_stats(epoch_id):
     """Get all user stats for an epoch"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             SELECT *
@@ -508,15 +936,11 @@ def get_user_epoch_stats(epoch_id):
             (epoch_id,)
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
 def update_user_epoch_stats(stats_id, data):
     """Update user epoch stats"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         set_clause = ', '.join([f'{key} = ?' for key in data.keys()])
         values = list(data.values())
         values.append(stats_id)
@@ -525,17 +949,12 @@ def update_user_epoch_stats(stats_id, data):
             f'UPDATE user_epoch_stats SET {set_clause} WHERE id = ?',
             values
         )
-        conn.commit()
         return cursor.rowcount
-    finally:
-        conn.close()
 
 def get_leaderboard(epoch_id):
     """Get leaderboard for an epoch"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             SELECT user_address, correct_predictions, total_predictions, weight
@@ -555,75 +974,55 @@ def get_leaderboard(epoch_id):
                 entry['accuracy'] = 0
         
         return leaderboard
-    finally:
-        conn.close()
 
 def get_epochs_lock_start():
     """Get epochs lock start"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            '''
-            select id, lock_start as time 
+            f'''
+            select id, {seconds_sql('lock_start')} as time 
             from epochs
-            where lock_start > current_timestamp
-            '''
+            where lock_start > ?
+            order by lock_start
+            limit 200
+            ''',
+            (to_db_time(time.time()),)
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
-def align_epoch_status(id, from_status, to_status):
-    """Helper function that aligns statuses. In prod no alignment should be needed"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            '''
-            UPDATE epochs 
-            SET status = ? 
-            WHERE status = ?
-            ''', 
-            (to_status, from_status)
-        )
-        conn.commit()
-        count = cursor.rowcount
-        if count > 0:
-            logger.warning(f"Aligned from {from_status} to {to_status} for {count} records. This is due to id {id}. Ideally in prod alignment shouldn't be needed")
-        return cursor.rowcount
-    finally:
-        conn.close()
-                
-def align_round_status(id, from_status, to_status):
-    """Helper function that aligns statuses. In prod no alignment should be needed"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            '''
-            UPDATE rounds 
-            SET status = ? 
-            WHERE status = ?
-            ''', 
-            (to_status, from_status)
-        )
-        conn.commit()
-        count = cursor.rowcount
-        if count > 0:
-            logger.warning(f"Aligned from {from_status} to {to_status} for {count} records. This is due to id {id}. Ideally in prod alignment shouldn't be needed")
-        return cursor.rowcount
-    finally:
-        conn.close()
-                
+def _status_holder(cursor, table, id, status):
+    """Id of the row other than id holding an exclusive status, or None"""
+    if status not in EXCLUSIVE_STATUSES:
+        return None
+    cursor.execute(f'SELECT id FROM {table} WHERE status = ? AND id != ?', (status, id))
+    holder = cursor.fetchone()
+    return holder['id'] if holder else None
+
+def _advance_round_holder(cursor, id, status):
+    """Move the round other than id that holds an exclusive status on to its next lifecycle status.
+
+    A round left behind by a failed or missed transition would otherwise make
+    the transition into that status fail on its unique index. The next status
+    is freed first when it is exclusive too. Unpriced and unsettled rounds stay
+    lagging, so catch-up still prices and settles a round moved past its start
+    or calculating transition. Epochs are never moved this way since their
+    transitions have chain side effects; a leftover epoch fails the transition
+    and catch-up replays both in order.
+    """
+    holder = _status_holder(cursor, 'rounds', id, status)
+    if holder is None:
+        return
+    order = LIFECYCLE_STATUSES['rounds']
+    following = order[order.index(status) + 1]
+    _advance_round_holder(cursor, holder, following)
+    cursor.execute('UPDATE rounds SET status = ? WHERE id = ?', (following, holder))
+    logger.warning(f"Moved round {holder} from {status} to {following} for round {id}, its transition never ran")
 
 def lock_epoch(id):
     """Lock epoch"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        align_epoch_status(id, "locked", "aligned") # If in prod we will see warnings here means something is off, because statuses should be aligned even without this
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             UPDATE epochs 
@@ -632,17 +1031,12 @@ def lock_epoch(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Epoch {id} locked. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close()
 
 
 def activate_epoch(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        align_epoch_status(id, "active", "aligned")  # If in prod we will see warnings here means something is off, because statuses should be aligned even without this
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             UPDATE epochs 
@@ -651,16 +1045,11 @@ def activate_epoch(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Epoch {id} activated. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close()   
 
 def calculating_epoch(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        align_epoch_status(id, "calculating", "aligned")  # If in prod we will see warnings here means something is off, because statuses should be aligned even without this
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             UPDATE epochs 
@@ -669,15 +1058,11 @@ def calculating_epoch(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Epoch {id} calculating. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close()   
 
 def completing_epoch(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()   
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             UPDATE epochs 
@@ -686,16 +1071,12 @@ def completing_epoch(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Epoch {id} completed. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close()   
 
 def activate_round(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        align_round_status(id, "active", "aligned")  # If in prod we will see warnings here means something is off, because statuses should be aligned even without this
+    with db_session() as conn:
+        cursor = conn.cursor()
+        _advance_round_holder(cursor, id, 'active')
         cursor.execute(
             '''
             UPDATE rounds 
@@ -704,18 +1085,14 @@ def activate_round(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Round {id} activated. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close()   
 
 
 def lock_round(id):
     """Lock round"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        align_round_status(id, "locked", "aligned") # If in prod we will see warnings here means something is off, because statuses should be aligned even without this
+    with db_session() as conn:
+        cursor = conn.cursor()
+        _advance_round_holder(cursor, id, 'locked')
         cursor.execute(
             '''
             UPDATE rounds 
@@ -724,16 +1101,12 @@ def lock_round(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Rounds {id} locked. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close()
 
 def calculating_round(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        align_round_status(id, "calculating", "aligned")  # If in prod we will see warnings here means something is off, because statuses should be aligned even without this
+    with db_session() as conn:
+        cursor = conn.cursor()
+        _advance_round_holder(cursor, id, 'calculating')
         cursor.execute(
             '''
             UPDATE rounds 
@@ -742,15 +1115,11 @@ def calculating_round(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Round {id} calculating. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close()   
 
 def completing_round(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()   
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             UPDATE rounds 
@@ -759,149 +1128,277 @@ def completing_round(id):
             ''', 
             (id,)
         )
-        conn.commit()
         logger.info(f"Round {id} completed. Rowcount: {cursor.rowcount}")
-    finally:
-        conn.close() 
 
 def get_epochs_process_start():
     """Get epochs process start"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            '''
-            select id, start_time as time 
+            f'''
+            select id, {seconds_sql('start_time')} as time 
             from epochs
-            where start_time > current_timestamp
-            '''
+            where start_time > ?
+            order by start_time
+            limit 200
+            ''',
+            (to_db_time(time.time()),)
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
 def get_epochs_calculating_start():
     """Get epochs calculating start"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            '''
-            select id, end_time as time 
+            f'''
+            select id, {seconds_sql('end_time')} as time 
             from epochs
-            where end_time > current_timestamp
-            '''
+            where end_time > ?
+            order by end_time
+            limit 200
+            ''',
+            (to_db_time(time.time()),)
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
 def get_epochs_completed_start():
     """Get epochs completed start with added seconds"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
+        # The offset is applied to "now" rather than to end_time so the filter can use the index
         cursor.execute(
-            '''
-            SELECT id, datetime(end_time, ?) AS time
+            f'''
+            SELECT id, {seconds_sql('end_time')} + ? AS time
             FROM epochs
-            WHERE datetime(end_time, ?) > current_timestamp
+            WHERE end_time > ?
+            ORDER BY end_time
+            LIMIT 200
             ''',
-            (f"+{config.EPOCH_CALCULATING_SECONDS} seconds", f"+{config.EPOCH_CALCULATING_SECONDS} seconds")
+            (config.EPOCH_CALCULATING_SECONDS, to_db_time(time.time() - config.EPOCH_CALCULATING_SECONDS))
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
 def get_rounds_process_start():
     """Get rounds process start"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            '''
-            select id, start_time as time 
+            f'''
+            select id, {seconds_sql('start_time')} as time 
             from rounds
-            where start_time > current_timestamp
-            order by id
+            where start_time > ?
+            order by start_time
             limit 200
-            '''
+            ''',
+            (to_db_time(time.time()),)
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
 
 def get_rounds_lock_start():
     """Get rounds lock start"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            '''
-            select id, lock_start as time 
+            f'''
+            select id, {seconds_sql('lock_start')} as time 
             from rounds
-            where lock_start > current_timestamp
-            order by id
+            where lock_start > ?
+            order by lock_start
             limit 200
-            '''
+            ''',
+            (to_db_time(time.time()),)
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
 def get_rounds_calculating_start():
     """Get rounds calculating start with added seconds"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
+        # The offset is applied to "now" rather than to lock_end so the filter can use the index
         cursor.execute(
-            '''
-            SELECT id, datetime(lock_end, ?) AS time
+            f'''
+            SELECT id, {seconds_sql('lock_end')} - ? AS time
             FROM rounds
-            WHERE datetime(lock_end, ?) > current_timestamp
-            order by id
-            limit 200
+            WHERE lock_end > ?
+            ORDER BY lock_end
+            LIMIT 200
             ''',
-            (f"-{config.ROUND_CALCULATING_SECONDS} seconds", f"-{config.ROUND_CALCULATING_SECONDS} seconds")
+            (config.ROUND_CALCULATING_SECONDS, to_db_time(time.time() + config.ROUND_CALCULATING_SECONDS))
         )
         return cursor.fetchall()
-    finally:
-        conn.close()
 
 def get_rounds_completed_start():
     """Get rounds completed start"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            '''
-            select id, lock_end as time 
+            f'''
+            select id, {seconds_sql('lock_end')} as time 
             from rounds
-            where lock_end > current_timestamp
-            order by id
+            where lock_end > ?
+            order by lock_end
             limit 200
+            ''',
+            (to_db_time(time.time()),)
+        )
+        return cursor.fetchall()
+
+
+# Status reached by each lifecycle stage, in order
+LIFECYCLE_STATUSES = {
+    'epochs': ('scheduled', 'locked', 'active', 'calculating', 'completed'),
+    'rounds': ('scheduled', 'active', 'locked', 'calculating', 'completed'),
+}
+
+def lifecycle_transitions():
+    """Transition types as (event type, table, time column, seconds added to the column, status it sets)"""
+    return [
+        ('process_epoch_lock_start', 'epochs', 'lock_start', 0, 'locked'),
+        ('process_epoch_start', 'epochs', 'start_time', 0, 'active'),
+        ('process_epoch_calculating_start', 'epochs', 'end_time', 0, 'calculating'),
+        ('process_epoch_completed_start', 'epochs', 'end_time', config.EPOCH_CALCULATING_SECONDS, 'completed'),
+        ('process_round_start', 'rounds', 'start_time', 0, 'active'),
+        ('process_round_lock_start', 'rounds', 'lock_start', 0, 'locked'),
+        ('process_round_calculating_start', 'rounds', 'lock_end', -config.ROUND_CALCULATING_SECONDS, 'calculating'),
+        ('process_round_completed_start', 'rounds', 'lock_end', 0, 'completed'),
+    ]
+
+def get_lifecycle_transitions(start, end):
+    """Epoch and round transitions due in (start, end], as rows of time, event_type and id ordered by time.
+
+    start and end are integer UTC epoch seconds. Offsets are applied to the
+    bounds rather than to the columns so each branch can use its time index.
+    """
+    parts = []
+    params = []
+    for event_type, table, column, offset, _ in lifecycle_transitions():
+        parts.append(
+            f'''
+            SELECT {seconds_sql(column)} + ? AS time, ? AS event_type, id
+            FROM {table}
+            WHERE {column} > ? AND {column} <= ?
             '''
         )
+        params.extend([offset, event_type, to_db_time(start - offset), to_db_time(end - offset)])
+
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(' UNION ALL '.join(parts) + ' ORDER BY time', params)
         return cursor.fetchall()
-    finally:
-        conn.close()
+
+def get_lagging_transitions(start, end):
+    """Transitions due in (start, end] whose epoch or round has not reached the status they set.
+
+    Epochs whose transition side effect never finished, and rounds missing a
+    starting price or still unsettled, are included as well, so a transition
+    that failed after updating the status is picked up again, unless the
+    round was voided for lack of a price.
+    Rows carry time, event_type, id, table and the current status, ordered by time.
+    """
+    # Side effects a transition still owes after its status has moved on
+    unfinished = {
+        'process_epoch_lock_start': 'eligible_users_at IS NULL',
+        'process_epoch_calculating_start': 'weights_at IS NULL',
+        'process_epoch_completed_start': 'rewards_at IS NULL',
+        'process_round_start': 'voided_at IS NULL AND starting_price_at IS NULL',
+        'process_round_calculating_start': 'voided_at IS NULL AND settled_at IS NULL',
+    }
+    parts = []
+    params = []
+    for event_type, table, column, offset, status in lifecycle_transitions():
+        statuses = LIFECYCLE_STATUSES[table]
+        reached = statuses[statuses.index(status):]
+        lagging = f"status IS NULL OR status NOT IN ({', '.join('?' * len(reached))})"
+        if event_type in unfinished:
+            lagging += f' OR ({unfinished[event_type]})'
+        parts.append(
+            f'''
+            SELECT {seconds_sql(column)} + ? AS time, ? AS event_type, id, ? AS "table", status
+            FROM {table}
+            WHERE {column} > ? AND {column} <= ? AND ({lagging})
+            '''
+        )
+        params.extend([offset, event_type, table, to_db_time(start - offset), to_db_time(end - offset), *reached])
+
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(' UNION ALL '.join(parts) + ' ORDER BY time', params)
+        return cursor.fetchall()
+
+def set_lifecycle_statuses(table, statuses):
+    """Bulk set {id: status} on epochs or rounds. Returns the number of rows updated.
+
+    Rows moving furthest along are written first so the row leaving a status
+    frees its unique index slot before the next row takes it. A round left
+    out, such as one whose replay failed, is moved along if it holds a slot.
+    An epoch whose status is still held by one left out keeps its current
+    status, so the next catch-up replays it again.
+    """
+    order = LIFECYCLE_STATUSES[table]
+    updates = sorted(
+        ((status, id) for id, status in statuses.items()),
+        key=lambda update: order.index(update[0]),
+        reverse=True
+    )
+    updated = 0
+    with db_session() as conn:
+        cursor = conn.cursor()
+        for status, id in updates:
+            if table == 'rounds':
+                _advance_round_holder(cursor, id, status)
+            else:
+                holder = _status_holder(cursor, table, id, status)
+                if holder is not None:
+                    logger.warning(f"Epoch {id} left behind epoch {holder} holding {status}")
+                    continue
+            cursor.execute(f'UPDATE {table} SET status = ? WHERE id = ?', (status, id))
+            updated += 1
+        return updated
+
+def complete_stale_lifecycle(before):
+    """Mark epochs and rounds that finished before `before` (UTC epoch seconds) but were never completed.
+
+    Used for transitions too old to replay. Returns the number of rows updated.
+    """
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE epochs SET status = 'completed' WHERE end_time <= ? AND status IS NOT 'completed'",
+            (to_db_time(before - config.EPOCH_CALCULATING_SECONDS),)
+        )
+        count = cursor.rowcount
+        cursor.execute(
+            "UPDATE rounds SET status = 'completed' WHERE lock_end <= ? AND status IS NOT 'completed'",
+            (to_db_time(before),)
+        )
+        count += cursor.rowcount
+        if count > 0:
+            logger.warning(f"Completed {count} epochs and rounds that ended before {before} without replaying them")
+        return count
+
+def get_last_ended_epoch_id(before):
+    """Id of the latest epoch whose end_time is at or before `before` (UTC epoch seconds), or None"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT id FROM epochs WHERE end_time <= ? ORDER BY end_time DESC LIMIT 1',
+            (to_db_time(before),)
+        )
+        row = cursor.fetchone()
+        return row['id'] if row else None
 
 
 def insert_eligible_epoch_users(id, users):
-    """Inserting users that can make prediction for particular epoch."""
+    """Inserting users that can make prediction for particular epoch.
+
+    Marks the epoch's eligible users as recorded, which takes its lock off the lagging transitions.
+    """
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    logger.info(f"Inserting {len(users)} users to user_epoch for epoch {id}")
-    try:
+    with db_session() as conn:
+        cursor = conn.cursor()
+        logger.info(f"Inserting {len(users)} users to user_epoch for epoch {id}")
         cursor.executemany(
             'INSERT OR IGNORE INTO users (address) VALUES (?)',
             [(user,) for user in users]  
@@ -913,10 +1410,606 @@ def insert_eligible_epoch_users(id, users):
             'INSERT OR IGNORE INTO user_epoch (user_address, epoch_id) VALUES (?, ?)',
             user_data
         )
+        cursor.execute('UPDATE epochs SET eligible_users_at = ? WHERE id = ?', (time.time(), id))
 
-        conn.commit()
-    finally:
-        conn.close()
 
 
 
+
+
+# Price history functions
+
+# Candle resolutions in seconds, finest first
+CANDLE_RESOLUTIONS = (1, 60, 600)
+
+def insert_price_ticks(ticks):
+    """Persist a batch of (timestamp, price) ticks and fold them into the candles.
+
+    Ticks must be in chronological order. One transaction per batch with a
+    single bulk insert for the ticks and one bulk upsert per resolution.
+    """
+    if not ticks:
+        return 0
+
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            'INSERT INTO price_ticks (ts, price) VALUES (?, ?) ON CONFLICT(ts) DO NOTHING',
+            ticks
+        )
+        inserted = cursor.rowcount
+
+        for resolution in CANDLE_RESOLUTIONS:
+            candles = {}
+            for ts, price in ticks:
+                bucket = int(ts // resolution) * resolution
+                candle = candles.get(bucket)
+                if candle is None:
+                    candles[bucket] = [resolution, bucket, price, price, price, price, 1]
+                else:
+                    candle[3] = max(candle[3], price)
+                    candle[4] = min(candle[4], price)
+                    candle[5] = price
+                    candle[6] += 1
+
+            cursor.executemany(
+                '''
+                INSERT INTO price_candles (resolution, bucket, open, high, low, close, ticks)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(resolution, bucket) DO UPDATE SET
+                    high = max(high, excluded.high),
+                    low = min(low, excluded.low),
+                    close = excluded.close,
+                    ticks = ticks + excluded.ticks
+                ''',
+                list(candles.values())
+            )
+        return inserted
+
+def get_price_at(ts):
+    """Latest stored (timestamp, price) tick at or before ts, or None"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT ts, price FROM price_ticks WHERE ts <= ? ORDER BY ts DESC LIMIT 1',
+            (ts,)
+        )
+        tick = cursor.fetchone()
+        return (tick['ts'], tick['price']) if tick else None
+
+def get_price_near(ts, tolerance):
+    """Stored (timestamp, price) tick closest to ts within tolerance seconds on either side, or None"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT ts, price FROM (
+                SELECT ts, price FROM (SELECT ts, price FROM price_ticks WHERE ts <= ? ORDER BY ts DESC LIMIT 1)
+                UNION ALL
+                SELECT ts, price FROM (SELECT ts, price FROM price_ticks WHERE ts > ? ORDER BY ts LIMIT 1)
+            )
+            WHERE ts BETWEEN ? AND ?
+            ORDER BY abs(ts - ?)
+            LIMIT 1
+            ''',
+            (ts, ts, ts - tolerance, ts + tolerance, ts)
+        )
+        tick = cursor.fetchone()
+        return (tick['ts'], tick['price']) if tick else None
+
+def get_price_candles(start, end, max_points):
+    """Get candles covering [start, end] from the finest resolution with at most max_points buckets"""
+    span = max(0, end - start)
+    resolution = next(
+        (r for r in CANDLE_RESOLUTIONS if span / r <= max_points),
+        CANDLE_RESOLUTIONS[-1]
+    )
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT bucket AS time, open, high, low, close, ticks
+            FROM price_candles
+            WHERE resolution = ? AND bucket BETWEEN ? AND ?
+            ORDER BY bucket
+            ''',
+            (resolution, int(start // resolution) * resolution, end)
+        )
+        return resolution, cursor.fetchall()
+
+def prune_price_history(now=None):
+    """Apply retention: raw ticks and each candle resolution keep PRICE_TICK_RETENTION_SECONDS * resolution"""
+    now = time.time() if now is None else now
+    retention = config.PRICE_TICK_RETENTION_SECONDS
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM price_ticks WHERE ts < ?', (now - retention,))
+        deleted = cursor.rowcount
+        for resolution in CANDLE_RESOLUTIONS:
+            cursor.execute(
+                'DELETE FROM price_candles WHERE resolution = ? AND bucket < ?',
+                (resolution, now - retention * resolution)
+            )
+            deleted += cursor.rowcount
+    if deleted:
+        logger.info(f"Pruned {deleted} price history rows")
+    return deleted
+
+
+# Chain index functions
+
+def get_index_checkpoint():
+    """Last indexed block as {'number', 'hash'}, or None before the first sync"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT number, hash FROM indexer_blocks ORDER BY number DESC LIMIT 1')
+        return cursor.fetchone()
+
+def get_index_block_hashes():
+    """Recorded (number, hash) checkpoints, newest first"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT number, hash FROM indexer_blocks ORDER BY number DESC')
+        return [(row['number'], row['hash']) for row in cursor.fetchall()]
+
+# Addresses per IN (...) query, below SQLite's bound parameter limit
+ADDRESS_QUERY_CHUNK = 400
+
+def save_index_batch(events, states, block_number, block_hash):
+    """Store a batch of events, the vault_users rows they changed and the new checkpoint.
+
+    states maps address to {'is_member', 'balance', 'weight', 'updated_block'}.
+    Only the newest INDEXER_REORG_DEPTH checkpoints are kept.
+    """
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            '''
+            INSERT INTO vault_events
+                (block_number, log_index, block_hash, tx_hash, event, user_address, counterparty, value)
+            VALUES (:block_number, :log_index, :block_hash, :tx_hash, :event, :user_address, :counterparty, :value)
+            ON CONFLICT(block_number, log_index) DO NOTHING
+            ''',
+            events
+        )
+        save_vault_users(states)
+        cursor.execute(
+            'INSERT OR REPLACE INTO indexer_blocks (number, hash) VALUES (?, ?)',
+            (block_number, block_hash)
+        )
+        cursor.execute(
+            'DELETE FROM indexer_blocks WHERE number NOT IN (SELECT number FROM indexer_blocks ORDER BY number DESC LIMIT ?)',
+            (config.INDEXER_REORG_DEPTH,)
+        )
+
+def save_vault_users(states):
+    """Upsert folded vault state for the given addresses"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            '''
+            INSERT INTO vault_users (address, is_member, balance, weight, updated_block)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(address) DO UPDATE SET
+                is_member = excluded.is_member,
+                balance = excluded.balance,
+                weight = excluded.weight,
+                updated_block = excluded.updated_block
+            ''',
+            [
+                (address, int(state['is_member']), str(state['balance']), str(state['weight']), state['updated_block'])
+                for address, state in states.items()
+            ]
+        )
+
+def rewind_index(block_number):
+    """Drop everything indexed after block_number, returning the addresses whose state must be refolded"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT user_address AS address FROM vault_events WHERE block_number > ?
+            UNION
+            SELECT counterparty FROM vault_events WHERE block_number > ? AND counterparty IS NOT NULL
+            ''',
+            (block_number, block_number)
+        )
+        addresses = [row['address'] for row in cursor.fetchall()]
+        cursor.execute('DELETE FROM vault_events WHERE block_number > ?', (block_number,))
+        cursor.execute('DELETE FROM indexer_blocks WHERE number > ?', (block_number,))
+        return addresses
+
+def get_vault_events_for(addresses):
+    """All indexed events touching any of the addresses, in chain order"""
+    addresses = list(addresses)
+    events = {}
+    with db_session() as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(addresses), ADDRESS_QUERY_CHUNK):
+            chunk = addresses[i:i + ADDRESS_QUERY_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(
+                f'''
+                SELECT * FROM vault_events
+                WHERE user_address IN ({placeholders}) OR counterparty IN ({placeholders})
+                ''',
+                (*chunk, *chunk)
+            )
+            for row in cursor.fetchall():
+                events[(row['block_number'], row['log_index'])] = row
+    return [events[key] for key in sorted(events)]
+
+def _vault_state(row):
+    return {
+        'is_member': bool(row['is_member']),
+        'balance': int(row['balance']),
+        'weight': int(row['weight']),
+        'updated_block': row['updated_block']
+    }
+
+def get_vault_users(addresses):
+    """Indexed state of the given addresses, as {address: state}"""
+    addresses = list(addresses)
+    states = {}
+    with db_session() as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(addresses), ADDRESS_QUERY_CHUNK):
+            chunk = addresses[i:i + ADDRESS_QUERY_CHUNK]
+            cursor.execute(
+                f'SELECT * FROM vault_users WHERE address IN ({", ".join("?" * len(chunk))})',
+                chunk
+            )
+            states.update((row['address'], _vault_state(row)) for row in cursor.fetchall())
+    return states
+
+def get_vault_members():
+    """Indexed state of every address in the contract's users array, as {address: state}"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM vault_users WHERE is_member = 1 ORDER BY address')
+        return {row['address']: _vault_state(row) for row in cursor.fetchall()}
+
+def get_weighted_vault_users():
+    """Indexed state of every address with a non-zero weight, as {address: state}"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM vault_users WHERE weight != '0' ORDER BY address")
+        return {row['address']: _vault_state(row) for row in cursor.fetchall()}
+
+def reset_index():
+    """Forget the whole chain index so the next sync starts from INDEXER_START_BLOCK"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM vault_events')
+        cursor.execute('DELETE FROM vault_users')
+        cursor.execute('DELETE FROM indexer_blocks')
+
+
+# Weight publication functions
+
+def save_weight_publication(epoch_id, chunks):
+    """Store the chunks of an epoch's weight publication with their outbox ids, replacing an earlier one.
+
+    Marks the epoch's weights as published, in the transaction that queued the chunks when called inside it.
+    """
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM weight_publications WHERE epoch_id = ?', (epoch_id,))
+        cursor.execute('UPDATE epochs SET weights_at = ? WHERE id = ?', (time.time(), epoch_id))
+        cursor.executemany(
+            '''
+            INSERT INTO weight_publications
+                (epoch_id, chunk_index, entries, status, attempts, gas_limit, outbox_id)
+            VALUES (?, ?, ?, 'queued', 0, ?, ?)
+            ''',
+            [
+                (epoch_id, chunk['index'], chunk['entries'], chunk['gas_limit'], chunk['outbox_id'])
+                for chunk in chunks
+            ]
+        )
+
+def get_weight_publication(epoch_id):
+    """Per-chunk weight publication report of an epoch, with the live outbox status of each chunk"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT w.epoch_id, w.chunk_index, w.entries, w.outbox_id,
+                   COALESCE(o.tx_hash, w.tx_hash) AS tx_hash,
+                   COALESCE(o.status, w.status) AS status,
+                   COALESCE(o.attempts, w.attempts) AS attempts,
+                   COALESCE(o.gas_limit, w.gas_limit) AS gas_limit,
+                   COALESCE(o.gas_used, w.gas_used) AS gas_used,
+                   COALESCE(o.confirmed_at - o.created_at, w.latency_seconds) AS latency_seconds,
+                   w.created_at
+            FROM weight_publications w
+            LEFT JOIN tx_outbox o ON o.id = w.outbox_id
+            WHERE w.epoch_id = ?
+            ORDER BY w.chunk_index
+            ''',
+            (epoch_id,)
+        )
+        return cursor.fetchall()
+
+
+# Transaction outbox functions
+
+def _outbox_row(row):
+    if row is None:
+        return None
+    return {**row, 'args': json.loads(row['args']), 'tx_hashes': json.loads(row['tx_hashes'])}
+
+def enqueue_transaction(fn_name, args, reference=None, max_retries=0):
+    """Queue a call of a contract function for the outbox to send. Returns the outbox id."""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            INSERT INTO tx_outbox (reference, fn_name, args, max_retries, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ''',
+            (reference, fn_name, json.dumps(args), max_retries, time.time())
+        )
+        return cursor.lastrowid
+
+def get_outbox_transaction(outbox_id):
+    """Outbox transaction by id"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM tx_outbox WHERE id = ?', (outbox_id,))
+        return _outbox_row(cursor.fetchone())
+
+def get_outbox_transactions(statuses=None, limit=None):
+    """Outbox transactions in queue order, optionally only those in statuses"""
+    query = 'SELECT * FROM tx_outbox'
+    params = []
+    if statuses:
+        query += f' WHERE status IN ({", ".join("?" * len(statuses))})'
+        params.extend(statuses)
+    query += ' ORDER BY id'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return [_outbox_row(row) for row in cursor.fetchall()]
+
+def get_recent_outbox_transactions(limit):
+    """Newest outbox transactions first"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM tx_outbox ORDER BY id DESC LIMIT ?', (limit,))
+        return [_outbox_row(row) for row in cursor.fetchall()]
+
+def get_outbox_counts():
+    """Number of outbox transactions per status"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) AS count FROM tx_outbox GROUP BY status')
+        return {row['status']: row['count'] for row in cursor.fetchall()}
+
+def get_max_outbox_nonce():
+    """Highest nonce of a submitted outbox transaction, or None"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(nonce) AS nonce FROM tx_outbox WHERE status = 'submitted'")
+        return cursor.fetchone()['nonce']
+
+def reserve_outbox_nonce(outbox_id, nonce, fence=None):
+    """Record the nonce a queued outbox transaction is about to be sent with.
+
+    With a fence (lease name, holder, term) the nonce is only recorded while
+    that lease is still held under that term and unexpired, checked by the
+    same statement. Returns False when the fence no longer holds.
+    """
+    with db_session() as conn:
+        cursor = conn.cursor()
+        if fence is None:
+            cursor.execute('UPDATE tx_outbox SET nonce = ? WHERE id = ?', (nonce, outbox_id))
+        else:
+            name, holder, term = fence
+            cursor.execute(
+                '''
+                UPDATE tx_outbox SET nonce = ?
+                WHERE id = ? AND EXISTS (
+                    SELECT 1 FROM leases WHERE name = ? AND holder = ? AND term = ? AND expires_at > ?
+                )
+                ''',
+                (nonce, outbox_id, name, holder, term, time.time())
+            )
+        return cursor.rowcount > 0
+
+def update_outbox_transaction(outbox_id, data):
+    """Update outbox transaction fields; tx_hashes is stored as JSON"""
+    if 'tx_hashes' in data:
+        data = {**data, 'tx_hashes': json.dumps(data['tx_hashes'])}
+    with db_session() as conn:
+        cursor = conn.cursor()
+        set_clause = ', '.join([f'{key} = ?' for key in data.keys()])
+        values = list(data.values())
+        values.append(outbox_id)
+
+        cursor.execute(
+            f'UPDATE tx_outbox SET {set_clause} WHERE id = ?',
+            values
+        )
+        return cursor.rowcount
+
+
+# Epoch rewards snapshot functions
+
+def save_epoch_rewards(epoch_id, snapshot, columns):
+    """Store the chain snapshot and per-user reward columns of an epoch, replacing an earlier one.
+
+    columns come from rewards.compute_snapshot_rewards. Token amounts are
+    stored as TEXT as they exceed SQLite's 64-bit integers. Marks the epoch's
+    rewards as snapshotted.
+    """
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM epoch_rewards WHERE epoch_id = ?', (epoch_id,))
+        cursor.execute('UPDATE epochs SET rewards_at = ? WHERE id = ?', (time.time(), epoch_id))
+        cursor.execute(
+            '''
+            INSERT OR REPLACE INTO epoch_reward_snapshots
+                (epoch_id, block_number, total_mon, epoch_baseline, epoch_total_supply, epoch_rewards, users)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''',
+            (epoch_id, snapshot['block'], str(snapshot['total_mon']), str(snapshot['epoch_baseline']),
+             str(snapshot['epoch_total_supply']), str(columns['epoch_rewards']), len(columns['addresses']))
+        )
+        cursor.executemany(
+            '''
+            INSERT INTO epoch_rewards
+                (epoch_id, user_address, balance, weight, rewards, apy, annualized_apy)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''',
+            zip(
+                repeat(epoch_id), columns['addresses'], map(str, columns['balances']), map(str, columns['weights']),
+                map(str, columns['rewards']), columns['apy'], columns['annualized_apy']
+            )
+        )
+
+def get_epoch_reward_snapshot(epoch_id=None):
+    """Snapshot summary of an epoch, or of the latest snapshotted epoch"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        if epoch_id is None:
+            cursor.execute('SELECT * FROM epoch_reward_snapshots ORDER BY epoch_id DESC LIMIT 1')
+        else:
+            cursor.execute('SELECT * FROM epoch_reward_snapshots WHERE epoch_id = ?', (epoch_id,))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    for key in ('total_mon', 'epoch_baseline', 'epoch_total_supply', 'epoch_rewards'):
+        row[key] = int(row[key])
+    return row
+
+def get_epoch_rewards(epoch_id, limit, offset=0):
+    """Page of an epoch's per-user rewards by address, with the users' prediction stats"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT r.user_address, r.balance, r.weight AS vault_weight, r.rewards, r.apy, r.annualized_apy,
+                   s.correct_predictions, s.total_predictions, s.weight
+            FROM epoch_rewards r
+            LEFT JOIN user_epoch_stats s ON s.epoch_id = r.epoch_id AND s.user_address = r.user_address
+            WHERE r.epoch_id = ?
+            ORDER BY r.user_address
+            LIMIT ? OFFSET ?
+            ''',
+            (epoch_id, limit, offset)
+        )
+        rows = cursor.fetchall()
+    for row in rows:
+        row['balance'] = int(row['balance'])
+        row['vault_weight'] = int(row['vault_weight'])
+        row['rewards'] = int(row['rewards'])
+        if row['total_predictions'] is not None:
+            row['accuracy'] = row['correct_predictions'] / row['total_predictions'] if row['total_predictions'] > 0 else 0
+    return rows
+
+
+# Lifecycle run log functions
+
+def insert_lifecycle_run(run):
+    """Append one transition run as recorded by lifecycle.TransitionMetrics"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            INSERT INTO lifecycle_runs (event_type, entity_id, planned_at, started_at, lag, duration, outcome, retries, error)
+            VALUES (:event_type, :entity_id, :planned_at, :started_at, :lag, :duration, :outcome, :retries, :error)
+            ''',
+            run
+        )
+        return cursor.lastrowid
+
+def get_lifecycle_runs(limit, event_type=None):
+    """Most recent transition runs first, optionally of one event type"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        if event_type is None:
+            cursor.execute('SELECT * FROM lifecycle_runs ORDER BY started_at DESC LIMIT ?', (limit,))
+        else:
+            cursor.execute(
+                'SELECT * FROM lifecycle_runs WHERE event_type = ? ORDER BY started_at DESC LIMIT ?',
+                (event_type, limit)
+            )
+        return cursor.fetchall()
+
+def prune_lifecycle_runs(now=None):
+    """Keep SCHEDULER_RUNS_RETENTION_SECONDS of transition runs"""
+    now = time.time() if now is None else now
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM lifecycle_runs WHERE started_at < ?', (now - config.SCHEDULER_RUNS_RETENTION_SECONDS,))
+        deleted = cursor.rowcount
+    if deleted:
+        logger.info(f"Pruned {deleted} lifecycle runs")
+    return deleted
+
+
+# Lease functions
+
+def acquire_lease(name, holder, ttl, now=None):
+    """Take or renew the named lease for holder until now + ttl (UTC epoch seconds).
+
+    One upsert, so concurrent processes cannot both win: the row only changes
+    when holder already has it or the previous holder let it expire. Taking
+    an expired or released lease starts a new term, also for the holder that
+    had it, so fences from before the lapse are rejected. Returns the lease
+    row when holder has it, otherwise None.
+    """
+    now = time.time() if now is None else now
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            INSERT INTO leases (name, holder, term, acquired_at, heartbeat_at, expires_at)
+            VALUES (?, ?, 1, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                term = CASE WHEN holder = excluded.holder AND expires_at > excluded.heartbeat_at THEN term ELSE term + 1 END,
+                acquired_at = CASE WHEN holder = excluded.holder AND expires_at > excluded.heartbeat_at
+                    THEN acquired_at ELSE excluded.acquired_at END,
+                holder = excluded.holder,
+                heartbeat_at = excluded.heartbeat_at,
+                expires_at = excluded.expires_at
+            WHERE holder = excluded.holder OR expires_at <= excluded.heartbeat_at
+            ''',
+            (name, holder, now, now, now + ttl)
+        )
+        if cursor.rowcount == 0:
+            return None
+        cursor.execute('SELECT * FROM leases WHERE name = ?', (name,))
+        return cursor.fetchone()
+
+def release_lease(name, holder):
+    """Expire the lease now if holder has it, so another process can take it over without waiting"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?',
+            (name, holder)
+        )
+        return cursor.rowcount
+
+def holds_lease(name, holder, term, now=None):
+    """Whether holder still has the named lease under term, unexpired"""
+    now = time.time() if now is None else now
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT 1 FROM leases WHERE name = ? AND holder = ? AND term = ? AND expires_at > ?',
+            (name, holder, term, now)
+        )
+        return cursor.fetchone() is not None
+
+def get_lease(name):
+    """The named lease row, or None"""
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM leases WHERE name = ?', (name,))
+        return cursor.fetchone()
@@ -0,0 +1,67 @@
+import logging
+from web3 import Web3
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Subset of the Multicall3 ABI (https://github.com/mds1/multicall)
+MULTICALL3_ABI = [
+    {
+        'type': 'function',
+        'name': 'aggregate3',
+        'stateMutability': 'payable',
+        'inputs': [{
+            'name': 'calls',
+            'type': 'tuple[]',
+            'components': [
+                {'name': 'target', 'type': 'address'},
+                {'name': 'allowFailure', 'type': 'bool'},
+                {'name': 'callData', 'type': 'bytes'}
+            ]
+        }],
+        'outputs': [{
+            'name': 'returnData',
+            'type': 'tuple[]',
+            'components': [
+                {'name': 'success', 'type': 'bool'},
+                {'name': 'returnData', 'type': 'bytes'}
+            ]
+        }]
+    }
+]
+
+
+class MulticallError(Exception):
+    """Raised when a call inside a multicall batch reverted"""
+
+
+def get_multicall(w3, address):
+    """Multicall3 contract instance at address"""
+    return w3.eth.contract(address=Web3.to_checksum_address(address), abi=MULTICALL3_ABI)
+
+
+def chunks(items, size):
+    """Split items into lists of at most size elements"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def aggregate(multicall, calls, block_identifier, chunk_size):
+    """Run (target, calldata) calls through aggregate3, chunk_size calls per eth_call.
+
+    All chunks are read at block_identifier so the results form one consistent
+    snapshot. Returns the raw return data of each call in order and raises
+    MulticallError if any call reverted.
+    """
+    results = []
+    batches = chunks(calls, chunk_size)
+    for chunk in batches:
+        batch = [(target, True, calldata) for target, calldata in chunk]
+        for (success, data), (target, calldata) in zip(
+            multicall.functions.aggregate3(batch).call(block_identifier=block_identifier), chunk
+        ):
+            if not success:
+                raise MulticallError(f"Call to {target} reverted at block {block_identifier}")
+            results.append(data)
+    logger.debug(f"Multicall read {len(calls)} calls in {len(batches)} requests")
+    return results
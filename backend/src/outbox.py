@@ -0,0 +1,228 @@
+import time
+import threading
+import logging
+from web3 import Web3
+from web3.exceptions import ContractLogicError, TransactionNotFound
+from backend.src import models
+from backend.src import blockchain
+from backend.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Statuses after which a transaction is no longer processed
+FINAL_STATUSES = ('confirmed', 'reverted', 'failed')
+
+# One processing round at a time, which also serializes nonce allocation
+_process_lock = threading.Lock()
+
+# Next nonce to send with, or None to resync from the node
+_next_nonce = None
+
+
+def reset_nonce():
+    """Resync the nonce from the node before the next send"""
+    global _next_nonce
+    _next_nonce = None
+
+
+def _allocate_nonce(w3, address):
+    """Next free nonce: the local counter, or after a reset the higher of the
+    node's pending count and the nonces of transactions still in flight"""
+    global _next_nonce
+    if _next_nonce is None:
+        pending = w3.eth.get_transaction_count(address, 'pending')
+        submitted = models.get_max_outbox_nonce()
+        _next_nonce = pending if submitted is None else max(pending, submitted + 1)
+    return _next_nonce
+
+
+def _sign_and_send(w3, call, account, nonce, gas_limit, gas_price):
+    """Sign a contract call and broadcast it, returning its hash.
+
+    The hash is known before broadcasting, so a send that times out is still
+    tracked (and rebroadcast by a fee bump) instead of being sent again with a
+    new nonce.
+    """
+    tx = call.build_transaction({
+        'from': account.address,
+        'nonce': nonce,
+        'gas': gas_limit,
+        'gasPrice': gas_price
+    })
+    signed_tx = w3.eth.account.sign_transaction(tx, config.PRIVATE_KEY)
+    tx_hash = Web3.to_hex(signed_tx.hash)
+    try:
+        w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+    except ValueError:
+        # JSON-RPC error: the node rejected the transaction
+        raise
+    except Exception as e:
+        logger.warning(f"Broadcast of {tx_hash} with nonce {nonce} did not complete, tracking it anyway: {e}")
+        blockchain._handle_rpc_error(e)
+    return tx_hash
+
+
+def _get_receipt(w3, tx_hash):
+    """Receipt of tx_hash, or None while it is pending"""
+    try:
+        return w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+
+
+def _submit(w3, contract, account, tx, fence=None):
+    """Send a queued transaction with the next nonce. Returns False if the round should stop."""
+    global _next_nonce
+    call = getattr(contract.functions, tx['fn_name'])(*tx['args'])
+    attempts = tx['attempts'] + 1
+    try:
+        gas_limit = int(call.estimate_gas({'from': account.address}) * config.OUTBOX_GAS_BUFFER)
+    except ContractLogicError as e:
+        logger.error(f"Outbox transaction {tx['id']} ({tx['fn_name']}) would revert: {e}")
+        models.update_outbox_transaction(tx['id'], {'status': 'failed', 'attempts': attempts, 'last_error': str(e)})
+        return True
+
+    nonce = _allocate_nonce(w3, account.address)
+    if not models.reserve_outbox_nonce(tx['id'], nonce, fence):
+        logger.warning(f"Lease {fence[0]} term {fence[2]} no longer held, not sending outbox transaction {tx['id']}")
+        reset_nonce()
+        return False
+    gas_price = w3.eth.gas_price
+    try:
+        tx_hash = _sign_and_send(w3, call, account, nonce, gas_limit, gas_price)
+    except ValueError as e:
+        # Typically a nonce taken outside the outbox: stays queued, and later
+        # transactions wait so they keep their order after the resync
+        logger.error(f"Node rejected outbox transaction {tx['id']} with nonce {nonce}: {e}")
+        reset_nonce()
+        models.update_outbox_transaction(tx['id'], {'nonce': None, 'last_error': str(e)})
+        return False
+
+    _next_nonce = nonce + 1
+    models.update_outbox_transaction(tx['id'], {
+        'status': 'submitted',
+        'nonce': nonce,
+        'gas_limit': gas_limit,
+        'gas_price': gas_price,
+        'tx_hash': tx_hash,
+        'tx_hashes': tx['tx_hashes'] + [tx_hash],
+        'attempts': attempts,
+        'bumps': 0,
+        'submitted_at': time.time(),
+        'last_error': None
+    })
+    logger.info(f"Submitted outbox transaction {tx['id']} ({tx['fn_name']}) as {tx_hash} with nonce {nonce}")
+    return True
+
+
+def _bump(w3, contract, account, tx, fence=None):
+    """Replace a pending transaction with the same nonce and a higher gas price"""
+    if fence is not None and not models.holds_lease(*fence):
+        logger.warning(f"Lease {fence[0]} term {fence[2]} no longer held, not bumping outbox transaction {tx['id']}")
+        return
+    call = getattr(contract.functions, tx['fn_name'])(*tx['args'])
+    gas_price = max(int(tx['gas_price'] * config.OUTBOX_FEE_BUMP) + 1, w3.eth.gas_price)
+    try:
+        tx_hash = _sign_and_send(w3, call, account, tx['nonce'], tx['gas_limit'], gas_price)
+    except ValueError as e:
+        # Usually the nonce was already mined: the next receipt check settles it
+        logger.warning(f"Fee bump of outbox transaction {tx['id']} rejected: {e}")
+        models.update_outbox_transaction(tx['id'], {'submitted_at': time.time(), 'last_error': str(e)})
+        return
+
+    models.update_outbox_transaction(tx['id'], {
+        'gas_price': gas_price,
+        'tx_hash': tx_hash,
+        'tx_hashes': tx['tx_hashes'] + [tx_hash],
+        'bumps': tx['bumps'] + 1,
+        'submitted_at': time.time()
+    })
+    logger.info(f"Bumped outbox transaction {tx['id']} to gas price {gas_price} as {tx_hash}")
+
+
+def _track(w3, contract, account, tx, fence=None):
+    """Settle a submitted transaction from the receipt of any of its replacements, or bump it"""
+    receipt = None
+    for tx_hash in reversed(tx['tx_hashes']):
+        receipt = _get_receipt(w3, tx_hash)
+        if receipt is not None:
+            break
+
+    if receipt is None:
+        if time.time() - tx['submitted_at'] < config.OUTBOX_BUMP_AFTER_SECONDS:
+            return
+        if tx['bumps'] >= config.OUTBOX_MAX_BUMPS:
+            logger.warning(f"Outbox transaction {tx['id']} still pending after {tx['bumps']} fee bumps")
+            return
+        _bump(w3, contract, account, tx, fence)
+        return
+
+    data = {
+        'tx_hash': Web3.to_hex(receipt['transactionHash']),
+        'gas_used': receipt['gasUsed'],
+        'block_number': receipt['blockNumber'],
+        'confirmed_at': time.time()
+    }
+    if receipt['status'] == 1:
+        data['status'] = 'confirmed'
+        logger.info(f"Outbox transaction {tx['id']} ({tx['fn_name']}) confirmed in block {receipt['blockNumber']}")
+    elif tx['attempts'] <= tx['max_retries']:
+        # Requeued for a fresh estimate and nonce
+        data.update({'status': 'queued', 'nonce': None, 'last_error': f"Reverted in {data['tx_hash']}"})
+        logger.warning(f"Outbox transaction {tx['id']} ({tx['fn_name']}) reverted, retrying")
+    else:
+        data['status'] = 'reverted'
+        logger.error(f"Outbox transaction {tx['id']} ({tx['fn_name']}) reverted in {data['tx_hash']}")
+    models.update_outbox_transaction(tx['id'], data)
+
+
+def process(fence=None):
+    """One outbox round: settle or bump submitted transactions, then send queued ones in order.
+
+    Runs as a scheduler job, so epoch jobs only enqueue and return. With a
+    fence (lease name, holder, term) from the leader election, nothing is
+    signed once that lease is lost, so a leader that was paused past its
+    lease cannot send with nonces its successor also uses.
+    """
+    w3 = blockchain.get_web3()
+    contract = blockchain.get_contract()
+    if not w3 or not contract or not config.PRIVATE_KEY:
+        return
+    if not _process_lock.acquire(blocking=False):
+        return
+
+    try:
+        account = w3.eth.account.from_key(config.PRIVATE_KEY)
+        for tx in models.get_outbox_transactions(['submitted']):
+            _track(w3, contract, account, tx, fence)
+        for tx in models.get_outbox_transactions(['queued'], limit=config.OUTBOX_BATCH_SIZE):
+            if not _submit(w3, contract, account, tx, fence):
+                break
+    except Exception as e:
+        logger.error(f"Error processing transaction outbox: {e}")
+        blockchain._handle_rpc_error(e)
+        reset_nonce()
+    finally:
+        _process_lock.release()
+
+
+def wait_for(outbox_id, timeout):
+    """Process the outbox until outbox_id reaches a final status or timeout passes. Returns its row."""
+    deadline = time.time() + timeout
+    while True:
+        process()
+        tx = models.get_outbox_transaction(outbox_id)
+        if tx is None or tx['status'] in FINAL_STATUSES or time.time() >= deadline:
+            return tx
+        time.sleep(config.OUTBOX_POLL_SECONDS)
+
+
+def status(limit=20):
+    """Counts per status, the local nonce and the most recent transactions"""
+    return {
+        'counts': models.get_outbox_counts(),
+        'next_nonce': _next_nonce,
+        'transactions': models.get_recent_outbox_transactions(limit)
+    }
@@ -0,0 +1,126 @@
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from backend.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PriceFeed:
+    """Fixed-size ring buffer of (timestamp, price) ticks.
+
+    Filled by a background poller so request handlers and settlement never
+    call the price API themselves. Timestamps are UTC epoch seconds and must
+    increase, so the buffer stays sorted and time lookups are O(log n).
+    """
+
+    def __init__(self, size, ttl_seconds):
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+        self._timestamps = [0.0] * size
+        self._prices = [0.0] * size
+        self._start = 0
+        self._count = 0
+        self._cond = threading.Condition()
+        # Ticks not yet persisted, drained in batches by the flush job
+        self._pending = deque(maxlen=size)
+
+    def _physical(self, i):
+        return (self._start + i) % self.size
+
+    def _tick(self, i):
+        p = self._physical(i)
+        return self._timestamps[p], self._prices[p]
+
+    def _bisect_right(self, t):
+        """Index of the first tick strictly after t"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[self._physical(mid)] <= t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def record(self, price, timestamp=None):
+        """Append a tick, overwriting the oldest one when full. Out-of-order ticks are dropped."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._cond:
+            if self._count and timestamp <= self._timestamps[self._physical(self._count - 1)]:
+                return False
+            if self._count < self.size:
+                p = self._physical(self._count)
+                self._count += 1
+            else:
+                p = self._start
+                self._start = (self._start + 1) % self.size
+            self._timestamps[p] = timestamp
+            self._prices[p] = float(price)
+            self._pending.append((timestamp, float(price)))
+            self._cond.notify_all()
+            return True
+
+    def drain_pending(self):
+        """Take the ticks recorded since the last drain, oldest first"""
+        with self._cond:
+            ticks = list(self._pending)
+            self._pending.clear()
+            return ticks
+
+    def latest(self):
+        """Most recent (timestamp, price) tick, or None"""
+        with self._cond:
+            return self._tick(self._count - 1) if self._count else None
+
+    def price_at(self, t):
+        """Latest (timestamp, price) tick at or before t, or None"""
+        with self._cond:
+            i = self._bisect_right(t)
+            return self._tick(i - 1) if i else None
+
+    def closest(self, t, tolerance, wait=True):
+        """Tick closest to t, at most tolerance seconds away.
+
+        With wait, blocks until a tick at or after t arrives (or until
+        t + tolerance has passed) so a tick just after a boundary is not
+        missed because the caller ran slightly early.
+        """
+        with self._cond:
+            if wait:
+                self._cond.wait_for(
+                    lambda: self._count and self._timestamps[self._physical(self._count - 1)] >= t,
+                    timeout=max(0.0, t + tolerance - time.time())
+                )
+            i = self._bisect_right(t)
+            candidates = [self._tick(j) for j in (i - 1, i) if 0 <= j < self._count]
+
+        if not candidates:
+            return None
+        tick = min(candidates, key=lambda candidate: abs(candidate[0] - t))
+        if abs(tick[0] - t) > tolerance:
+            return None
+        return tick
+
+    def latest_quote(self):
+        """Latest price with its timestamp and age, or None if nothing was recorded yet"""
+        tick = self.latest()
+        if tick is None:
+            return None
+
+        timestamp, price = tick
+        age = max(0.0, time.time() - timestamp)
+        return {
+            'price': price,
+            'timestamp': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+            'age_seconds': round(age, 3),
+            'stale': age > self.ttl_seconds
+        }
+
+
+# Process-wide feed for config.SYMBOL
+price_feed = PriceFeed(config.PRICE_TICK_BUFFER_SIZE, config.PRICE_CACHE_TTL_SECONDS)
@@ -0,0 +1,280 @@
+import statistics
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from backend.src import httpclient
+from backend.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Quote assets recognised when a source needs the symbol split into base and quote
+QUOTE_ASSETS = ('USDT', 'USDC', 'FDUSD', 'USD', 'BTC', 'ETH')
+
+
+class PriceUnavailableError(Exception):
+    """Raised when too few sources returned a usable price before the deadline"""
+
+
+def split_symbol(symbol):
+    """Split an exchange symbol like 'MONUSDT' into ('MON', 'USDT')"""
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    raise ValueError(f"Unknown quote asset in symbol {symbol}")
+
+
+class PriceSource:
+    """A single upstream price source with its own circuit breaker and metrics.
+
+    Subclasses implement _fetch(symbol, timeout) and return the price as a float.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.breaker = httpclient.CircuitBreaker(
+            name, config.PRICE_BREAKER_FAILURES, config.PRICE_BREAKER_RESET_SECONDS
+        )
+        self.metrics = httpclient.CallMetrics()
+
+    def _fetch(self, symbol, timeout):
+        raise NotImplementedError
+
+    def fetch(self, symbol, timeout):
+        """Fetch the price, recording latency and outcome"""
+        started = time.perf_counter()
+        try:
+            price = float(self._fetch(symbol, timeout))
+            if price <= 0:
+                raise ValueError(f"Non-positive price {price}")
+        except Exception:
+            self.metrics.record(time.perf_counter() - started, ok=False)
+            self.breaker.record_failure()
+            raise
+        self.metrics.record(time.perf_counter() - started, ok=True)
+        self.breaker.record_success()
+        return price
+
+    def status(self):
+        return {'breaker_state': self.breaker.state, 'metrics': self.metrics.snapshot()}
+
+
+class HttpPriceSource(PriceSource):
+    """JSON ticker endpoint: url_for(symbol) builds the URL, parse(data) extracts the price"""
+
+    def __init__(self, name, url_for, parse, session):
+        super().__init__(name)
+        self.url_for = url_for
+        self.parse = parse
+        self.session = session
+
+    def _fetch(self, symbol, timeout):
+        response = self.session.get(self.url_for(symbol), timeout=timeout)
+        response.raise_for_status()
+        return self.parse(response.json())
+
+
+class FakePriceSource(PriceSource):
+    """Local source for tests and offline development.
+
+    delays is a sequence of per-call latencies (the last one repeats), fail
+    makes every call raise.
+    """
+
+    def __init__(self, name, price, delays=(0.0,), fail=False):
+        super().__init__(name)
+        self.price = price
+        self.delays = list(delays)
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _fetch(self, symbol, timeout):
+        with self._lock:
+            delay = self.delays[min(self.calls, len(self.delays) - 1)]
+            self.calls += 1
+        time.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise TimeoutError(f"{self.name} timed out")
+        if self.fail:
+            raise ConnectionError(f"{self.name} unavailable")
+        return self.price
+
+
+def _okx_url(symbol):
+    base, quote = split_symbol(symbol)
+    return f"https://www.okx.com/api/v5/market/ticker?instId={base}-{quote}"
+
+
+# Known HTTP sources, selected by name in config.PRICE_SOURCES
+HTTP_SOURCES = {
+    'binance': (lambda symbol: config.PRICE_API_URL + symbol, lambda data: data['price']),
+    'okx': (_okx_url, lambda data: data['data'][0]['last']),
+    'bybit': (
+        lambda symbol: f"https://api.bybit.com/v5/market/tickers?category=spot&symbol={symbol}",
+        lambda data: data['result']['list'][0]['lastPrice']
+    ),
+}
+
+
+def create_sources(names, session):
+    """Build the configured sources, 'fake:<price>' gives a local fake source"""
+    sources = []
+    for name in names:
+        if name.startswith('fake:'):
+            sources.append(FakePriceSource(name, float(name.split(':', 1)[1])))
+        elif name in HTTP_SOURCES:
+            url_for, parse = HTTP_SOURCES[name]
+            sources.append(HttpPriceSource(name, url_for, parse, session))
+        else:
+            raise ValueError(f"Unknown price source {name}")
+    return sources
+
+
+class PriceAggregator:
+    """Queries all sources concurrently and returns the median of the answers.
+
+    A source that has not answered after hedge_after seconds gets a second,
+    hedged request; whichever of the two answers first is used. Answers more
+    than max_deviation (a fraction) away from the median are dropped as
+    outliers and at least min_sources answers must remain.
+    """
+
+    def __init__(self, sources, hedge_after, max_deviation, min_sources, workers):
+        self.sources = sources
+        self.hedge_after = hedge_after
+        self.max_deviation = max_deviation
+        self.min_sources = min_sources
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='price-source')
+        self._lock = threading.Lock()
+        # Whole fetch rounds, and the rounds fetch_price retried after too few sources answered
+        self.metrics = httpclient.CallMetrics()
+        self.rounds = 0
+        self.hedges = 0
+        self.outliers = 0
+        self.unavailable = 0
+        self.last_result = None
+
+    def _collect(self, symbol, deadline):
+        """Ask every source, hedging slow ones, and return {name: price} answered before the deadline"""
+        pending = {}
+        for source in self.sources:
+            if not source.breaker.allow():
+                source.metrics.record_rejected()
+                continue
+            timeout = min(config.PRICE_API_TIMEOUT_SECONDS, max(0.0, deadline - time.time()))
+            pending[self._executor.submit(source.fetch, symbol, timeout)] = source
+
+        answers = {}
+        hedge_at = time.time() + self.hedge_after
+        hedged = False
+        while pending:
+            now = time.time()
+            if now >= deadline:
+                break
+            wake_at = deadline if hedged else min(deadline, hedge_at)
+            done, _ = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                source = pending.pop(future)
+                if source.name in answers:
+                    continue
+                try:
+                    answers[source.name] = future.result()
+                except Exception as e:
+                    logger.warning(f"Price source {source.name} failed: {e}")
+                    continue
+                # The other request to this source is no longer needed
+                for other in [f for f, s in pending.items() if s is source]:
+                    other.cancel()
+                    del pending[other]
+
+            if not hedged and time.time() >= hedge_at:
+                hedged = True
+                # Answered sources were removed from pending, failed ones are not retried here
+                for source in set(pending.values()):
+                    # Half-open circuits only get their single probe
+                    if source.breaker.state != httpclient.CircuitBreaker.CLOSED:
+                        continue
+                    timeout = min(config.PRICE_API_TIMEOUT_SECONDS, max(0.0, deadline - time.time()))
+                    pending[self._executor.submit(source.fetch, symbol, timeout)] = source
+                    source.metrics.record_retry()
+                    with self._lock:
+                        self.hedges += 1
+
+        for future in pending:
+            future.cancel()
+        return answers
+
+    def fetch(self, deadline):
+        """Aggregated price for config.SYMBOL, answered by deadline (UTC epoch seconds)"""
+        started = time.time()
+        answers = self._collect(config.SYMBOL, deadline)
+        with self._lock:
+            self.rounds += 1
+
+        if answers:
+            median = statistics.median(answers.values())
+            kept = {name: price for name, price in answers.items()
+                    if abs(price - median) <= self.max_deviation * median}
+        else:
+            kept = {}
+        dropped = sorted(set(answers) - set(kept))
+        if dropped:
+            logger.warning(f"Dropped outlier prices from {', '.join(dropped)}: {answers}")
+
+        with self._lock:
+            self.outliers += len(dropped)
+            if len(kept) < self.min_sources:
+                self.unavailable += 1
+        self.metrics.record(time.time() - started, len(kept) >= self.min_sources)
+
+        if len(kept) < self.min_sources:
+            raise PriceUnavailableError(
+                f"{len(kept)} of {len(self.sources)} price sources usable, need {self.min_sources}"
+            )
+
+        price = statistics.median(kept.values())
+        self.last_result = {
+            'price': price,
+            'sources': kept,
+            'dropped': dropped,
+            'timestamp': time.time()
+        }
+        return price
+
+    def status(self):
+        with self._lock:
+            counters = {
+                'rounds': self.rounds,
+                'hedges': self.hedges,
+                'outliers': self.outliers,
+                'unavailable': self.unavailable
+            }
+        return {
+            **counters,
+            'metrics': self.metrics.snapshot(),
+            'last_result': self.last_result,
+            'sources': {source.name: source.status() for source in self.sources}
+        }
+
+
+def create_aggregator():
+    """Aggregator over config.PRICE_SOURCES sharing one keep-alive session"""
+    session = httpclient.create_session(config.HTTP_POOL_SIZE, proxies=config.PROXY)
+    names = [name.strip() for name in config.PRICE_SOURCES.split(',') if name.strip()]
+    sources = create_sources(names, session)
+    return PriceAggregator(
+        sources,
+        hedge_after=config.PRICE_HEDGE_AFTER_SECONDS,
+        max_deviation=config.PRICE_MAX_DEVIATION,
+        min_sources=min(config.PRICE_MIN_SOURCES, len(sources)),
+        # Room for every source plus one hedge each, and slow stragglers from the previous poll
+        workers=max(config.HTTP_POOL_SIZE, 4 * len(sources))
+    )
+
+
+# Process-wide aggregator for config.SYMBOL
+price_aggregator = create_aggregator()
@@ -0,0 +1,144 @@
+import logging
+from web3 import Web3
+from backend.src import models
+from backend.src import blockchain
+from backend.src import multicall
+from backend.src import indexer
+from backend.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def chunk_size_for(gas_one, gas_probe, probe_size, gas_cap, max_size):
+    """Entries per batchUpdateUserWeights call that fit gas_cap.
+
+    Fits gas = base + per_entry * n through estimates for 1 and probe_size entries.
+    """
+    if probe_size <= 1:
+        return max(1, min(max_size, gas_cap // max(gas_one, 1)))
+    per_entry = max(1, (gas_probe - gas_one) / (probe_size - 1))
+    base = max(0, gas_one - per_entry)
+    return max(1, min(max_size, int((gas_cap - base) // per_entry)))
+
+
+def _estimate(contract, sender, chunk):
+    addresses, weights = zip(*chunk)
+    return contract.functions.batchUpdateUserWeights(list(addresses), list(weights)).estimate_gas({'from': sender})
+
+
+def publish_weights(epoch_id, addresses, weights):
+    """Queue weights for batchUpdateUserWeights in gas-sized chunks.
+
+    Chunks are sized from eth_estimateGas so each stays under
+    WEIGHT_CHUNK_GAS_FRACTION of the block gas limit, and enqueued in the
+    transaction outbox in order, which sends them with sequential nonces and
+    resends reverted ones up to WEIGHT_PUBLISH_RETRIES times.
+
+    Returns the per-epoch report (chunks are also stored in weight_publications),
+    or None when the contract or key is not available.
+    """
+    w3 = blockchain.get_web3()
+    contract = blockchain.get_contract()
+    if not w3 or not contract or not config.PRIVATE_KEY:
+        logger.error("Missing required configuration for blockchain interaction")
+        return None
+
+    entries = [(Web3.to_checksum_address(address), weight) for address, weight in zip(addresses, weights)]
+    report = {'epoch_id': epoch_id, 'entries': len(entries), 'chunks': []}
+
+    try:
+        if entries:
+            account = w3.eth.account.from_key(config.PRIVATE_KEY)
+            gas_cap = int(w3.eth.get_block('latest')['gasLimit'] * config.WEIGHT_CHUNK_GAS_FRACTION)
+            probe = entries[:config.WEIGHT_CHUNK_PROBE_SIZE]
+            size = chunk_size_for(
+                _estimate(contract, account.address, probe[:1]),
+                _estimate(contract, account.address, probe),
+                len(probe), gas_cap, config.WEIGHT_MAX_CHUNK_SIZE
+            )
+            report['chunks'] = [
+                {'index': i, 'entries': len(chunk), 'gas_limit': None, 'items': chunk}
+                for i, chunk in enumerate(multicall.chunks(entries, size))
+            ]
+            logger.info(f"Queueing {len(entries)} weights for epoch {epoch_id} in {len(report['chunks'])} chunks of up to {size}")
+    except Exception as e:
+        logger.error(f"Error sizing weight chunks for epoch {epoch_id}: {e}")
+        blockchain._handle_rpc_error(e)
+        return None
+
+    with models.db_session():
+        for chunk in report['chunks']:
+            chunk_addresses, chunk_weights = zip(*chunk.pop('items'))
+            chunk['outbox_id'] = models.enqueue_transaction(
+                'batchUpdateUserWeights', [list(chunk_addresses), list(chunk_weights)],
+                reference=f'weights:{epoch_id}:{chunk["index"]}', max_retries=config.WEIGHT_PUBLISH_RETRIES
+            )
+        models.save_weight_publication(epoch_id, report['chunks'])
+    return report
+
+
+def weight_deltas(current, target):
+    """Entries of target that differ from current, plus zeroes for dropped addresses.
+
+    current and target map checksum addresses to weights; an address missing
+    from current has weight 0. Returns (address, weight) pairs in address order.
+    """
+    deltas = {address: weight for address, weight in target.items() if current.get(address, 0) != weight}
+    for address, weight in current.items():
+        if weight and address not in target:
+            deltas[address] = 0
+    return sorted(deltas.items())
+
+
+def read_published_weights(addresses):
+    """Weights currently on the contract for addresses and every other weighted user.
+
+    Taken from the event index when it is fresh, which also knows weights of
+    addresses outside the users array. Otherwise userWeights is read through
+    Multicall3 for addresses and the users array at the latest block.
+
+    Returns (weights, source) with source 'index' or 'chain', or (None, None).
+    """
+    try:
+        if indexer.indexed_block() is not None:
+            states = models.get_weighted_vault_users()
+            states.update(models.get_vault_users(addresses))
+            return {address: state['weight'] for address, state in states.items()}, 'index'
+    except Exception as e:
+        logger.error(f"Error reading indexed weights: {e}")
+
+    try:
+        users = set(addresses) | set(blockchain.get_users())
+        weights = blockchain.read_user_weights(sorted(users))
+        return (weights, 'chain') if weights is not None else (None, None)
+    except Exception as e:
+        logger.error(f"Error reading published weights: {e}")
+        blockchain._handle_rpc_error(e)
+        return None, None
+
+
+def publish_weight_changes(epoch_id, addresses, weights):
+    """Publish only the weights that differ from what the contract holds.
+
+    Users weighted on the contract but missing from addresses are set to 0.
+    Returns the publish_weights report extended with the diff counts, or None
+    when the current weights or the publication failed.
+    """
+    target = {Web3.to_checksum_address(address): weight for address, weight in zip(addresses, weights)}
+    current, source = read_published_weights(list(target))
+    if current is None:
+        logger.error(f"Could not read published weights, not publishing epoch {epoch_id}")
+        return None
+
+    deltas = weight_deltas(current, target)
+    zeroed = sum(1 for address, weight in deltas if address not in target)
+    logger.info(
+        f"Epoch {epoch_id} weights from {source}: {len(deltas)} changed ({zeroed} zeroed), "
+        f"{len(target) - len(deltas) + zeroed} unchanged"
+    )
+    report = publish_weights(epoch_id, [address for address, _ in deltas], [weight for _, weight in deltas])
+    if report is not None:
+        report.update({'source': source, 'unchanged': len(target) - len(deltas) + zeroed, 'zeroed': zeroed})
+    return report
@@ -0,0 +1,82 @@
+from itertools import repeat
+from operator import floordiv, itemgetter, mul
+
+# Epochs per hour, used to annualize APY over 24 hours and 365 days
+EPOCHS_PER_HOUR = 6
+
+
+def compute_rewards(balances, weights, total_mon, epoch_baseline, epoch_total_supply):
+    """Apply the contract reward formula to whole columns of users at once.
+
+    balances and weights are equal-length sequences of ints (gMON shares and
+    weights). Integer math matches the contract's rounding exactly:
+
+        deposited = balance * epoch_baseline // epoch_total_supply
+        reward    = epoch_rewards * weight * deposited // sum(weight * deposited)
+
+    The loops run through map/operator on Python ints, which keeps arbitrary
+    precision while avoiding per-user bytecode. Floats are evaluated in the
+    same order as the original per-user code, so results are bit-identical.
+
+    Returns a dict with epoch_rewards and the deposited, rewards, apy and
+    annualized_apy columns.
+    """
+    count = len(balances)
+    if total_mon <= epoch_baseline:
+        return {
+            'epoch_rewards': 0,
+            'deposited': [0] * count,
+            'rewards': [0] * count,
+            'apy': [0] * count,
+            'annualized_apy': [0] * count
+        }
+
+    epoch_rewards = total_mon - epoch_baseline
+    # Without any deposit epoch_total_supply may be 0: nothing to share
+    if any(balances):
+        deposited = list(map(floordiv, map(mul, balances, repeat(epoch_baseline)), repeat(epoch_total_supply)))
+        shares = list(map(mul, weights, deposited))
+        denominator = sum(shares)
+    else:
+        deposited = [0] * count
+        denominator = 0
+
+    if denominator == 0:
+        return {
+            'epoch_rewards': epoch_rewards,
+            'deposited': deposited,
+            'rewards': [0] * count,
+            'apy': [0] * count,
+            'annualized_apy': [0] * count
+        }
+
+    rewards = list(map(floordiv, map(mul, repeat(epoch_rewards), shares), repeat(denominator)))
+    apy = [
+        reward * 100 / amount if amount > 0 else 0
+        for reward, amount in zip(rewards, deposited)
+    ]
+    annualized_apy = [value * EPOCHS_PER_HOUR * 24 * 365 for value in apy]
+    return {
+        'epoch_rewards': epoch_rewards,
+        'deposited': deposited,
+        'rewards': rewards,
+        'apy': apy,
+        'annualized_apy': annualized_apy
+    }
+
+
+def compute_snapshot_rewards(snapshot):
+    """compute_rewards over a snapshot from read_reward_snapshot.
+
+    Returns the compute_rewards columns plus the addresses, balances and
+    weights columns they line up with.
+    """
+    users = snapshot['users']
+    states = list(users.values())
+    addresses = list(users)
+    balances = list(map(itemgetter('balance'), states))
+    weights = list(map(itemgetter('weight'), states))
+    columns = compute_rewards(
+        balances, weights, snapshot['total_mon'], snapshot['epoch_baseline'], snapshot['epoch_total_supply']
+    )
+    return {'addresses': addresses, 'balances': balances, 'weights': weights, **columns}
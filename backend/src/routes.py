@@ -1,8 +1,20 @@
 from flask import Blueprint, request, jsonify
 from backend.src import models
 from backend.src import blockchain
+from backend.src import prices
+from backend.src import pricesources
+from backend.src import chaincache
+from backend.src import indexer
+from backend.src import outbox
+from backend.src import lanes
+from backend.src import tasks
+from backend.src import utils
+from backend.config import config
 from datetime import datetime
+from functools import wraps
+import hmac
 import logging
+import time
 from eth_account.messages import encode_defunct
 from web3 import Web3
 
@@ -30,6 +42,20 @@ def verify_signature(message, signature, address):
         logger.error(f"Error verifying signature: {e}")
         return False
 
+# Decorator for the operational /admin endpoints
+def admin_only(view):
+    """Serve the view only when ADMIN_ENDPOINTS_ENABLED, and with ADMIN_API_KEY set only to requests sending it"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not config.ADMIN_ENDPOINTS_ENABLED:
+            return jsonify({'error': 'Not found'}), 404
+        if config.ADMIN_API_KEY and not hmac.compare_digest(
+            request.headers.get('X-Admin-Key', '').encode(), config.ADMIN_API_KEY.encode()
+        ):
+            return jsonify({'error': 'Invalid admin key'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
 # Health check endpoint
 @api_bp.route('/health', methods=['GET'])
 def health_check():
@@ -51,7 +77,7 @@ def get_current_epoch():
     epoch['baseline'] = blockchain.get_epoch_baseline()
     epoch['total_supply'] = blockchain.get_epoch_total_supply()
     
-    return jsonify(epoch)
+    return jsonify(utils.serialize_times(epoch))
 
 @api_bp.route('/epochs/<int:epoch_id>', methods=['GET'])
 def get_epoch(epoch_id):
@@ -60,20 +86,16 @@ def get_epoch(epoch_id):
     if not epoch:
         return jsonify({'error': 'Epoch not found'}), 404
     
-    return jsonify(epoch)
+    return jsonify(utils.serialize_times(epoch))
 
 @api_bp.route('/epochs', methods=['GET'])
 def get_epochs():
     """Get all epochs"""
-    conn = models.get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with models.db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM epochs ORDER BY id DESC')
         epochs = cursor.fetchall()
-        return jsonify(epochs)
-    finally:
-        conn.close()
+        return jsonify(utils.serialize_times(epochs))
 
 # Round endpoints
 @api_bp.route('/rounds/current', methods=['GET'])
@@ -83,12 +105,55 @@ def get_current_round():
     if not round_data:
         return jsonify({'error': 'No active round found'}), 404
     
-    # Get current price
-    from backend.src.tasks import fetch_price
-    current_price = fetch_price()
-    round_data['current_price'] = current_price
+    # Get current price from the shared price feed, never from the price API on the request thread
+    quote = prices.price_feed.latest_quote()
+    round_data['current_price'] = quote['price'] if quote else None
+    round_data['price_timestamp'] = quote['timestamp'] if quote else None
+    round_data['price_age_seconds'] = quote['age_seconds'] if quote else None
+    round_data['price_stale'] = quote['stale'] if quote else True
     
-    return jsonify(round_data)
+    return jsonify(utils.serialize_times(round_data))
+
+@api_bp.route('/prices/candles', methods=['GET'])
+def get_price_candles():
+    """Get OHLC candles for a time range or a round, from the best matching resolution"""
+    # Check for unknown parameters
+    allowed_params = ['start', 'end', 'round_id', 'max_points']
+    unknown_params = [param for param in request.args.keys() if param not in allowed_params]
+    if unknown_params:
+        return jsonify({'error': f'Unknown parameter(s): {", ".join(unknown_params)}'}), 400
+    
+    try:
+        max_points = int(request.args.get('max_points', 500))
+        if max_points <= 0:
+            return jsonify({'error': 'max_points must be positive'}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid max_points format'}), 400
+    
+    if 'round_id' in request.args:
+        try:
+            round_times = models.get_round_times(int(request.args['round_id']))
+        except ValueError:
+            return jsonify({'error': 'Invalid round_id format'}), 400
+        if not round_times:
+            return jsonify({'error': 'Round not found'}), 404
+        start, end = round_times['start_time'], round_times['lock_end']
+    else:
+        try:
+            end = int(request.args.get('end', time.time()))
+            start = int(request.args.get('start', end - 3600))
+        except ValueError:
+            return jsonify({'error': 'start and end must be UTC epoch seconds'}), 400
+        if start > end:
+            return jsonify({'error': 'start must not be after end'}), 400
+    
+    resolution, candles = models.get_price_candles(start, end, max_points)
+    return jsonify({
+        'start': start,
+        'end': end,
+        'resolution': resolution,
+        'candles': candles
+    })
 
 @api_bp.route('/rounds/<int:round_id>', methods=['GET'])
 def get_round(round_id):
@@ -97,20 +162,33 @@ def get_round(round_id):
     if not round_data:
         return jsonify({'error': 'Round not found'}), 404
     
-    return jsonify(round_data)
+    return jsonify(utils.serialize_times(round_data))
+
+@api_bp.route('/epochs/<int:epoch_id>/weights', methods=['GET'])
+def get_epoch_weight_publication(epoch_id):
+    """Get the gas and latency report of an epoch's weight publication"""
+    chunks = models.get_weight_publication(epoch_id)
+    if not chunks:
+        return jsonify({'error': 'No weight publication for this epoch'}), 404
+
+    latencies = [chunk['latency_seconds'] for chunk in chunks if chunk['latency_seconds'] is not None]
+    return jsonify({
+        'epoch_id': epoch_id,
+        'entries': sum(chunk['entries'] for chunk in chunks),
+        'gas_used': sum(chunk['gas_used'] or 0 for chunk in chunks),
+        'latency_seconds': max(latencies) if latencies else None,
+        'confirmed': all(chunk['status'] == 'confirmed' for chunk in chunks),
+        'chunks': chunks
+    })
 
 @api_bp.route('/epochs/<int:epoch_id>/rounds', methods=['GET'])
 def get_epoch_rounds(epoch_id):
     """Get all rounds for an epoch"""
-    conn = models.get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with models.db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute('SELECT * FROM rounds WHERE epoch_id = ? ORDER BY id DESC', (epoch_id,))
         rounds = cursor.fetchall()
-        return jsonify(rounds)
-    finally:
-        conn.close()
+        return jsonify(utils.serialize_times(rounds))
 
 # Prediction endpoints
 @api_bp.route('/predictions', methods=['POST'])
@@ -141,28 +219,14 @@ def create_prediction():
     if round_data['status'] != 'active':
         return jsonify({'error': 'Round is not active'}), 400
     
-    # Check if user already made a prediction for this round
-    conn = models.get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute(
-            'SELECT * FROM predictions WHERE user_address = ? AND round_id = ?',
-            (data['address'], data['round_id'])
-        )
-        existing_prediction = cursor.fetchone()
-        
-        if existing_prediction:
-            return jsonify({'error': 'User already made a prediction for this round'}), 400
-    finally:
-        conn.close()
-    
-    # Create prediction
+    # Create prediction, duplicates for the same round are rejected by the insert
     prediction_id = models.create_prediction(
         data['address'],
         data['round_id'],
         data['direction']
     )
+    if prediction_id is None:
+        return jsonify({'error': 'User already made a prediction for this round'}), 400
     
     return jsonify({
         'id': prediction_id,
@@ -198,11 +262,9 @@ def create_prediction_v2():
     if not verify_signature(message, data['signature'], data['address']):
         return jsonify({'error': 'Invalid signature'}), 401
     
-    # Check if user can do prediction or already made a prediction for this round
-    conn = models.get_db_connection()
-    cursor = conn.cursor()
-
-    try:
+    # Check if user can do prediction for this round
+    with models.db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             'SELECT * FROM user_epoch WHERE user_address = ? AND epoch_id = ?',
             (data['address'], round_data['epoch_id'])
@@ -210,24 +272,15 @@ def create_prediction_v2():
         user = cursor.fetchone()
         if not user:  
             return jsonify({'error': 'User is not allowed to make a prediction for this round and epoch. Delegations has to be completed before epoch start.'}), 403
- 
-        cursor.execute(
-            'SELECT * FROM predictions WHERE user_address = ? AND round_id = ?',
-            (data['address'], data['round_id'])
+    
+        # Create prediction in the same unit of work as the check above
+        prediction_id = models.create_prediction(
+            data['address'],
+            data['round_id'],
+            data['direction']
         )
-        existing_prediction = cursor.fetchone()
-        
-        if existing_prediction:
+        if prediction_id is None:
             return jsonify({'error': 'User already made a prediction for this round'}), 400
-    finally:
-        conn.close()
-    
-    # Create prediction
-    prediction_id = models.create_prediction(
-        data['address'],
-        data['round_id'],
-        data['direction']
-    )
     
     return jsonify({
         'id': prediction_id,
@@ -237,10 +290,8 @@ def create_prediction_v2():
 @api_bp.route('/users/<address>/predictions', methods=['GET'])
 def get_user_predictions(address):
     """Get all predictions for a user"""
-    conn = models.get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with models.db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             '''
             SELECT p.*, r.starting_price, r.ending_price, r.status as round_status, e.id as epoch_id
@@ -254,16 +305,12 @@ def get_user_predictions(address):
         )
         predictions = cursor.fetchall()
         return jsonify(predictions)
-    finally:
-        conn.close()
 
 @api_bp.route('/rounds/<int:round_id>/predictions', methods=['GET'])
 def get_round_predictions(round_id):
     """Get all predictions for a round"""
-    conn = models.get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
+    with models.db_session() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             'SELECT * FROM predictions WHERE round_id = ?',
             (round_id,)
@@ -282,8 +329,6 @@ def get_round_predictions(round_id):
                 'down': down_count
             }
         })
-    finally:
-        conn.close()
 
 # User stats endpoints
 @api_bp.route('/users/<address>/stats', methods=['GET'])
@@ -306,8 +351,7 @@ def get_user_stats(address):
         }
     
     # Add contract data
-    stats['balance'] = blockchain.get_user_balance(address)
-    stats['contract_weight'] = blockchain.get_user_weight(address)
+    stats['balance'], stats['contract_weight'] = indexer.get_user_state(address)
     
     return jsonify(stats)
 
@@ -354,74 +398,115 @@ def get_contract_info():
 
 @api_bp.route('/rewards/apy', methods=['GET'])
 def get_all_rewards():
-    """Get rewards and APY for all users at the end of an epoch"""
+    """Get rewards and APY of all users, as snapshotted when an epoch completed"""
     # Check for unknown parameters
-    allowed_params = ['display_scale_factor']
+    allowed_params = ['display_scale_factor', 'epoch_id', 'page', 'per_page']
     unknown_params = [param for param in request.args.keys() if param not in allowed_params]
     if unknown_params:
         return jsonify({'error': f'Unknown parameter(s): {", ".join(unknown_params)}'}), 400
     
     # Get display_scale_factor from query parameters if provided
-    display_scale_factor = request.args.get('display_scale_factor', 10)
+    display_scale_factor = request.args.get('display_scale_factor', config.REWARDS_DISPLAY_SCALE_FACTOR)
     try:
         display_scale_factor = int(display_scale_factor)
         if display_scale_factor <= 0:
             return jsonify({'error': 'display_scale_factor must be positive'}), 400
     except ValueError:
         return jsonify({'error': 'Invalid display_scale_factor format'}), 400
-    
-    # Calculate rewards and APY for all users
-    all_rewards_data = blockchain.calculate_users_rewards_and_apy(display_scale_factor)
-    
-    if 'error' in all_rewards_data:
-        return jsonify({'error': all_rewards_data['error']}), 500
-    
-    # Get the most recent completed epoch
-    conn = models.get_db_connection()
-    cursor = conn.cursor()
-    epoch_id = None
+
     try:
-        cursor.execute(
-            'SELECT id FROM epochs WHERE status = "completed" ORDER BY id DESC LIMIT 1'
-        )
-        latest_completed = cursor.fetchone()
-        if latest_completed:
-            epoch_id = latest_completed['id']
-    finally:
-        conn.close()
-    
+        epoch_id = int(request.args['epoch_id']) if 'epoch_id' in request.args else None
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', config.REWARDS_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'epoch_id, page and per_page must be integers'}), 400
+    if page < 1 or not 1 <= per_page <= config.REWARDS_MAX_PAGE_SIZE:
+        return jsonify({'error': f'page must be positive and per_page between 1 and {config.REWARDS_MAX_PAGE_SIZE}'}), 400
+
+    # Latest snapshot unless an epoch is given
+    snapshot = models.get_epoch_reward_snapshot(epoch_id)
+    if not snapshot:
+        return jsonify({'error': 'No rewards snapshot for this epoch'}), 404
+
     # Format the response
     result = {
-        'epoch_id': epoch_id,
+        'epoch_id': snapshot['epoch_id'],
+        'block_number': snapshot['block_number'],
+        'epoch_rewards': snapshot['epoch_rewards'],
+        'page': page,
+        'per_page': per_page,
+        'total_users': snapshot['users'],
         'users': {}
     }
-    
-    # Add user stats for each user
-    for address, rewards in all_rewards_data.items():
+    for row in models.get_epoch_rewards(snapshot['epoch_id'], per_page, (page - 1) * per_page):
         user_data = {
-            'rewards': rewards['rewards'],
-            'apy': rewards['apy'],
-            'annualized_apy': rewards['annualized_apy'],
-            'display_apy': rewards['display_apy']
+            'rewards': row['rewards'],
+            'apy': row['apy'],
+            'annualized_apy': row['annualized_apy'],
+            'display_apy': row['annualized_apy'] * display_scale_factor
         }
-        
-        # Get user stats if epoch_id is available
-        if epoch_id:
-            stats = models.get_user_stats(address, epoch_id)
-            if stats:
-                user_data.update({
-                    'correct_predictions': stats['correct_predictions'],
-                    'total_predictions': stats['total_predictions'],
-                    'accuracy': stats.get('accuracy', 0),
-                    'weight': stats['weight']
-                })
-        
-        result['users'][address] = user_data
-    
-    # Add total rewards information
-    if all_rewards_data and len(all_rewards_data) > 0:
-        # All users have the same epoch_rewards value, so just get it from the first user
-        first_user = next(iter(all_rewards_data))
-        result['epoch_rewards'] = all_rewards_data[first_user]['epoch_rewards']
-    
-    return jsonify(result)
+        if row['total_predictions'] is not None:
+            user_data.update({
+                'correct_predictions': row['correct_predictions'],
+                'total_predictions': row['total_predictions'],
+                'accuracy': row['accuracy'],
+                'weight': row['weight']
+            })
+        result['users'][row['user_address']] = user_data
+
+    # Snapshots never change, only the latest one moves on
+    response = jsonify(result)
+    response.cache_control.public = True
+    response.cache_control.max_age = config.REWARDS_CACHE_SECONDS if epoch_id is None else config.REWARDS_EPOCH_CACHE_SECONDS
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@api_bp.route('/admin/price-feed', methods=['GET'])
+@admin_only
+def get_price_feed_status():
+    """Get price source metrics, circuit breaker states and the latest quote"""
+    return jsonify({
+        **pricesources.price_aggregator.status(),
+        'latest': prices.price_feed.latest_quote()
+    })
+
+
+@api_bp.route('/admin/chain-cache', methods=['GET'])
+@admin_only
+def get_chain_cache_status():
+    """Get the block-pinned contract read cache counters"""
+    return jsonify(chaincache.contract_cache.status())
+
+
+@api_bp.route('/admin/outbox', methods=['GET'])
+@admin_only
+def get_outbox_status():
+    """Get transaction outbox counts, the local nonce and recent transactions"""
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify(outbox.status(limit))
+
+
+@api_bp.route('/admin/lanes', methods=['GET'])
+@admin_only
+def get_lanes_status():
+    """Get queue depth, concurrency and wait times of the scheduler lanes"""
+    return jsonify(lanes.status())
+
+
+@api_bp.route('/admin/scheduler', methods=['GET'])
+@admin_only
+def get_scheduler_status():
+    """Get upcoming transitions, start lag and misfires per transition type and recent runs"""
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    return jsonify(tasks.scheduler_status(limit))
+
+
+@api_bp.route('/admin/outbox/<int:outbox_id>', methods=['GET'])
+@admin_only
+def get_outbox_transaction(outbox_id):
+    """Get the status of one outbox transaction"""
+    tx = models.get_outbox_transaction(outbox_id)
+    if not tx:
+        return jsonify({"error": "Transaction not found"}), 404
+    return jsonify(tx)
@@ -1,9 +1,17 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 import time
-import requests
 import logging
 from backend.src import models
 from backend.src import blockchain
+from backend.src import prices
+from backend.src import pricesources
+from backend.src import indexer
+from backend.src import publisher
+from backend.src import outbox
+from backend.src import rewards
+from backend.src import lifecycle
+from backend.src import lanes
+from backend.src import leader
 from backend.config import config
 from datetime import datetime, timezone
 import backoff
@@ -17,24 +25,74 @@ logger = logging.getLogger(__name__)
 # Global variable to track if scheduler is initialized
 scheduler = None
 
-@backoff.on_exception(backoff.expo, Exception, max_tries=10, jitter=backoff.full_jitter)
-def fetch_price():
-    """Fetch current symbol price from an API with retries using backoff"""
+def fetch_price(deadline=None):
+    """Fetch the current symbol price, aggregated over config.PRICE_SOURCES.
+
+    deadline is a UTC epoch-second timestamp, by default PRICE_FETCH_DEADLINE_SECONDS
+    from now. When too few sources answer, the whole round is retried with
+    backoff as long as the retry fits before the deadline.
+    """
+    if deadline is None:
+        deadline = time.time() + config.PRICE_FETCH_DEADLINE_SECONDS
+    delays = backoff.expo()
+    next(delays)  # backoff wait generators must be primed
+
+    while True:
+        try:
+            price = pricesources.price_aggregator.fetch(deadline)
+        except pricesources.PriceUnavailableError as e:
+            logger.error(f"Error fetching price: {e}")
+            delay = backoff.full_jitter(next(delays))
+            if time.time() + delay >= deadline:
+                raise
+            pricesources.price_aggregator.metrics.record_retry()
+            time.sleep(delay)
+            continue
+
+        logger.debug(f"Fetched {config.SYMBOL} price: ${price}")
+        return price
+
+def poll_price():
+    """Fetch the current price into the shared price feed"""
     try:
-        symbol = config.SYMBOL
-        response = requests.get(config.PRICE_API_URL + symbol, proxies=config.PROXY, timeout=5)
-        response.raise_for_status()
-
-        data = response.json()
-        if 'price' in data:
-            price = data['price']
-            logger.info(f"Fetched {symbol} price: ${price}")
-            return price
-        else:
-            raise ValueError("Invalid response format")
+        # A poll is only useful until the next one is due
+        prices.price_feed.record(fetch_price(deadline=time.time() + config.PRICE_POLL_SECONDS))
     except Exception as e:
-        logger.error(f"Error fetching price: {e}")
-        raise 
+        logger.error(f"Error polling price: {e}")
+
+def flush_price_ticks():
+    """Persist the ticks polled since the last flush in one batch"""
+    ticks = prices.price_feed.drain_pending()
+    try:
+        models.insert_price_ticks(ticks)
+    except Exception as e:
+        logger.error(f"Error persisting {len(ticks)} price ticks: {e}")
+
+def capture_price(boundary):
+    """Price a round boundary (UTC epoch seconds) from the tick closest to it.
+
+    Falls back to a live fetch when the feed has no tick within
+    PRICE_TICK_TOLERANCE_SECONDS, bounded by PRICE_BOUNDARY_DEADLINE_SECONDS
+    after the boundary. Returns (tick_timestamp, price).
+    """
+    tick = prices.price_feed.closest(boundary, config.PRICE_TICK_TOLERANCE_SECONDS)
+    if tick is None:
+        logger.warning(f"No price tick within {config.PRICE_TICK_TOLERANCE_SECONDS}s of {boundary}, fetching live")
+        price = float(fetch_price(deadline=boundary + config.PRICE_BOUNDARY_DEADLINE_SECONDS))
+        tick = (time.time(), price)
+        prices.price_feed.record(price, tick[0])
+    return tick
+
+def stored_price(boundary):
+    """Price a past round boundary from recorded ticks only, or None when there is no tick near it.
+
+    The in-memory feed is checked first since its latest ticks may not be
+    flushed yet, then the stored price history within CATCHUP_PRICE_TOLERANCE_SECONDS.
+    """
+    tick = prices.price_feed.closest(boundary, config.PRICE_TICK_TOLERANCE_SECONDS)
+    if tick is None:
+        tick = models.get_price_near(boundary, config.CATCHUP_PRICE_TOLERANCE_SECONDS)
+    return tick
 
 def process_epoch_lock_start(id):
     """Epoch lock start.
@@ -44,8 +102,26 @@ def process_epoch_lock_start(id):
     """
     logger.info(f"Locking epoch: {id}")
     models.lock_epoch(id)
-    users = blockchain.get_users()
-    models.insert_eligible_epoch_users(id, users)
+    # getUsers may be slow, it runs on the chain lane so round transitions are not held up
+    submit_transition_work(insert_eligible_users, id)
+
+def submit_transition_work(fn, *args):
+    """Queue a transition's side effect on the chain lane.
+
+    The side effect marks its epoch when it finishes; until then the
+    transition stays lagging, so catch-up retries it when the task fails.
+    A side effect already queued or running for the same epoch is not queued
+    again. Raises when the lane refuses it because it is stopping.
+    """
+    key = f'{fn.__name__}:{args[0]}'
+    if lanes.chain_lane.submit(fn, *args, priority=lanes.PRIORITY_TRANSITION, key=key):
+        return
+    if not lanes.chain_lane.pending(key):
+        raise RuntimeError(f"Chain lane refused {fn.__name__} for id {args[0]}")
+
+def insert_eligible_users(id):
+    """Store the current vault users as eligible for the epoch"""
+    models.insert_eligible_epoch_users(id, indexer.get_users())
 
 def process_epoch_start(id):
     """Epoch start.
@@ -55,23 +131,18 @@ def process_epoch_start(id):
     logger.info(f"Activating epoch: {id}")
     models.activate_epoch(id)
 
-def process_epoch_calculating_start(id):
-    """Epoch calculating.
+def compute_epoch_weights(id):
+    """Weight every user of the epoch by their share of correct predictions.
 
-    Setting epoch to calculating
-    Calculating and pushing weights to smart contract
+    Stores each weight in user_epoch_stats and returns (addresses, weights).
     """
-    logger.info(f"Calculating epoch: {id}")
-    models.calculating_epoch(id)
-
     user_stats = models.get_user_epoch_stats(id)
-    
+    addresses = []
+    weights = []
+
     if user_stats:
         total_correct = sum(stat['correct_predictions'] for stat in user_stats)
         if total_correct > 0:
-            addresses = []
-            weights = []
-            
             for stat in user_stats:
                 # Simple weight calculation: correct_predictions / total_correct * 100
                 # This gives a percentage weight based on relative performance
@@ -88,36 +159,90 @@ def process_epoch_calculating_start(id):
                 weights.append(weight)
             
             logger.info(f"Calculated weights for {len(addresses)} users")
-            
-            # Update weights on contract
-            if addresses and weights:
-                logger.info(f"{addresses}. {weights}. Will update blockchain")
-                success = blockchain.update_user_weights(addresses, weights)
-                if success:
-                    logger.info("Successfully updated weights on contract")
-                else:
-                    logger.error("Failed to update weights on contract")
     else:
         logger.info(f"There are no user statistics for epoch {id}")
 
+    return addresses, weights
+
+def publish_epoch_weights(id):
+    """Calculate the weights of the epoch and queue the changes for the contract.
+
+    Raises when they could not be queued, leaving the epoch's weights due for catch-up.
+    """
+    # Catch-up may have queued this again while an earlier run was finishing
+    if models.get_epoch_by_id(id)['weights_at'] is not None:
+        return None
+    addresses, weights = compute_epoch_weights(id)
+    # Only changed weights are sent; users without a weight this epoch are zeroed.
+    # The outbox job sends and confirms the queued transactions.
+    report = publisher.publish_weight_changes(id, addresses, weights)
+    if report is None:
+        raise RuntimeError(f"Failed to queue weight updates of epoch {id} for the contract")
+    logger.info(f"Queued {report['entries']} weight changes in {len(report['chunks'])} transactions")
+    return report
+
+def process_epoch_calculating_start(id):
+    """Epoch calculating.
+
+    Setting epoch to calculating
+    Calculating and pushing weights to smart contract
+    """
+    logger.info(f"Calculating epoch: {id}")
+    models.calculating_epoch(id)
+    # Weights are calculated on the chain lane too, so round transitions are not held up
+    submit_transition_work(publish_epoch_weights, id)
+
+def snapshot_epoch_rewards(id):
+    """Read the vault state in bulk, compute every user's rewards and APY and store them for the epoch.
+
+    Raises when the snapshot could not be taken, leaving it due for catch-up.
+    """
+    try:
+        snapshot = indexer.read_reward_snapshot()
+    except Exception as e:
+        blockchain._handle_rpc_error(e)
+        raise
+    if snapshot is None:
+        raise RuntimeError(f"Contract not available, no rewards snapshot for epoch {id}")
+    columns = rewards.compute_snapshot_rewards(snapshot)
+    models.save_epoch_rewards(id, snapshot, columns)
+    logger.info(f"Stored rewards of {len(columns['addresses'])} users for epoch {id} at block {snapshot['block']}")
+    return columns
+
 def process_epoch_completed_start(id):
     """Epoch completed.
     
-    Setting epoch to complete"""
+    Setting epoch to complete
+    Storing the rewards and APY snapshot served by /api/rewards/apy"""
     logger.info(f"Completing epoch {id}")
     models.completing_epoch(id)
+    submit_transition_work(snapshot_epoch_rewards, id)
 
 def process_round_start(id):
     """Round start.
     
     Setting round to active
-    Fetching initial token price
-    Storing token price to DB
+    Taking the initial token price from the price feed tick closest to the boundary
+    Storing token price and tick time to DB
     """
     logger.info(f"Activating round: {id}")
     models.activate_round(id)
-    current_price = fetch_price()
-    models.update_round(id, {'starting_price': current_price})
+    price_round_start(id, capture_price)
+
+def price_round_start(id, capture):
+    """Store the starting price of a round from capture(boundary) -> (tick_time, price) or None.
+
+    capture raises when no price is available yet, and returns None only
+    once it voided the round; nothing is stored then.
+    """
+    boundary = models.get_round_times(id)['start_time']
+    tick = capture(boundary)
+    if tick is None:
+        return None
+    tick_time, current_price = tick
+    models.update_round(id, {'starting_price': current_price, 'starting_price_at': tick_time})
+    logger.info(f"Round {id} starting price {current_price} from tick at {tick_time} ({tick_time - boundary:+.3f}s from boundary)")
+    return current_price
 
 
 def process_round_lock_start(id):
@@ -132,18 +257,27 @@ def process_round_calculating_start(id):
     """Round calculating.
 
     Setting epoch to calculating
-    Fetching initial token price
-    Storing token price to DB
+    Taking the final token price from the price feed tick closest to the boundary
+    Storing token price and tick time to DB
     Fetching active round
     Determing direction of token movement
     Evaluating predictions
     """
     logger.info(f"Calculating round: {id}")
     models.calculating_round(id)
-    final_price = fetch_price()
-    models.update_round(id, {'ending_price': final_price})
+    boundary = models.get_round_times(id)['lock_end'] - config.ROUND_CALCULATING_SECONDS
+    tick_time, final_price = capture_price(boundary)
+    models.update_round(id, {'ending_price': final_price, 'ending_price_at': tick_time})
+    if models.get_round_by_id(id)['starting_price_at'] is None:
+        # Settling against the default 0 price would make every round 'up'; catch-up settles it once priced
+        logger.warning(f"Round {id} has no starting price, predictions left for catch-up")
+        return
+    settle_round(id, final_price)
+
+def settle_round(id, final_price):
+    """Evaluate the round's predictions against its starting price"""
     active_round = models.get_round_by_id(id)
-    direction = 'up' if float(final_price) > active_round['starting_price'] else 'down'
+    direction = 'up' if final_price > active_round['starting_price'] else 'down'
     models.evaluate_predictions(id, direction)
     logger.info(f"Round {id} result: {direction} (start: {active_round['starting_price']}, end: {final_price})")
 
@@ -158,44 +292,264 @@ def process_round_completed_start(id):
     models.completing_round(id)
 
 
-def refresh_scheduled_jobs():
-    """Refresh the scheduler with new jobs from DB."""
-    jobs = {
-        "process_epoch_lock_start": models.get_epochs_lock_start,
-        "process_epoch_start": models.get_epochs_process_start,
-        "process_epoch_calculating_start": models.get_epochs_calculating_start,
-        "process_epoch_completed_start": models.get_epochs_completed_start,
-        "process_round_start": models.get_rounds_process_start,
-        "process_round_lock_start": models.get_rounds_lock_start,
-        "process_round_calculating_start": models.get_rounds_calculating_start,
-        "process_round_completed_start": models.get_rounds_completed_start, 
+def replay_price(id, now):
+    """Capture for catch-up of round id: the recorded tick near its boundary.
+
+    Raises PriceUnavailableError while a tick within CATCHUP_PRICE_TOLERANCE_SECONDS
+    may still be flushed, so the transition stays due. Past that no tick can
+    show up anymore: the round is voided and None returned.
+    """
+    def capture(boundary):
+        tick = stored_price(boundary)
+        if tick is not None:
+            return tick
+        if now - boundary <= config.CATCHUP_PRICE_TOLERANCE_SECONDS + config.PRICE_TICK_FLUSH_SECONDS:
+            raise pricesources.PriceUnavailableError(f"No price recorded yet for round {id} at {boundary}")
+        models.void_round(id, now)
+        logger.warning(f"No price recorded for round {id} at {boundary}, voided with its predictions unsettled")
+        return None
+    return capture
+
+def replay_round_start(id, now):
+    """Price the start of a missed round from stored history"""
+    round = models.get_round_by_id(id)
+    if round['starting_price_at'] is None and round['voided_at'] is None:
+        price_round_start(id, replay_price(id, now))
+
+def replay_round_calculating(id, now):
+    """Price the end of a missed round from stored history and settle it"""
+    round = models.get_round_by_id(id)
+    if round['voided_at'] is not None or round['settled_at'] is not None:
+        return
+    if round['ending_price_at'] is None:
+        boundary = models.get_round_times(id)['lock_end'] - config.ROUND_CALCULATING_SECONDS
+        tick = replay_price(id, now)(boundary)
+        if tick is None:
+            return
+        models.update_round(id, {'ending_price': tick[1], 'ending_price_at': tick[0]})
+        round = models.get_round_by_id(id)
+    if round['starting_price_at'] is None:
+        # Its start replay failed, both stay due until it is priced or voided
+        raise pricesources.PriceUnavailableError(f"Round {id} has no starting price yet")
+    settle_round(id, round['ending_price'])
+
+def skip_epoch_side_effect(id, column, now):
+    """Mark a side effect of an epoch superseded by a later one as done without running it"""
+    models.update_epoch(id, {column: now})
+    logger.warning(f"Skipped {column.removesuffix('_at')} of epoch {id}, a later epoch superseded it")
+
+def catch_up_transitions(now=None):
+    """Replay every epoch and round transition that is due but never ran.
+
+    Covers transitions missed while the process was down, transitions that
+    failed and epoch side effects that failed on the chain lane. Transitions
+    are replayed in time order with the side effects of the live handlers
+    that never finished; each epoch and round then gets its final status in
+    one bulk update. Round prices come from recorded ticks, never a live fetch.
+    Weights are only published, and rewards only snapshotted, for the latest
+    epoch, since the contract state of older epochs is gone; older epochs are
+    marked as skipped. Transitions older than CATCHUP_LOOKBACK_SECONDS are not
+    replayed, their rows are completed.
+
+    Returns the number of transitions replayed.
+    """
+    now = int(time.time() if now is None else now)
+    since = now - config.CATCHUP_LOOKBACK_SECONDS
+    models.complete_stale_lifecycle(since)
+    transitions = models.get_lagging_transitions(since, now)
+    if not transitions:
+        return 0
+
+    transitions.sort(key=lambda row: (row['time'], lifecycle.TRANSITION_RANK[row['event_type']]))
+    logger.warning(f"Replaying {len(transitions)} missed lifecycle transitions up to {now}")
+
+    targets = {event_type: status for event_type, _, _, _, status in models.lifecycle_transitions()}
+    statuses = {'epochs': {}, 'rounds': {}}
+    failed = set()
+    latest = models.get_last_ended_epoch_id(now)
+    latest_completed = models.get_last_ended_epoch_id(now - config.EPOCH_CALCULATING_SECONDS)
+    for row in transitions:
+        event_type, id = row['event_type'], row['id']
+        started = time.time()
+        outcome, error = 'replayed', None
+        try:
+            if event_type == 'process_epoch_lock_start':
+                if models.get_epoch_by_id(id)['eligible_users_at'] is None:
+                    submit_transition_work(insert_eligible_users, id)
+            elif event_type == 'process_epoch_calculating_start':
+                if models.get_epoch_by_id(id)['weights_at'] is None:
+                    if id == latest:
+                        submit_transition_work(publish_epoch_weights, id)
+                    else:
+                        compute_epoch_weights(id)
+                        skip_epoch_side_effect(id, 'weights_at', now)
+            elif event_type == 'process_epoch_completed_start':
+                if models.get_epoch_by_id(id)['rewards_at'] is None:
+                    if id == latest_completed:
+                        submit_transition_work(snapshot_epoch_rewards, id)
+                    else:
+                        skip_epoch_side_effect(id, 'rewards_at', now)
+            elif event_type == 'process_round_start':
+                replay_round_start(id, now)
+            elif event_type == 'process_round_calculating_start':
+                replay_round_calculating(id, now)
+        except Exception as e:
+            outcome, error = 'failed', str(e)
+            failed.add((row['table'], id))
+            logger.error(f"Error replaying {event_type} for id {id}: {e}")
+        lifecycle_driver.record_run(event_type, id, row['time'], started, time.time(), outcome, error)
+        # Each row ends at the furthest status among its current one and the replayed transitions
+        order = models.LIFECYCLE_STATUSES[row['table']]
+        table_statuses = statuses[row['table']]
+        current = table_statuses.get(id, row['status'])
+        rank = order.index(current) if current in order else -1
+        if order.index(targets[event_type]) > rank:
+            table_statuses[id] = targets[event_type]
+
+    # A row whose replay failed keeps its status, so the next catch-up replays it again
+    for table, id in failed:
+        statuses[table].pop(id, None)
+    for table, table_statuses in statuses.items():
+        models.set_lifecycle_statuses(table, table_statuses)
+
+    logger.info(f"Replayed {len(transitions)} lifecycle transitions")
+    return len(transitions)
+
+
+def in_lane(lane, fn):
+    """Scheduler job that only queues fn on the lane, skipped while a previous run is still pending"""
+    return partial(lane.submit, fn, key=fn.__name__)
+
+def record_lifecycle_run(run):
+    """Append a transition run to the lifecycle_runs table from the db lane"""
+    lanes.db_lane.submit(models.insert_lifecycle_run, run)
+
+def generate_schedule():
+    """Generate upcoming epochs and rounds, then have the lifecycle driver pick them up."""
+    models.generate_epochs_and_rounds()
+    lifecycle_driver.reload()
+
+
+# Drives every epoch and round transition from a deadline heap on its own thread
+lifecycle_driver = lifecycle.LifecycleDriver(
+    {
+        "process_epoch_lock_start": process_epoch_lock_start,
+        "process_epoch_start": process_epoch_start,
+        "process_epoch_calculating_start": process_epoch_calculating_start,
+        "process_epoch_completed_start": process_epoch_completed_start,
+        "process_round_start": process_round_start,
+        "process_round_lock_start": process_round_lock_start,
+        "process_round_calculating_start": process_round_calculating_start,
+        "process_round_completed_start": process_round_completed_start,
+    },
+    config.LIFECYCLE_HORIZON_SECONDS,
+    config.LIFECYCLE_REFRESH_SECONDS,
+    catch_up=catch_up_transitions,
+    catch_up_seconds=config.CATCHUP_INTERVAL_SECONDS,
+    metrics=lifecycle.TransitionMetrics(config.SCHEDULER_MISFIRE_SECONDS),
+    on_run=record_lifecycle_run
+)
+
+def scheduler_status(limit=20):
+    """Upcoming transitions, per type lag and misfire metrics, recent runs, periodic jobs and the election.
+
+    Transition state is this process's; `leader` tells whether it is the one driving them.
+    """
+    now = time.time()
+    driver = lifecycle_driver.status(limit)
+    for transition in driver['upcoming']:
+        transition['in_seconds'] = round(transition['time'] - now, 3)
+    periodic = []
+    if scheduler is not None:
+        for job in scheduler.get_jobs():
+            periodic.append({
+                'id': job.id,
+                'next_run_time': job.next_run_time.timestamp() if job.next_run_time else None
+            })
+    return {
+        'driver': {key: value for key, value in driver.items() if key != 'upcoming'},
+        'upcoming': driver['upcoming'],
+        'transitions': lifecycle_driver.metrics.status(),
+        'recent_runs': models.get_lifecycle_runs(limit),
+        'periodic_jobs': periodic,
+        'lanes': lanes.status(),
+        'leader': leader_elector.status()
     }
 
-    for event_type, get_function in jobs.items():
-        data = get_function()
 
-        for item in data:
-            id = item["id"]
-            job_id = f"{event_type}_{id}"
-            
-            event_datetime = datetime.strptime(item["time"], "%Y-%m-%d %H:%M:%S")
+# Jobs that must run in exactly one process: they write shared state or send transactions
+LEADER_JOB_IDS = (
+    'generate_epochs_and_rounds',
+    'index_vault_events',
+    'process_outbox',
+    'flush_price_ticks',
+    'prune_price_history',
+    'prune_lifecycle_runs',
+)
+
+def start_leader_duties():
+    """Add the leader-only jobs and start the lifecycle driver"""
+    # The previous leader may have sent transactions this process has not seen
+    outbox.reset_nonce()
+
+    # Generating epochs and rounds
+    scheduler.add_job(in_lane(lanes.db_lane, generate_schedule), 'cron', minute=11, second=0, id='generate_epochs_and_rounds', replace_existing=True) # Will run every hour at xx:11 min
+
+    # Following PredictVault events into the local users/balances/weights index
+    if config.INDEXER_ENABLED:
+        scheduler.add_job(in_lane(lanes.chain_lane, indexer.sync), 'interval', seconds=config.INDEXER_POLL_SECONDS, id='index_vault_events', max_instances=1, coalesce=True, next_run_time=datetime.now(timezone.utc), replace_existing=True)
+
+    # Sending queued contract transactions and tracking their receipts
+    scheduler.add_job(in_lane(lanes.chain_lane, process_outbox), 'interval', seconds=config.OUTBOX_POLL_SECONDS, id='process_outbox', max_instances=1, coalesce=True, next_run_time=datetime.now(timezone.utc), replace_existing=True)
 
-            if event_type in globals():
-                if callable(globals()[event_type]):
-                    process_function = partial(globals()[event_type], id)
+    # Persisting polled ticks in batches and applying retention
+    scheduler.add_job(in_lane(lanes.db_lane, flush_price_ticks), 'interval', seconds=config.PRICE_TICK_FLUSH_SECONDS, id='flush_price_ticks', max_instances=1, coalesce=True, replace_existing=True)
+    scheduler.add_job(in_lane(lanes.db_lane, models.prune_price_history), 'cron', minute=17, id='prune_price_history', replace_existing=True) # Will run every hour at xx:17 min
+    scheduler.add_job(in_lane(lanes.db_lane, models.prune_lifecycle_runs), 'cron', minute=19, id='prune_lifecycle_runs', replace_existing=True) # Will run every hour at xx:19 min
 
-                    if not scheduler.get_job(job_id):
-                        scheduler.add_job(
-                            process_function, 
-                            "date", 
-                            run_date=event_datetime, 
-                            id=job_id
-                        )
-                        logger.info(f"Scheduled {event_type} for id {id} at {event_datetime}")
+    # Epoch and round transitions run on the lifecycle driver rather than as per-event date jobs
+    lifecycle_driver.start()
+    logger.info("Leader duties started")
+
+def stop_leader_duties():
+    """Stop the lifecycle driver, remove the leader-only jobs and let chain work in flight finish"""
+    lifecycle_driver.stop()
+    if scheduler is not None:
+        for job_id in LEADER_JOB_IDS:
+            if scheduler.get_job(job_id):
+                scheduler.remove_job(job_id)
+    # Transition side effects already queued still run; the outbox fence stops anything left from signing
+    if not lanes.chain_lane.drain(timeout=config.LEADER_HEARTBEAT_SECONDS):
+        logger.warning("Chain lane still busy after stepping down")
+    logger.info("Leader duties stopped")
+
+def process_outbox():
+    """Send and track outbox transactions, only while this process holds the scheduler lease"""
+    if not config.LEADER_ELECTION_ENABLED:
+        outbox.process()
+        return
+    fence = leader_elector.fence()
+    if fence is not None:
+        outbox.process(fence)
 
 
+# Only the process holding the scheduler lease runs the leader duties
+leader_elector = leader.LeaderElector(
+    'scheduler',
+    config.LEADER_LEASE_SECONDS,
+    config.LEADER_HEARTBEAT_SECONDS,
+    start_leader_duties,
+    stop_leader_duties
+)
+
 def start_scheduler():
-    """Start the scheduler with all tasks"""
+    """Start the scheduler with all tasks.
+
+    Every process polls the price and follows the chain head, since the API
+    serves both from memory. With LEADER_ELECTION_ENABLED the other jobs and
+    the lifecycle driver run only in the process elected through the
+    scheduler lease, so the app can run under several workers.
+    """
     global scheduler
     
     # Only initialize the scheduler if it hasn't been initialized yet
@@ -204,15 +558,22 @@ def start_scheduler():
         scheduler = BackgroundScheduler({'apscheduler.timezone': 'UTC'})
         
         logger.info("Starting scheduler...")
-        
-        # Generating epochs and rounds
-        scheduler.add_job(models.generate_epochs_and_rounds, 'cron', minute=11, second=0, id='generate_epochs_and_rounds') # Will run every hour at xx:11 min
 
-        # Dynamically building list of scheduled tasks
-        scheduler.add_job(refresh_scheduled_jobs, 'cron', minute=14, id='refresh_jobs', next_run_time=datetime.now(timezone.utc)) # Will run every hour at xx:14 min
+        # Polling the price feed used by the API and round settlement
+        scheduler.add_job(in_lane(lanes.price_lane, poll_price), 'interval', seconds=config.PRICE_POLL_SECONDS, id='poll_price', max_instances=1, coalesce=True, next_run_time=datetime.now(timezone.utc))
+
+        # Following the chain head so cached contract reads are invalidated per block
+        scheduler.add_job(in_lane(lanes.chain_lane, blockchain.refresh_block), 'interval', seconds=config.BLOCK_POLL_SECONDS, id='refresh_block', max_instances=1, coalesce=True, next_run_time=datetime.now(timezone.utc))
 
+        # Jobs only queue their work; it runs on the bounded lane workers
+        lanes.start()
         scheduler.start()
         logger.info("Scheduler started")
+
+        if config.LEADER_ELECTION_ENABLED:
+            leader_elector.start()
+        else:
+            start_leader_duties()
     else:
         logger.info("Scheduler already initialized and running")
     
@@ -222,7 +583,12 @@ def stop_scheduler():
     """Stop the scheduler"""
     global scheduler
     if scheduler is not None:
+        if config.LEADER_ELECTION_ENABLED:
+            leader_elector.stop()
+        else:
+            stop_leader_duties()
         scheduler.shutdown()
+        lanes.stop()
         scheduler = None
         logger.info("Scheduler stopped")
     else:
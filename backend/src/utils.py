@@ -1,6 +1,7 @@
 import logging
 import json
-from datetime import datetime
+import math
+from datetime import datetime, timezone
 from web3 import Web3
 
 # Configure logging
@@ -91,6 +92,28 @@ def is_valid_signature(message, signature, address):
         logger.error(f"Error validating signature: {e}")
         return False
 
+def serialize_times(data, columns=('start_time', 'end_time', 'lock_start', 'lock_end')):
+    """Render integer epoch-second time columns as 'YYYY-MM-DD HH:MM:SS' UTC strings.
+
+    Accepts a row dict or a list of rows and converts in place, so API
+    responses look the same whichever TIMESTAMP_STORAGE mode is in use.
+    """
+    rows = data if isinstance(data, list) else [data]
+    for row in rows:
+        for column in columns:
+            value = row.get(column)
+            if isinstance(value, int):
+                row[column] = datetime.fromtimestamp(value, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return data
+
+def percentile(values, q, scale=1):
+    """Nearest-rank percentile of values (q in 0-100), multiplied by scale. None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return round(ordered[rank] * scale, 3)
+
 def json_serial(obj):
     """JSON serializer for objects not serializable by default json code"""
     if isinstance(obj, datetime):
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the reward engine against the original per-user loop.
+
+Run from the project root: python backend/tests/bench_rewards.py [sizes...]
+"""
+
+import sys
+import os
+import gc
+import random
+import time
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import rewards
+from backend.tests.test_rewards_engine import random_snapshot, reference_users_rewards_and_apy, engine_users_rewards_and_apy
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def timed(fn, *args, repeat=3):
+    """Best of repeat runs of fn with the garbage collector paused, as timeit does"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = fn(*args)
+            elapsed = time.perf_counter() - started
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench(size):
+    snapshot = random_snapshot(random.Random(size), size)
+
+    expected, reference_seconds = timed(reference_users_rewards_and_apy, snapshot)
+    columns, engine_seconds = timed(rewards.compute_snapshot_rewards, snapshot)
+    result, wrapper_seconds = timed(engine_users_rewards_and_apy, snapshot)
+    assert result == expected
+    assert columns['rewards'] == [expected[address]['rewards'] for address in columns['addresses']]
+
+    print(
+        f"{size:>9} users: reference {reference_seconds:7.3f}s  "
+        f"columns {engine_seconds:7.3f}s ({reference_seconds / engine_seconds:4.1f}x)  "
+        f"per-user dicts {wrapper_seconds:7.3f}s ({reference_seconds / wrapper_seconds:4.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    for size in [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES:
+        bench(size)
@@ -0,0 +1,26 @@
+"""
+Fixtures shared by the backend tests.
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.config import config
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point the models at an empty database and initialize the schema"""
+    monkeypatch.setattr(config, 'DATABASE_PATH', str(tmp_path / 'test.db'))
+    models.init_db()
+    yield
+    models.close_pool()
@@ -0,0 +1,114 @@
+"""
+Tests for the cached Web3 client and batched reads in backend.src.blockchain.
+No RPC node is needed: connectivity checks are counted instead of sent.
+"""
+
+import sys
+import os
+
+import pytest
+import requests
+from web3 import Web3
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import blockchain
+from backend.src import multicall
+from backend.src import rewards
+from backend.config import config
+
+
+@pytest.fixture
+def rpc_checks(monkeypatch):
+    """Count is_connected calls and start from an empty client cache"""
+    checks = []
+
+    def is_connected(self, show_traceback=False):
+        checks.append(self)
+        return True
+
+    monkeypatch.setattr(Web3, 'is_connected', is_connected)
+    monkeypatch.setattr(blockchain, 'contract_abi', [
+        {'type': 'function', 'name': 'totalMON', 'inputs': [], 'outputs': [{'type': 'uint256', 'name': ''}], 'stateMutability': 'view'}
+    ])
+    monkeypatch.setattr(config, 'CONTRACT_ADDRESS', '0x7b77e94c864e7d965a6e2dd4942de0df7072f9f5')
+    blockchain.reset_web3()
+    yield checks
+    blockchain.reset_web3()
+
+
+def test_client_and_contract_are_built_once(rpc_checks):
+    contract = blockchain.get_contract()
+    assert contract.address == '0x7B77E94C864E7D965a6E2DD4942DE0dF7072f9F5'
+    assert blockchain.get_contract() is contract
+    assert blockchain.get_web3() is blockchain.get_web3()
+    assert len(rpc_checks) == 1
+
+
+def test_client_is_rebuilt_after_connection_error(rpc_checks):
+    w3 = blockchain.get_web3()
+
+    # Contract call errors keep the client, connection errors drop it
+    blockchain._handle_rpc_error(ValueError('execution reverted'))
+    assert blockchain.get_web3() is w3
+
+    blockchain._handle_rpc_error(requests.exceptions.ConnectionError('refused'))
+    assert blockchain.get_web3() is not w3
+    assert len(rpc_checks) == 2
+
+
+class FakeMulticall:
+    """Records aggregate3 batches and answers each call with its calldata"""
+
+    def __init__(self, fail_target=None):
+        self.batches = []
+        self.blocks = []
+        self.fail_target = fail_target
+        self.functions = self
+
+    def aggregate3(self, batch):
+        self.batches.append(batch)
+        return self
+
+    def call(self, block_identifier):
+        self.blocks.append(block_identifier)
+        return [(target != self.fail_target, calldata) for target, _, calldata in self.batches[-1]]
+
+
+def test_multicall_aggregate_chunks_at_one_block():
+    fake = FakeMulticall()
+    calls = [('0xa', bytes([i])) for i in range(7)]
+
+    assert multicall.aggregate(fake, calls, block_identifier=123, chunk_size=3) == [bytes([i]) for i in range(7)]
+    assert [len(batch) for batch in fake.batches] == [3, 3, 1]
+    assert fake.blocks == [123, 123, 123]
+
+    with pytest.raises(multicall.MulticallError):
+        multicall.aggregate(FakeMulticall(fail_target='0xb'), [('0xa', b''), ('0xb', b'')], 123, 10)
+
+
+def test_compute_rewards_follows_contract_formula():
+    snapshot = {
+        'block': 1,
+        'total_mon': 1100,
+        'epoch_baseline': 1000,
+        'epoch_total_supply': 2000,
+        'users': {
+            '0xa': {'balance': 1200, 'weight': 70},
+            '0xb': {'balance': 800, 'weight': 30},
+            '0xc': {'balance': 0, 'weight': 100},
+        }
+    }
+
+    columns = rewards.compute_snapshot_rewards(snapshot)
+    by_user = dict(zip(columns['addresses'], columns['rewards']))
+    # deposited: a=600, b=400; denominator = 70*600 + 30*400 = 54000
+    assert by_user['0xa'] == 100 * 70 * 600 // 54000
+    assert by_user['0xb'] == 100 * 30 * 400 // 54000
+    assert by_user['0xc'] == 0
+    assert columns['epoch_rewards'] == 100
+    assert columns['apy'][columns['addresses'].index('0xa')] == by_user['0xa'] * 100 / 600
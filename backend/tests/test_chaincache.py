@@ -0,0 +1,74 @@
+"""
+Tests for the block-pinned read cache in backend.src.chaincache.
+"""
+
+import sys
+import os
+import threading
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import chaincache
+
+
+def test_values_are_cached_per_block():
+    cache = chaincache.BlockCache(max_age_seconds=60)
+    loads = []
+
+    def loader(block):
+        loads.append(block)
+        return block * 10
+
+    # No block yet: bypass straight to 'latest'
+    cache.get('totalMON', (), lambda block: loads.append(block))
+    assert loads == ['latest']
+
+    cache.set_block(100)
+    assert cache.get('totalMON', (), loader) == 1000
+    assert cache.get('totalMON', (), loader) == 1000
+    assert cache.get('balanceOf', ('0xa',), loader) == 1000
+    assert loads == ['latest', 100, 100]
+
+    # Same block again keeps the values, a new block drops them
+    assert not cache.set_block(100)
+    assert cache.set_block(101)
+    assert cache.get('totalMON', (), loader) == 1010
+    assert cache.status()['hits'] == 1
+
+
+def test_stale_block_bypasses_cache():
+    cache = chaincache.BlockCache(max_age_seconds=-1)
+    cache.set_block(100)
+    assert cache.block is None
+    assert cache.get('totalMON', (), lambda block: block) == 'latest'
+
+
+def test_concurrent_misses_share_one_load():
+    cache = chaincache.BlockCache(max_age_seconds=60)
+    cache.set_block(100)
+    release = threading.Event()
+    loads = []
+
+    def loader(block):
+        loads.append(block)
+        release.wait(timeout=5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('getUsers', (), loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Let every thread reach the cache before the load completes
+    while cache.status()['misses'] + cache.status()['coalesced'] < len(threads):
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert loads == [100]
+    assert results == ['value'] * 8
+    assert cache.status()['coalesced'] == 7
@@ -0,0 +1,56 @@
+"""
+Tests for the HTTP client helpers in backend.src.httpclient.
+"""
+
+import sys
+import os
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import httpclient
+
+
+def test_circuit_breaker_opens_and_probes(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(httpclient.time, 'monotonic', lambda: now[0])
+    breaker = httpclient.CircuitBreaker('test', failure_threshold=2, reset_seconds=30)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    # After the reset period only a single probe is let through
+    now[0] += 30
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed probe re-opens the circuit, a successful one closes it
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_call_metrics_snapshot():
+    metrics = httpclient.CallMetrics(window=4)
+    for latency in (0.010, 0.020, 0.030, 0.040, 0.500):
+        metrics.record(latency, ok=latency < 0.5)
+    metrics.record_retry()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['calls'] == 5
+    assert snapshot['failures'] == 1
+    assert snapshot['retries'] == 1
+    # Only the last four latencies are kept
+    assert snapshot['latency_p50_ms'] == 30.0
+    assert snapshot['latency_p99_ms'] == 500.0
@@ -0,0 +1,138 @@
+"""
+Tests for the PredictVault event indexer in backend.src.indexer,
+driven by an in-memory fake chain instead of an RPC node.
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.src import indexer
+from backend.src import blockchain
+from backend.config import config
+
+ZERO = indexer.ZERO_ADDRESS
+ALICE = '0x7B77E94C864E7D965a6E2DD4942DE0dF7072f9F5'
+BOB = '0x209ebD2cA4d5FfF84356948D75fD73883361F49B'
+
+
+def event(block, name, user, value, counterparty=None):
+    return {
+        'block_number': block, 'block_hash': f'0x{block}', 'tx_hash': f'0xt{block}',
+        'event': name, 'user_address': user, 'counterparty': counterparty, 'value': str(value)
+    }
+
+
+def deposit(block, user, amount):
+    """Events emitted by a first depositNative"""
+    return [
+        event(block, 'Transfer', ZERO, amount, counterparty=user),
+        event(block, 'UserWeightUpdated', user, 0),
+        event(block, 'Staked', user, amount),
+    ]
+
+
+def withdraw_all(block, user, amount):
+    return [event(block, 'Transfer', user, amount, counterparty=ZERO), event(block, 'Unstaked', user, amount)]
+
+
+class FakeChain:
+    def __init__(self, head, events, fork=''):
+        self.head = head
+        self.set_events(events, fork)
+
+    def set_events(self, events, fork=''):
+        self.events = []
+        for i, item in enumerate(events):
+            self.events.append({**item, 'log_index': i})
+        self.fork = fork
+
+    def block_hash(self, number):
+        return f'0x{number}{self.fork if number >= 7 else ""}'
+
+    def fetch(self, start, end):
+        return [item for item in self.events if start <= item['block_number'] <= end]
+
+
+class FakeEth:
+    def __init__(self, chain):
+        self.chain = chain
+
+    @property
+    def block_number(self):
+        return self.chain.head
+
+
+@pytest.fixture
+def chain(db, monkeypatch):
+
+    chain = FakeChain(head=10, events=[
+        *deposit(2, ALICE, 100),
+        *deposit(3, BOB, 50),
+        event(5, 'UserWeightUpdated', ALICE, 7),
+        *withdraw_all(8, ALICE, 100),
+    ])
+    w3 = SimpleNamespace(eth=FakeEth(chain))
+    monkeypatch.setattr(blockchain, 'get_web3', lambda: w3)
+    monkeypatch.setattr(blockchain, 'get_contract', lambda: object())
+    monkeypatch.setattr(indexer, 'get_block_hash', lambda w3, number: chain.block_hash(number))
+    monkeypatch.setattr(indexer, 'fetch_events', lambda w3, contract, start, end: chain.fetch(start, end))
+    monkeypatch.setattr(config, 'INDEXER_START_BLOCK', 1)
+    monkeypatch.setattr(config, 'INDEXER_CHUNK_BLOCKS', 2)
+    monkeypatch.setattr(config, 'INDEXER_WORKERS', 2)
+    monkeypatch.setattr(config, 'INDEXER_CONFIRMATIONS', 0)
+    yield chain
+
+
+def test_sync_folds_events_into_vault_state(chain):
+    assert indexer.sync() == 10
+    assert models.get_index_checkpoint() == {'number': 10, 'hash': '0x10'}
+
+    users = models.get_vault_users([ALICE, BOB])
+    # Alice withdrew everything and left the users array with her weight cleared
+    assert users[ALICE] == {'is_member': False, 'balance': 0, 'weight': 0, 'updated_block': 8}
+    assert users[BOB]['is_member'] and users[BOB]['balance'] == 50
+    assert list(models.get_vault_members()) == [BOB]
+
+    # Nothing new: the next sync is a no-op
+    assert indexer.sync() == 10
+
+
+def test_sync_rewinds_after_reorg(chain):
+    indexer.sync()
+
+    # Blocks from 7 on are replaced: Alice's withdrawal never happened
+    chain.head = 12
+    chain.set_events([
+        *deposit(2, ALICE, 100),
+        *deposit(3, BOB, 50),
+        event(5, 'UserWeightUpdated', ALICE, 7),
+        event(9, 'UserWeightUpdated', BOB, 3),
+    ], fork='b')
+
+    assert indexer.sync() == 12
+    users = models.get_vault_users([ALICE, BOB])
+    assert users[ALICE]['is_member'] and users[ALICE]['balance'] == 100 and users[ALICE]['weight'] == 7
+    assert users[BOB]['weight'] == 3
+    assert models.get_index_checkpoint() == {'number': 12, 'hash': '0x12b'}
+
+
+def test_reads_use_index_only_when_fresh(chain, monkeypatch):
+    monkeypatch.setattr(blockchain, 'get_users', lambda: ['from-chain'])
+    monkeypatch.setattr(config, 'INDEXER_ENABLED', True)
+    assert indexer.get_users() == ['from-chain']
+
+    indexer.sync()
+    assert sorted(indexer.get_users()) == [BOB]
+
+    chain.head = 10 + config.INDEXER_MAX_LAG_BLOCKS + 1
+    assert indexer.get_users() == ['from-chain']
@@ -0,0 +1,115 @@
+"""
+Tests for the bounded scheduler lanes in backend.src.lanes.
+"""
+
+import sys
+import os
+import threading
+
+import pytest
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import lanes
+
+
+@pytest.fixture
+def lane():
+    lane = lanes.Lane('test', workers=1, max_queue=3)
+    lane.start()
+    yield lane
+    lane.stop()
+
+
+def block(lane):
+    """Occupy the lane's only worker until the returned event is set"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+    lane.submit(blocker)
+    started.wait(5)
+    return release
+
+
+def test_transitions_run_before_queued_jobs(lane):
+    order = []
+    release = block(lane)
+    lane.submit(order.append, 'job')
+    lane.submit(order.append, 'transition', priority=lanes.PRIORITY_TRANSITION)
+    assert lane.status()['queued'] == lane.status()['max_depth'] == 2
+
+    release.set()
+    assert lane.drain(timeout=5)
+    assert order == ['transition', 'job']
+    status = lane.status()
+    assert status['completed'] == 3 and status['wait_p99_ms'] > 0
+
+
+def test_pending_jobs_coalesce_and_queue_is_bounded(lane):
+    calls = []
+    release = block(lane)
+    assert lane.submit(calls.append, 1, key='poll')
+    assert not lane.submit(calls.append, 2, key='poll')
+    assert lane.submit(calls.append, 3)
+    assert lane.submit(calls.append, 4)
+    assert not lane.submit(calls.append, 5)
+
+    release.set()
+    assert lane.drain(timeout=5)
+    assert calls == [1, 3, 4]
+    # The key is free again once its task has run
+    assert lane.submit(calls.append, 6, key='poll')
+    status = lane.status()
+    assert status['coalesced'] == 1 and status['rejected'] == 1
+
+
+def test_failures_are_counted_and_unstarted_lanes_run_inline():
+    lane = lanes.Lane('inline', workers=1, max_queue=1)
+    calls = []
+    assert lane.submit(calls.append, 1)
+    assert calls == [1]
+
+    def fail():
+        raise RuntimeError('boom')
+    lane.submit(fail)
+    assert lane.status()['failed'] == 1 and lane.status()['completed'] == 1
+
+
+def test_transitions_are_not_bounded_by_the_queue(lane):
+    calls = []
+    release = block(lane)
+    for i in range(3):
+        assert lane.submit(calls.append, i)
+    assert not lane.submit(calls.append, 'job')
+    assert lane.submit(calls.append, 'transition', priority=lanes.PRIORITY_TRANSITION)
+    assert lane.status()['queued'] == 4
+
+    release.set()
+    assert lane.drain(timeout=5)
+    assert calls == ['transition', 0, 1, 2]
+
+
+def test_stop_runs_queued_transitions_and_refuses_new_work(lane):
+    calls = []
+    release = block(lane)
+    lane.submit(calls.append, 'job')
+    lane.submit(calls.append, 'transition', priority=lanes.PRIORITY_TRANSITION)
+
+    stopper = threading.Thread(target=lane.stop)
+    stopper.start()
+    # stop() notifies the lane's condition once it is stopping
+    with lane._cond:
+        assert lane._cond.wait_for(lambda: lane._stopping, timeout=5)
+    assert not lane.submit(calls.append, 'late', priority=lanes.PRIORITY_TRANSITION)
+
+    release.set()
+    stopper.join(5)
+    assert calls == ['transition']
+    assert lane.drain(timeout=0)
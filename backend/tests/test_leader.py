@@ -0,0 +1,130 @@
+"""
+Tests for the scheduler leader election in backend.src.leader, with two
+electors standing in for two API worker processes sharing one database.
+"""
+
+import sys
+import os
+import time
+
+import pytest
+from flask import Flask
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.src import leader
+from backend.src.routes import api_bp
+from backend.config import config
+
+TTL = 15
+HEARTBEAT = 5
+
+
+def elector(holder, events):
+    return leader.LeaderElector(
+        'scheduler', TTL, HEARTBEAT,
+        lambda: events.append((holder, 'elected')),
+        lambda: events.append((holder, 'demoted')),
+        holder=holder
+    )
+
+
+def test_only_one_process_leads(db):
+    events = []
+    a, b = elector('a', events), elector('b', events)
+
+    assert a.heartbeat(now=1000)
+    assert not b.heartbeat(now=1001)
+    # Renewing keeps the term and pushes the expiry out
+    assert a.heartbeat(now=1005)
+    assert a.term == 1 and a.expires_at == 1005 + TTL
+    assert not b.heartbeat(now=1006)
+    assert events == [('a', 'elected')]
+    assert models.get_lease('scheduler')['holder'] == 'a'
+
+
+def test_expired_lease_is_taken_over(db):
+    events = []
+    a, b = elector('a', events), elector('b', events)
+    a.heartbeat(now=1000)
+
+    # a stalls past its expiry, b takes over with a new term
+    assert b.heartbeat(now=1000 + TTL)
+    assert b.term == 2
+    # a finds out on its next heartbeat and stops its duties
+    assert not a.heartbeat(now=1000 + TTL + 1)
+    assert events == [('a', 'elected'), ('b', 'elected'), ('a', 'demoted')]
+    assert a.status()['demotions'] == 1
+    assert a.fence() is None and b.fence() == ('scheduler', 'b', 2)
+
+
+def test_lapsed_lease_is_retaken_under_a_new_term(db):
+    events = []
+    a = elector('a', events)
+    now = time.time()
+    # a's lease lapsed a second ago without anyone taking it over
+    a.heartbeat(now=now - TTL - 1)
+    stale = a.fence()
+
+    assert a.heartbeat(now=now)
+    assert a.term == 2 and a.fence() == ('scheduler', 'a', 2)
+    assert events == [('a', 'elected'), ('a', 'demoted'), ('a', 'elected')]
+    # Side effects fenced before the lapse are rejected, the new term's go through
+    outbox_id = models.enqueue_transaction('updateEpoch', [])
+    assert not models.reserve_outbox_nonce(outbox_id, 0, fence=stale)
+    assert models.reserve_outbox_nonce(outbox_id, 0, fence=a.fence())
+
+
+def test_leader_steps_down_before_expiry_when_it_cannot_renew(db, monkeypatch):
+    events = []
+    a = elector('a', events)
+    a.heartbeat(now=1000)
+
+    def fail(*args):
+        raise RuntimeError('database is locked')
+    monkeypatch.setattr(models, 'acquire_lease', fail)
+    # Still well within the lease: keep the duties running
+    assert a.heartbeat(now=1005)
+    # Within one heartbeat of expiry: stop before another process can take over
+    assert not a.heartbeat(now=1000 + TTL - HEARTBEAT)
+    assert a.status()['last_error'] == 'database is locked'
+    assert events == [('a', 'elected'), ('a', 'demoted')]
+
+
+def test_stop_hands_the_lease_over(db):
+    events = []
+    a, b = elector('a', events), elector('b', events)
+    a.start()
+    assert a.is_leader and not b.heartbeat()
+
+    a.stop()
+    assert b.heartbeat()
+    assert events == [('a', 'elected'), ('a', 'demoted'), ('b', 'elected')]
+
+
+def test_failed_duties_release_the_lease(db):
+    events = []
+
+    def broken():
+        raise RuntimeError('boom')
+    a = leader.LeaderElector('scheduler', TTL, HEARTBEAT, broken, lambda: events.append('demoted'), holder='a')
+    b = elector('b', events)
+
+    assert not a.heartbeat(now=1000)
+    assert b.heartbeat(now=1001)
+    assert events == ['demoted', ('b', 'elected')]
+
+
+def test_scheduler_endpoint_reports_the_election(db, monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_ENDPOINTS_ENABLED', True)
+    app = Flask(__name__)
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    data = app.test_client().get('/api/admin/scheduler').get_json()
+    assert data['leader']['is_leader'] is False
+    assert data['leader']['lease'] is None
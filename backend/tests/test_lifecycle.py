@@ -0,0 +1,333 @@
+"""
+Tests for the deadline-heap driver of epoch and round transitions in
+backend.src.lifecycle, run against the schedule generated by init_db.
+"""
+
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.src import lifecycle
+from backend.src import indexer
+from backend.src import publisher
+from backend.src import tasks
+from backend.src import lanes
+from backend.src import pricesources
+from backend.src.routes import api_bp
+from backend.config import config
+
+HORIZON = 900
+REFRESH = 60
+ALICE = '0x209ebD2cA4d5FfF84356948D75fD73883361F49B'
+
+
+def recording_driver(calls, failing=()):
+    def handler(event_type):
+        def run(id):
+            calls.append((event_type, id))
+            if event_type in failing:
+                raise RuntimeError('boom')
+        return run
+    handlers = {event_type: handler(event_type) for event_type in lifecycle.TRANSITION_ORDER}
+    return lifecycle.LifecycleDriver(handlers, HORIZON, REFRESH)
+
+
+def test_transitions_run_in_deadline_order(db):
+    now = int(time.time())
+    calls = []
+    driver = recording_driver(calls)
+
+    added = driver.refill(now)
+    assert added > 0
+    assert driver.run_due(now) == 0
+
+    upcoming = driver.status(limit=added)['upcoming']
+    assert all(now < entry['time'] <= now + HORIZON for entry in upcoming)
+    keys = [(entry['time'], lifecycle.TRANSITION_RANK[entry['event_type']]) for entry in upcoming]
+    assert keys == sorted(keys)
+
+    assert driver.run_due(now + HORIZON) == added
+    assert calls == [(entry['event_type'], entry['id']) for entry in upcoming]
+    assert driver.status()['queued'] == 0
+
+
+def test_window_is_extended_once_per_refresh(db):
+    now = int(time.time())
+    driver = recording_driver([])
+    queued = driver.refill(now)
+
+    assert driver.refill(now + REFRESH // 2) == 0
+    expected = len(models.get_lifecycle_transitions(now + HORIZON, now + HORIZON + REFRESH))
+    assert driver.refill(now + REFRESH) == expected
+    assert driver.status()['queued'] == queued + expected
+    assert driver.status()['watermark'] == now + HORIZON + REFRESH
+
+
+def test_reload_picks_up_schedule_changes(db):
+    now = int(time.time())
+    driver = recording_driver([])
+    driver.refill(now)
+    starts = [entry for entry in driver.status(limit=1000)['upcoming'] if entry['event_type'] == 'process_round_start']
+    moved = starts[-1]
+
+    with models.db_session() as conn:
+        conn.execute('UPDATE rounds SET start_time = ? WHERE id = ?', (models.to_db_time(now + 50), moved['id']))
+
+    driver.reload()
+    driver.refill()
+    starts = [entry for entry in driver.status(limit=1000)['upcoming'] if entry['event_type'] == 'process_round_start']
+    assert {'time': now + 50, 'event_type': 'process_round_start', 'id': moved['id']} in starts
+    assert moved not in starts
+
+
+def test_failed_transition_does_not_block_the_rest(db):
+    now = int(time.time())
+    calls = []
+    driver = recording_driver(calls, failing={'process_round_start'})
+    added = driver.refill(now)
+
+    assert driver.run_due(now + HORIZON) == added
+    status = driver.status()
+    assert status['failed'] == sum(1 for event_type, _ in calls if event_type == 'process_round_start')
+    assert status['ran'] + status['failed'] == added
+
+
+def test_failed_transition_hands_over_to_catch_up(db):
+    now = int(time.time())
+    calls = []
+    caught_up = []
+    driver = recording_driver(calls, failing={'process_round_start'})
+    driver.catch_up = caught_up.append
+    added = driver.refill(now)
+
+    # The batch stops at the failure, catch-up then covers everything due so far
+    assert driver.run_due(now + HORIZON) < added
+    driver.run_catch_up(now + HORIZON)
+    assert caught_up == [now + HORIZON]
+    assert driver.status()['queued'] == 0
+
+
+def test_catch_up_replays_missed_transitions(db, monkeypatch):
+    published = []
+    snapshots = []
+    monkeypatch.setattr(indexer, 'get_users', lambda: [ALICE])
+    monkeypatch.setattr(config, 'CATCHUP_PRICE_TOLERANCE_SECONDS', 3)
+
+    def publish(id, addresses, weights):
+        published.append((id, addresses, weights))
+        models.save_weight_publication(id, [])
+        return {'entries': len(addresses), 'chunks': []}
+
+    def snapshot(id):
+        snapshots.append(id)
+        models.update_epoch(id, {'rewards_at': now})
+    monkeypatch.setattr(publisher, 'publish_weight_changes', publish)
+    monkeypatch.setattr(tasks, 'snapshot_epoch_rewards', snapshot)
+
+    start = models.get_lifecycle_transitions(0, 2 ** 31)[0]['time'] + config.EPOCH_LOCK_SECONDS
+    # Down since before epoch 1 and back early in epoch 2
+    second = start + config.EPOCH_DURATION_SECONDS
+    now = second + 100
+    # A rising price recorded every 5 seconds until shortly before epoch 2's second round
+    models.insert_price_ticks([(float(ts), float(ts - start)) for ts in range(start - 60, second + 51, 5)])
+
+    first_round = models.get_lagging_transitions(0, start)[-1]['id']
+    with models.db_session() as conn:
+        conn.execute('INSERT INTO user_epoch_stats (user_address, epoch_id, total_predictions) VALUES (?, 1, 1)', (ALICE,))
+        conn.execute("INSERT INTO predictions (user_address, round_id, direction) VALUES (?, ?, 'up')", (ALICE, first_round))
+
+    replayed = tasks.catch_up_transitions(now)
+    # Epoch 1 and its rounds, epoch 2 lock and start, its first round and the second one's start and lock
+    assert replayed == 4 + 4 * config.ROUNDS_COUNT + 2 + 4 + 2
+
+    assert models.get_epoch_by_id(1)['status'] == 'completed'
+    assert models.get_epoch_by_id(2)['status'] == 'active'
+    assert models.get_active_epoch()['id'] == 2
+    first_rounds = [models.get_round_by_id(id) for id in range(first_round, first_round + config.ROUNDS_COUNT)]
+    assert all(round['status'] == 'completed' and round['ending_price_at'] is not None for round in first_rounds)
+
+    # Settled against stored prices, weights published and rewards snapshotted once for epoch 1
+    assert models.get_user_stats(ALICE, 1)['correct_predictions'] == 1
+    assert published == [(1, [ALICE], [100])]
+    assert snapshots == [1]
+    with models.db_session() as conn:
+        assert conn.execute('SELECT COUNT(*) AS n FROM user_epoch WHERE epoch_id = 2').fetchone()['n'] == 1
+
+    # The running round has no starting tick within tolerance and none can be flushed anymore: it is voided
+    running = models.get_round_by_id(first_round + config.ROUNDS_COUNT + 1)
+    assert running['status'] == 'locked' and running['starting_price_at'] is None
+    assert running['voided_at'] == now
+    assert tasks.catch_up_transitions(now) == 0
+
+
+def test_unpriced_round_stays_due_until_priced_or_voided(db, monkeypatch):
+    monkeypatch.setattr(tasks, 'capture_price', lambda boundary: (boundary, 10.0))
+    monkeypatch.setattr(config, 'CATCHUP_PRICE_TOLERANCE_SECONDS', 3)
+    first, second = models.get_round_times(1), models.get_round_times(2)
+    calculating = first['lock_end'] - config.ROUND_CALCULATING_SECONDS
+    models.create_prediction(ALICE, 1, 'up')
+
+    # The start was never priced: the live calculating transition stores the end price but does not settle
+    tasks.process_round_calculating_start(1)
+    assert models.get_round_by_id(1)['settled_at'] is None
+    lagging = {(row['event_type'], row['id']) for row in models.get_lagging_transitions(0, calculating)}
+    assert {('process_round_start', 1), ('process_round_calculating_start', 1)} <= lagging
+
+    # While a tick may still be flushed the replay fails, so the round stays due
+    with pytest.raises(pricesources.PriceUnavailableError):
+        tasks.replay_round_start(1, first['start_time'] + 1)
+    with pytest.raises(pricesources.PriceUnavailableError):
+        tasks.replay_round_calculating(1, calculating)
+
+    models.insert_price_ticks([(float(first['start_time']), 5.0)])
+    tasks.replay_round_start(1, calculating)
+    tasks.replay_round_calculating(1, calculating)
+    assert models.get_round_by_id(1)['settled_at'] is not None
+    with models.db_session() as conn:
+        assert conn.execute('SELECT is_correct FROM predictions WHERE round_id = 1').fetchone()['is_correct'] == 1
+
+    # Round 2 never got a tick and its window has passed: voided instead of replayed forever
+    tasks.replay_round_start(2, second['lock_end'])
+    tasks.replay_round_calculating(2, second['lock_end'])
+    assert models.get_round_by_id(2)['voided_at'] == second['lock_end']
+    # Once catch-up has moved their statuses on, neither round is due again
+    models.set_lifecycle_statuses('rounds', {1: 'completed', 2: 'completed'})
+    lagging = {row['id'] for row in models.get_lagging_transitions(0, second['lock_end']) if row['table'] == 'rounds'}
+    assert not lagging & {1, 2}
+
+
+def test_catch_up_completes_transitions_past_the_lookback(db, monkeypatch):
+    monkeypatch.setattr(config, 'CATCHUP_LOOKBACK_SECONDS', 0)
+    start = models.get_lifecycle_transitions(0, 2 ** 31)[0]['time'] + config.EPOCH_LOCK_SECONDS
+    now = start + config.EPOCH_DURATION_SECONDS + config.EPOCH_CALCULATING_SECONDS
+
+    assert tasks.catch_up_transitions(now) == 0
+    assert models.get_epoch_by_id(1)['status'] == 'completed'
+    assert models.get_round_by_id(1)['status'] == 'completed'
+    assert models.get_epoch_by_id(2)['status'] == 'scheduled'
+
+
+def test_runs_are_measured_and_logged(db, monkeypatch):
+    now = int(time.time())
+    calls = []
+    driver = recording_driver(calls, failing={'process_round_start'})
+    driver.metrics = lifecycle.TransitionMetrics(misfire_seconds=60)
+    driver.on_run = models.insert_lifecycle_run
+    added = driver.refill(now)
+    upcoming = driver.status(limit=added)['upcoming']
+
+    # Everything runs at the end of the horizon, so only the last minute is on time
+    started = now + HORIZON
+    monkeypatch.setattr(lifecycle, 'time', SimpleNamespace(time=lambda: started))
+    driver.run_due(started)
+    metrics = driver.metrics.status()
+    assert sum(stats['runs'] for stats in metrics.values()) == added
+    late = sum(1 for entry in upcoming if started - entry['time'] > 60)
+    assert sum(stats['misfires'] for stats in metrics.values()) == late
+    starts = metrics['process_round_start']
+    assert starts['outcomes'] == {'failed': starts['runs']}
+    assert starts['lag_p99_ms'] >= starts['lag_p50_ms'] > 0
+    assert sum(starts['lag_histogram'].values()) == starts['runs']
+
+    runs = models.get_lifecycle_runs(1000)
+    assert len(runs) == added
+    failed = models.get_lifecycle_runs(1, 'process_round_start')[0]
+    assert failed['outcome'] == 'failed' and failed['error'] == 'boom'
+
+    # A later replay of the failed transition counts the failed attempt as a retry
+    run = driver.record_run('process_round_start', failed['entity_id'], failed['planned_at'], started, started + 1, 'replayed')
+    assert run['retries'] == 1
+    assert models.prune_lifecycle_runs(now=started + config.SCHEDULER_RUNS_RETENTION_SECONDS + 1) == added + 1
+
+
+def test_scheduler_endpoint(db, monkeypatch):
+    monkeypatch.setattr(config, 'ADMIN_ENDPOINTS_ENABLED', True)
+    app = Flask(__name__)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    tasks.lifecycle_driver.refill()
+
+    data = app.test_client().get('/api/admin/scheduler?limit=5').get_json()
+    assert len(data['upcoming']) == 5 and data['upcoming'][0]['in_seconds'] > 0
+    assert data['driver']['queued'] >= 5
+    assert set(data['lanes']) == {'chain', 'price', 'db'}
+    assert 'transitions' in data and 'recent_runs' in data
+
+
+def test_admin_endpoints_are_off_by_default_and_keyed(db, monkeypatch):
+    app = Flask(__name__)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    client = app.test_client()
+    assert client.get('/api/admin/outbox').status_code == 404
+
+    monkeypatch.setattr(config, 'ADMIN_ENDPOINTS_ENABLED', True)
+    monkeypatch.setattr(config, 'ADMIN_API_KEY', 'secret')
+    assert client.get('/api/admin/outbox').status_code == 401
+    assert client.get('/api/admin/outbox', headers={'X-Admin-Key': 'wrong'}).status_code == 401
+    assert client.get('/api/admin/outbox', headers={'X-Admin-Key': 'secret'}).status_code == 200
+
+
+def test_refused_transition_work_leaves_the_transition_due(db, monkeypatch):
+    monkeypatch.setattr(lanes.chain_lane, 'submit', lambda *args, **kwargs: False)
+    lock = models.get_lifecycle_transitions(0, 2 ** 31)[0]
+
+    with pytest.raises(RuntimeError):
+        tasks.process_epoch_lock_start(lock['id'])
+    # The status moved on but the eligible users are still owed
+    assert models.get_epoch_by_id(lock['id'])['status'] == 'locked'
+    assert lock['event_type'] in {row['event_type'] for row in models.get_lagging_transitions(0, lock['time'])}
+
+
+def test_failed_side_effects_stay_due_until_catch_up_runs_them(db, monkeypatch):
+    published = []
+    monkeypatch.setattr(indexer, 'get_users', lambda: [ALICE])
+    monkeypatch.setattr(indexer, 'read_reward_snapshot', lambda: None)
+    monkeypatch.setattr(publisher, 'publish_weight_changes', lambda id, addresses, weights: None)
+    start = models.get_lifecycle_transitions(0, 2 ** 31)[0]['time'] + config.EPOCH_LOCK_SECONDS
+    end = start + config.EPOCH_DURATION_SECONDS
+    lane = lanes.Lane('chain', workers=1, max_queue=10)
+    lane.start()
+    monkeypatch.setattr(lanes, 'chain_lane', lane)
+    try:
+        # The live handlers move the status on, their side effects then fail on the lane
+        tasks.process_epoch_lock_start(1)
+        tasks.process_epoch_start(1)
+        tasks.process_epoch_calculating_start(1)
+        tasks.process_epoch_completed_start(1)
+        assert lane.drain(timeout=5)
+    finally:
+        lane.stop()
+    assert lane.status()['failed'] == 2
+    epoch = models.get_epoch_by_id(1)
+    assert epoch['status'] == 'completed' and epoch['eligible_users_at'] is not None
+    assert epoch['weights_at'] is None and epoch['rewards_at'] is None
+    with pytest.raises(RuntimeError):
+        tasks.snapshot_epoch_rewards(1)
+
+    lagging = {(row['event_type'], row['id']) for row in models.get_lagging_transitions(0, end + config.EPOCH_CALCULATING_SECONDS)}
+    assert ('process_epoch_calculating_start', 1) in lagging and ('process_epoch_completed_start', 1) in lagging
+    assert ('process_epoch_lock_start', 1) not in lagging
+
+    # Once the chain is back, catch-up runs only the side effects still owed
+    def publish(id, addresses, weights):
+        published.append(id)
+        models.save_weight_publication(id, [])
+        return {'entries': len(addresses), 'chunks': []}
+    monkeypatch.setattr(publisher, 'publish_weight_changes', publish)
+    snapshot = {'block': 7, 'total_mon': 0, 'epoch_baseline': 0, 'epoch_total_supply': 0, 'users': {}}
+    monkeypatch.setattr(indexer, 'read_reward_snapshot', lambda: snapshot)
+    tasks.catch_up_transitions(end + config.EPOCH_CALCULATING_SECONDS)
+    assert published == [1]
+    epoch = models.get_epoch_by_id(1)
+    assert epoch['weights_at'] is not None and epoch['rewards_at'] is not None
+    assert models.get_epoch_reward_snapshot(1)['block_number'] == 7
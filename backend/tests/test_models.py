@@ -0,0 +1,281 @@
+"""
+Tests for the database layer in backend.src.models.
+Each test runs against a fresh SQLite file in a temporary directory.
+"""
+
+import sys
+import os
+import sqlite3
+import threading
+
+import pytest
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.src import utils
+from backend.config import config
+
+
+def test_connections_use_wal(db):
+    with models.db_session() as conn:
+        mode = conn.execute('PRAGMA journal_mode').fetchone()['journal_mode']
+    assert mode == 'wal'
+
+
+def test_nested_sessions_share_connection(db):
+    with models.db_session() as outer:
+        with models.db_session() as inner:
+            assert inner is outer
+
+
+def test_session_rolls_back_nested_helpers(db):
+    with pytest.raises(RuntimeError):
+        with models.db_session():
+            models.create_user('0xabc')
+            raise RuntimeError('boom')
+
+    assert models.get_user('0xabc') is None
+
+
+def test_connections_are_reused(db):
+    with models.db_session() as first:
+        pass
+    with models.db_session() as second:
+        pass
+    assert first is second
+
+
+def test_sessions_on_other_threads_get_their_own_connection(db):
+    seen = []
+
+    def worker():
+        with models.db_session() as conn:
+            seen.append(conn)
+
+    with models.db_session() as conn:
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+    assert seen and seen[0] is not conn
+
+
+def test_evaluate_predictions_credits_correct_users_once(db):
+    round_data = models.get_round_by_id(1)
+    round_id = round_data['id']
+    models.create_prediction('0xaaa', round_id, 'up')
+    models.create_prediction('0xbbb', round_id, 'down')
+    models.create_prediction('0xccc', round_id, 'up')
+
+    result = models.evaluate_predictions(round_id, 'up')
+    assert result['predictions_settled'] == 3
+    assert result['users_updated'] == 2
+
+    # Settling the same round again must not double count
+    again = models.evaluate_predictions(round_id, 'up')
+    assert again['predictions_settled'] == 0
+
+    epoch_id = round_data['epoch_id']
+    assert models.get_user_stats('0xaaa', epoch_id)['correct_predictions'] == 1
+    assert models.get_user_stats('0xbbb', epoch_id)['correct_predictions'] == 0
+    assert models.get_user_stats('0xccc', epoch_id)['total_predictions'] == 1
+
+
+def test_duplicate_prediction_is_rejected_without_counting(db):
+    round_data = models.get_round_by_id(1)
+    assert models.create_prediction('0xaaa', 1, 'up') is not None
+    assert models.create_prediction('0xaaa', 1, 'down') is None
+
+    stats = models.get_user_stats('0xaaa', round_data['epoch_id'])
+    assert stats['total_predictions'] == 1
+
+
+def test_migrations_are_recorded_and_idempotent(db):
+    models.init_db()
+    with models.db_session() as conn:
+        version = conn.execute('PRAGMA user_version').fetchone()['user_version']
+        indexes = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert version == len(models.SCHEMA_MIGRATIONS)
+    assert 'idx_predictions_user_round' in indexes
+
+
+def test_duplicate_predictions_migration_recounts_stats(db):
+    epoch_id = models.get_round_by_id(1)['epoch_id']
+    with models.db_session() as conn:
+        # A database from before the unique index, where 0xaaa predicted round 1 twice
+        conn.execute('DROP INDEX idx_predictions_user_round')
+        conn.executemany(
+            "INSERT INTO predictions (user_address, round_id, direction, is_correct) VALUES (?, ?, 'up', ?)",
+            [('0xaaa', 1, 1), ('0xaaa', 1, 1), ('0xaaa', 2, 0), ('0xbbb', 1, 1)]
+        )
+        conn.executemany(
+            'INSERT INTO user_epoch_stats (user_address, epoch_id, correct_predictions, total_predictions) VALUES (?, ?, ?, ?)',
+            [('0xaaa', epoch_id, 2, 3), ('0xbbb', epoch_id, 5, 5)]
+        )
+        for statement in models.SCHEMA_MIGRATIONS[0]:
+            conn.execute(statement)
+
+    stats = models.get_user_stats('0xaaa', epoch_id)
+    assert (stats['total_predictions'], stats['correct_predictions']) == (2, 1)
+    # Users without duplicates keep their counters
+    assert models.get_user_stats('0xbbb', epoch_id)['total_predictions'] == 5
+
+
+def test_only_one_round_can_be_active(db):
+    models.update_round(1, {'status': 'active'})
+    with pytest.raises(sqlite3.IntegrityError):
+        models.update_round(2, {'status': 'active'})
+
+    # The transition helpers move a leftover holder on to its next status first
+    models.activate_round(2)
+    assert models.get_active_round()['id'] == 2
+    assert models.get_round_by_id(1)['status'] == 'locked'
+
+
+def test_transition_moves_leftover_holders_along_in_order(db):
+    # Round 1 stuck in locked, round 2 stuck in active when round 3 locks and round 4 starts
+    models.update_round(1, {'status': 'locked'})
+    models.update_round(2, {'status': 'active'})
+    models.lock_round(2)
+    assert models.get_round_by_id(1)['status'] == 'calculating'
+
+    models.update_round(3, {'status': 'active'})
+    models.lock_round(3)
+    models.activate_round(4)
+    statuses = [models.get_round_by_id(id)['status'] for id in range(1, 5)]
+    assert statuses == ['completed', 'calculating', 'locked', 'active']
+
+
+def test_leftover_epoch_holders_are_left_for_catch_up(db):
+    # Epoch 1 never activated, so its lock side effects ran but nothing after them
+    models.update_epoch(1, {'status': 'locked'})
+    with pytest.raises(sqlite3.IntegrityError):
+        models.lock_epoch(2)
+    assert models.get_epoch_by_id(1)['status'] == 'locked'
+
+    # A bulk update from catch-up keeps the epoch behind the holder instead of failing
+    assert models.set_lifecycle_statuses('epochs', {2: 'locked', 3: 'scheduled'}) == 1
+    assert models.get_epoch_by_id(2)['status'] == 'scheduled'
+
+
+def test_rounds_priced_before_tick_times_are_not_lagging(db):
+    times = models.get_round_times(1)
+    with models.db_session() as conn:
+        # Round 1 settled before the *_price_at columns existed, round 2 never priced
+        conn.execute("UPDATE rounds SET starting_price = 5, ending_price = 6, status = 'completed' WHERE id = 1")
+        conn.execute("UPDATE rounds SET status = 'completed' WHERE id = 2")
+        # Migration 11 marks the rounds priced at both ends as settled
+        conn.execute(models.SCHEMA_MIGRATIONS[10][-1])
+    models.init_db()
+
+    round = models.get_round_by_id(1)
+    assert round['starting_price_at'] == times['start_time']
+    assert round['ending_price_at'] == times['lock_end'] - config.ROUND_CALCULATING_SECONDS
+    lagging = {row['id'] for row in models.get_lagging_transitions(0, times['lock_end'] + 3600) if row['table'] == 'rounds'}
+    assert 1 not in lagging and 2 in lagging
+
+
+def test_price_near_picks_the_closest_tick_within_tolerance(db):
+    models.insert_price_ticks([(1000.0, 1.0), (1007.0, 2.0), (1030.0, 3.0)])
+    assert models.get_price_near(1004, 5) == (1007.0, 2.0)
+    assert models.get_price_near(1002, 5) == (1000.0, 1.0)
+    assert models.get_price_near(1018, 5) is None
+
+
+def test_scheduling_queries_use_time_indexes(db):
+    with models.db_session() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM rounds WHERE lock_end > datetime('now', '+10 seconds') ORDER BY lock_end LIMIT 200"
+        ).fetchall()
+    assert any('idx_rounds_lock_end' in row['detail'] for row in plan)
+    assert models.get_rounds_calculating_start()
+
+
+def test_build_schedule_matches_round_layout(monkeypatch):
+    monkeypatch.setattr(config, 'EPOCH_DURATION_SECONDS', 600)
+    monkeypatch.setattr(config, 'EPOCH_LOCK_SECONDS', 10)
+    monkeypatch.setattr(config, 'ROUNDS_COUNT', 10)
+    monkeypatch.setattr(config, 'ROUND_LOCK_PERCENTAGE', 0.5)
+
+    # 2025-03-11 22:00:00 UTC
+    epochs, rounds = models.build_schedule(1741730400, 2)
+
+    assert epochs[0] == ('2025-03-11 22:00:00', '2025-03-11 22:10:00', '2025-03-11 21:59:50', '2025-03-11 22:00:00', 'scheduled')
+    assert epochs[1][0] == '2025-03-11 22:10:00'
+    assert len(rounds) == 20
+    assert rounds[0] == ('2025-03-11 22:00:00', '2025-03-11 22:00:30', '2025-03-11 22:00:30', '2025-03-11 22:01:00', '2025-03-11 22:00:00')
+    assert rounds[9][3] == '2025-03-11 22:10:00'
+    assert rounds[10][0] == '2025-03-11 22:10:00'
+
+
+def test_generate_epochs_and_rounds_skips_covered_horizon(db):
+    assert models.generate_epochs_and_rounds() == 0
+
+    with models.db_session() as conn:
+        counts = conn.execute(
+            'SELECT (SELECT COUNT(*) FROM epochs) AS epochs, (SELECT COUNT(*) FROM rounds) AS rounds'
+        ).fetchone()
+    expected_epochs = config.SCHEDULE_HORIZON_SECONDS // config.EPOCH_DURATION_SECONDS
+    assert counts['epochs'] == expected_epochs
+    assert counts['rounds'] == expected_epochs * config.ROUNDS_COUNT
+
+
+def test_generate_epochs_and_rounds_fills_gaps(db):
+    with models.db_session() as conn:
+        conn.execute('DELETE FROM rounds WHERE epoch_id = 3')
+        conn.execute('DELETE FROM epochs WHERE id = 3')
+        conn.execute('DELETE FROM rounds WHERE id = (SELECT MAX(id) FROM rounds)')
+
+    assert models.generate_epochs_and_rounds() == 1
+    with models.db_session() as conn:
+        counts = conn.execute(
+            'SELECT (SELECT COUNT(*) FROM epochs) AS epochs, (SELECT COUNT(*) FROM rounds) AS rounds'
+        ).fetchone()
+    expected_epochs = config.SCHEDULE_HORIZON_SECONDS // config.EPOCH_DURATION_SECONDS
+    assert counts['epochs'] == expected_epochs
+    assert counts['rounds'] == expected_epochs * config.ROUNDS_COUNT
+
+
+def test_integer_timestamp_storage_migrates_existing_rows(db, monkeypatch):
+    text_start = models.get_epoch_by_id(1)['start_time']
+    text_upcoming = models.get_rounds_process_start()
+
+    monkeypatch.setattr(config, 'TIMESTAMP_STORAGE', 'integer')
+    models.init_db()
+
+    epoch = models.get_epoch_by_id(1)
+    assert isinstance(epoch['start_time'], int)
+    assert utils.serialize_times(epoch)['start_time'] == text_start
+    # Scheduling queries return epoch seconds in both modes
+    assert models.get_rounds_process_start() == text_upcoming
+
+    # Switching back converts the rows back to text
+    monkeypatch.setattr(config, 'TIMESTAMP_STORAGE', 'text')
+    models.init_db()
+    assert models.get_epoch_by_id(1)['start_time'] == text_start
+
+
+def test_price_ticks_roll_up_into_candles(db):
+    ticks = [(1000.0, 10.0), (1000.5, 12.0), (1001.0, 9.0), (1059.0, 11.0)]
+    assert models.insert_price_ticks(ticks[:2]) == 2
+    models.insert_price_ticks(ticks[2:])
+
+    resolution, candles = models.get_price_candles(1000, 1059, max_points=100)
+    assert resolution == 1
+    assert candles[0] == {'time': 1000, 'open': 10.0, 'high': 12.0, 'low': 10.0, 'close': 12.0, 'ticks': 2}
+
+    resolution, candles = models.get_price_candles(960, 1059, max_points=5)
+    assert resolution == 60
+    assert candles == [
+        {'time': 960, 'open': 10.0, 'high': 12.0, 'low': 9.0, 'close': 9.0, 'ticks': 3},
+        {'time': 1020, 'open': 11.0, 'high': 11.0, 'low': 11.0, 'close': 11.0, 'ticks': 1},
+    ]
+
+    assert models.get_price_at(1030) == (1001.0, 9.0)
+    models.prune_price_history(now=1000.9 + config.PRICE_TICK_RETENTION_SECONDS)
+    assert models.get_price_at(1000.9) is None
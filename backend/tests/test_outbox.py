@@ -0,0 +1,196 @@
+"""
+Tests for the transaction outbox in backend.src.outbox, against a fake node
+that decodes the signed transactions it receives.
+"""
+
+import sys
+import os
+
+import pytest
+import rlp
+from eth_account import Account
+from web3 import Web3
+from web3.exceptions import ContractLogicError, TransactionNotFound
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.src import blockchain
+from backend.src import outbox
+from backend.config import config
+
+
+class FakeCall:
+    def __init__(self, node, fn_name):
+        self.node = node
+        self.fn_name = fn_name
+
+    def estimate_gas(self, tx):
+        if self.fn_name in self.node.failing:
+            raise ContractLogicError('execution reverted')
+        return 100000
+
+    def build_transaction(self, params):
+        return {**params, 'to': '0xcA11bde05977b3631167028862bE2a173976CA11', 'data': '0x', 'value': 0, 'chainId': 1}
+
+
+class FakeNode:
+    """Mempool of signed legacy transactions that are mined on demand"""
+
+    def __init__(self):
+        self.account = Account
+        self.gas_price = 100
+        self.chain_nonce = 7
+        self.pending = {}
+        self.receipts = {}
+        self.revert_next = 0
+        self.failing = set()
+        self.eth = self
+        self.functions = self
+
+    def __getattr__(self, fn_name):
+        return lambda *args: FakeCall(self, fn_name)
+
+    def get_transaction_count(self, address, block_identifier):
+        return self.chain_nonce + len(self.pending)
+
+    def send_raw_transaction(self, raw):
+        nonce, gas_price = (int.from_bytes(field, 'big') for field in rlp.decode(raw)[:2])
+        if nonce < self.chain_nonce:
+            raise ValueError({'message': 'nonce too low'})
+        tx_hash = Web3.keccak(raw)
+        self.pending[Web3.to_hex(tx_hash)] = {'nonce': nonce, 'gas_price': gas_price}
+        return tx_hash
+
+    def mine(self):
+        """Mine the highest priced pending transaction of each nonce, in nonce order"""
+        best = {}
+        for tx_hash, tx in self.pending.items():
+            if tx['nonce'] not in best or tx['gas_price'] > self.pending[best[tx['nonce']]]['gas_price']:
+                best[tx['nonce']] = tx_hash
+        while self.chain_nonce in best:
+            tx_hash = best[self.chain_nonce]
+            status = 0 if self.revert_next else 1
+            self.revert_next = max(0, self.revert_next - 1)
+            self.receipts[tx_hash] = {
+                'status': status, 'gasUsed': 50000, 'blockNumber': 100 + self.chain_nonce,
+                'transactionHash': Web3.to_bytes(hexstr=tx_hash)
+            }
+            self.chain_nonce += 1
+        self.pending = {h: tx for h, tx in self.pending.items() if tx['nonce'] >= self.chain_nonce}
+
+    def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.receipts:
+            raise TransactionNotFound(tx_hash)
+        return self.receipts[tx_hash]
+
+
+@pytest.fixture
+def node(db, monkeypatch):
+    monkeypatch.setattr(config, 'PRIVATE_KEY', Account.create().key.hex())
+    fake = FakeNode()
+    monkeypatch.setattr(blockchain, 'get_web3', lambda: fake)
+    monkeypatch.setattr(blockchain, 'get_contract', lambda: fake)
+    outbox.reset_nonce()
+    yield fake
+    outbox.reset_nonce()
+
+
+def test_queued_transactions_get_sequential_nonces(node):
+    first = blockchain.update_epoch()
+    second = blockchain.update_user_weights(['0x7b77e94c864e7d965a6e2dd4942de0df7072f9f5'], [60])
+
+    outbox.process()
+    assert [models.get_outbox_transaction(i)['nonce'] for i in (first, second)] == [7, 8]
+    assert models.get_outbox_transaction(second)['args'] == [['0x7B77E94C864E7D965a6E2DD4942DE0dF7072f9F5'], [60]]
+
+    # Only the receipt tracker settles them, without another nonce lookup
+    node.mine()
+    outbox.process()
+    assert [models.get_outbox_transaction(i)['status'] for i in (first, second)] == ['confirmed', 'confirmed']
+    assert models.get_outbox_transaction(second)['block_number'] == 108
+    assert outbox.status()['next_nonce'] == 9
+
+
+def test_stuck_transaction_is_replaced_with_higher_fee(node, monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOX_BUMP_AFTER_SECONDS', 0)
+    outbox_id = blockchain.update_epoch()
+
+    outbox.process()
+    outbox.process()
+    tx = models.get_outbox_transaction(outbox_id)
+    assert tx['bumps'] == 1 and len(tx['tx_hashes']) == 2
+    assert tx['gas_price'] == int(100 * config.OUTBOX_FEE_BUMP) + 1
+
+    # The replacement is mined under the same nonce
+    node.mine()
+    outbox.process()
+    tx = models.get_outbox_transaction(outbox_id)
+    assert tx['status'] == 'confirmed' and tx['tx_hash'] == tx['tx_hashes'][-1]
+    assert node.chain_nonce == 8
+
+
+def test_reverted_transaction_is_retried_then_given_up(node):
+    outbox_id = models.enqueue_transaction('batchUpdateUserWeights', [[], []], max_retries=1)
+    node.revert_next = 2
+
+    for _ in range(2):
+        outbox.process()
+        node.mine()
+        outbox.process()
+
+    tx = models.get_outbox_transaction(outbox_id)
+    assert tx['status'] == 'reverted' and tx['attempts'] == 2 and tx['nonce'] == 8
+
+
+def test_nonce_resyncs_after_outside_transaction(node):
+    first = blockchain.update_epoch()
+    outbox.process()
+    node.mine()
+    outbox.process()
+
+    # Someone else used nonce 8 with the same key
+    node.chain_nonce = 9
+    second = blockchain.update_epoch()
+    outbox.process()
+    assert models.get_outbox_transaction(second)['status'] == 'queued'
+    outbox.process()
+    assert models.get_outbox_transaction(second)['nonce'] == 9
+    assert models.get_outbox_transaction(first)['nonce'] == 7
+
+
+def test_call_that_would_revert_fails_without_a_nonce(node):
+    node.failing.add('updateEpoch')
+    failed = blockchain.update_epoch()
+    queued = blockchain.update_user_weights([], [])
+
+    outbox.process()
+    assert models.get_outbox_transaction(failed)['status'] == 'failed'
+    assert models.get_outbox_transaction(queued)['nonce'] == 7
+
+
+def test_deposed_leader_signs_nothing(node, monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOX_BUMP_AFTER_SECONDS', 0)
+    now = models.acquire_lease('scheduler', 'a', 15)['acquired_at']
+    fence = ('scheduler', 'a', 1)
+    first = blockchain.update_epoch()
+    outbox.process(fence)
+    assert models.get_outbox_transaction(first)['nonce'] == 7
+
+    # b takes the lease over while a is paused; a wakes up with its old term
+    models.acquire_lease('scheduler', 'b', 15, now=now + 15)
+    second = blockchain.update_epoch()
+    outbox.process(fence)
+    assert len(node.pending) == 1
+    assert models.get_outbox_transaction(first)['bumps'] == 0
+    tx = models.get_outbox_transaction(second)
+    assert tx['status'] == 'queued' and tx['nonce'] is None
+
+    node.mine()
+    outbox.process(('scheduler', 'b', 2))
+    assert models.get_outbox_transaction(first)['status'] == 'confirmed'
+    assert models.get_outbox_transaction(second)['nonce'] == 8
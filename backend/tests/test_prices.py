@@ -0,0 +1,55 @@
+"""
+Tests for the in-memory price subsystem in backend.src.prices.
+"""
+
+import sys
+import os
+import time
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import prices
+
+
+def test_price_feed_reports_age_and_staleness():
+    feed = prices.PriceFeed(size=10, ttl_seconds=5)
+    assert feed.latest_quote() is None
+
+    feed.record('1.25', timestamp=time.time() - 60)
+    assert feed.latest_quote()['stale']
+
+    feed.record(1.30)
+    quote = feed.latest_quote()
+    assert quote['price'] == 1.30
+    assert quote['age_seconds'] < 1
+    assert not quote['stale']
+
+
+def test_price_feed_ring_buffer_lookups():
+    feed = prices.PriceFeed(size=4, ttl_seconds=5)
+    for t in range(100, 110):
+        feed.record(float(t), timestamp=t)
+
+    # Only the last four ticks are kept
+    assert feed.price_at(105) is None
+    assert feed.price_at(106) == (106, 106.0)
+    assert feed.price_at(108.5) == (108, 108.0)
+    assert feed.price_at(1000) == (109, 109.0)
+
+    # Out-of-order ticks are dropped
+    assert not feed.record(1.0, timestamp=107)
+    assert feed.latest() == (109, 109.0)
+
+
+def test_price_feed_closest_tick_within_tolerance():
+    feed = prices.PriceFeed(size=10, ttl_seconds=5)
+    feed.record(1.0, timestamp=100.0)
+    feed.record(2.0, timestamp=101.2)
+
+    assert feed.closest(100.9, tolerance=1, wait=False) == (101.2, 2.0)
+    assert feed.closest(100.4, tolerance=1, wait=False) == (100.0, 1.0)
+    assert feed.closest(105.0, tolerance=1, wait=False) is None
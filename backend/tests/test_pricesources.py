@@ -0,0 +1,98 @@
+"""
+Tests for the multi-source price aggregation in backend.src.pricesources,
+using local fake sources only.
+"""
+
+import sys
+import os
+import time
+
+import pytest
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import pricesources
+from backend.src import tasks
+from backend.config import config
+
+
+def make_aggregator(sources, hedge_after=0.05, max_deviation=0.01, min_sources=1):
+    return pricesources.PriceAggregator(
+        sources, hedge_after=hedge_after, max_deviation=max_deviation,
+        min_sources=min_sources, workers=8
+    )
+
+
+def test_median_of_sources_drops_outliers():
+    aggregator = make_aggregator([
+        pricesources.FakePriceSource('a', 100.0),
+        pricesources.FakePriceSource('b', 100.4),
+        pricesources.FakePriceSource('c', 100.2),
+        pricesources.FakePriceSource('bad', 150.0),
+    ])
+
+    assert aggregator.fetch(deadline=time.time() + 2) == 100.2
+    status = aggregator.status()
+    assert status['outliers'] == 1
+    assert status['last_result']['dropped'] == ['bad']
+
+
+def test_slow_source_gets_a_hedged_request():
+    # First request stalls, the hedge answers quickly
+    slow = pricesources.FakePriceSource('slow', 100.0, delays=(1.0, 0.0))
+    aggregator = make_aggregator([slow, pricesources.FakePriceSource('fast', 100.0)])
+
+    started = time.time()
+    assert aggregator.fetch(deadline=time.time() + 2) == 100.0
+    assert time.time() - started < 0.5
+    assert slow.calls == 2
+    assert aggregator.status()['hedges'] == 1
+    assert aggregator.status()['sources']['slow']['metrics']['retries'] == 1
+
+
+def test_deadline_and_quorum():
+    aggregator = make_aggregator([
+        pricesources.FakePriceSource('stuck', 100.0, delays=(5.0,)),
+        pricesources.FakePriceSource('down', 100.0, fail=True),
+        pricesources.FakePriceSource('up', 101.0),
+    ], min_sources=2)
+
+    started = time.time()
+    with pytest.raises(pricesources.PriceUnavailableError):
+        aggregator.fetch(deadline=time.time() + 0.3)
+    assert time.time() - started < 1
+    assert aggregator.status()['unavailable'] == 1
+
+
+def test_fetch_price_retries_until_deadline(monkeypatch):
+    source = pricesources.FakePriceSource('flaky', 100.0, fail=True)
+    aggregator = make_aggregator([source])
+    monkeypatch.setattr(pricesources, 'price_aggregator', aggregator)
+    monkeypatch.setattr(config, 'SYMBOL', 'BTCUSDT')
+    monkeypatch.setattr(tasks.time, 'sleep', lambda seconds: None)
+    # Deterministic 1, 2, 4... second retry delays
+    monkeypatch.setattr(tasks.backoff, 'full_jitter', lambda value: value)
+
+    with pytest.raises(pricesources.PriceUnavailableError):
+        tasks.fetch_price(deadline=time.time() + 1.5)
+    # Retried after 1s only, a 2s delay would overrun the deadline
+    assert source.calls == 2
+    metrics = aggregator.status()['metrics']
+    assert metrics['retries'] == 1 and metrics['failures'] == 2
+
+    source.fail = False
+    assert tasks.fetch_price(deadline=time.time() + 2.5) == 100.0
+
+
+def test_create_sources_from_config_names():
+    sources = pricesources.create_sources(['binance', 'okx', 'fake:1.5'], session=None)
+    assert [source.name for source in sources] == ['binance', 'okx', 'fake:1.5']
+    assert sources[1].url_for('MONUSDT').endswith('instId=MON-USDT')
+    assert sources[2].fetch('MONUSDT', timeout=1) == 1.5
+
+    with pytest.raises(ValueError):
+        pricesources.create_sources(['nope'], session=None)
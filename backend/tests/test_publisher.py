@@ -0,0 +1,121 @@
+"""
+Tests for the chunked, delta-only weight publisher in backend.src.publisher,
+against a fake node that only estimates gas.
+"""
+
+import sys
+import os
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.src import blockchain
+from backend.src import publisher
+from backend.config import config
+
+BASE_GAS = 30000
+GAS_PER_ENTRY = 25000
+
+
+class FakeCall:
+    def __init__(self, addresses):
+        self.addresses = addresses
+
+    def estimate_gas(self, tx):
+        return BASE_GAS + GAS_PER_ENTRY * len(self.addresses)
+
+
+class FakeNode:
+    """Just enough of w3.eth and the contract for sizing weight chunks"""
+
+    def __init__(self):
+        self.account = Account
+        self.eth = self
+        self.functions = self
+
+    def batchUpdateUserWeights(self, addresses, weights):
+        return FakeCall(addresses)
+
+    def get_block(self, identifier):
+        return {'gasLimit': BASE_GAS + GAS_PER_ENTRY * 10}
+
+
+@pytest.fixture
+def node(db, monkeypatch):
+    monkeypatch.setattr(config, 'PRIVATE_KEY', Account.create().key.hex())
+    monkeypatch.setattr(config, 'WEIGHT_CHUNK_GAS_FRACTION', 1.0)
+    yield monkeypatch
+
+
+def use_node(monkeypatch, fake):
+    monkeypatch.setattr(blockchain, 'get_web3', lambda: fake)
+    monkeypatch.setattr(blockchain, 'get_contract', lambda: fake)
+
+
+def addresses(count):
+    return [Web3.to_checksum_address(f'0x{i + 1:040x}') for i in range(count)]
+
+
+def test_chunk_size_fits_gas_cap():
+    # 30k base + 25k per entry under a 1M cap: 38 entries
+    assert publisher.chunk_size_for(55000, 30000 + 25000 * 20, 20, 1000000, 500) == 38
+    assert publisher.chunk_size_for(55000, 30000 + 25000 * 20, 20, 1000000, 10) == 10
+    assert publisher.chunk_size_for(55000, 55000, 1, 10000, 500) == 1
+
+
+def test_publish_weights_queues_chunks_in_order(node):
+    use_node(node, FakeNode())
+
+    report = publisher.publish_weights(1, addresses(25), list(range(25)))
+
+    # The block fits 10 entries: 25 entries are queued as 10 + 10 + 5
+    assert [chunk['entries'] for chunk in report['chunks']] == [10, 10, 5]
+    queued = models.get_outbox_transactions(['queued'])
+    assert [tx['id'] for tx in queued] == [chunk['outbox_id'] for chunk in report['chunks']]
+    assert queued[2]['args'] == [addresses(25)[20:], list(range(20, 25))]
+    assert queued[0]['reference'] == 'weights:1:0'
+    assert queued[0]['max_retries'] == config.WEIGHT_PUBLISH_RETRIES
+
+    rows = models.get_weight_publication(1)
+    assert [(row['entries'], row['status']) for row in rows] == [(10, 'queued'), (10, 'queued'), (5, 'queued')]
+
+    # The report follows the outbox
+    models.update_outbox_transaction(report['chunks'][0]['outbox_id'], {'status': 'confirmed', 'gas_used': 123})
+    assert models.get_weight_publication(1)[0]['status'] == 'confirmed'
+    assert models.get_weight_publication(1)[0]['gas_used'] == 123
+
+
+def test_weight_deltas_skip_unchanged_and_zero_dropped():
+    alice, bob, carol, dave = addresses(4)
+    current = {alice: 50, bob: 50, carol: 0, dave: 10}
+    target = {alice: 50, bob: 30, carol: 0}
+    # Alice and Carol are unchanged, Dave dropped out and is zeroed
+    assert publisher.weight_deltas(current, target) == sorted([(bob, 30), (dave, 0)])
+    assert publisher.weight_deltas({}, {alice: 0}) == []
+
+
+def test_publish_weight_changes_sends_only_deltas(node):
+    use_node(node, FakeNode())
+    alice, bob, carol = addresses(3)
+    node.setattr(blockchain, 'get_users', lambda: [alice, carol])
+    node.setattr(blockchain, 'read_user_weights', lambda users: {alice: 60, bob: 0, carol: 40})
+
+    report = publisher.publish_weight_changes(2, [alice, bob], [60, 40])
+
+    assert report['source'] == 'chain'
+    assert report['entries'] == 2 and report['zeroed'] == 1 and report['unchanged'] == 1
+    assert [tx['args'] for tx in models.get_outbox_transactions()] == [[[bob, carol], [40, 0]]]
+
+    # Nothing changed: no transaction at all
+    node.setattr(blockchain, 'read_user_weights', lambda users: {alice: 60, bob: 40, carol: 0})
+    report = publisher.publish_weight_changes(3, [alice, bob], [60, 40])
+    assert report['entries'] == 0 and report['chunks'] == []
+    assert len(models.get_outbox_transactions()) == 1
@@ -0,0 +1,95 @@
+"""
+Tests for the per-epoch rewards snapshot taken at epoch completion and
+served by GET /api/rewards/apy.
+"""
+
+import sys
+import os
+
+import pytest
+from flask import Flask
+
+# Add the parent directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+project_dir = os.path.dirname(parent_dir)
+sys.path.append(project_dir)
+
+from backend.src import models
+from backend.src import indexer
+from backend.src import tasks
+from backend.src.routes import api_bp
+from backend.config import config
+
+ALICE = '0x209ebD2cA4d5FfF84356948D75fD73883361F49B'
+BOB = '0x7B77E94C864E7D965a6E2DD4942DE0dF7072f9F5'
+ETHER = 10 ** 18
+
+
+def reward_snapshot(block_identifier=None):
+    # 1.1 MON on a 1 MON baseline: 0.1 MON of rewards, split 70/30 by weight
+    return {
+        'block': 500,
+        'total_mon': 11 * ETHER // 10,
+        'epoch_baseline': ETHER,
+        'epoch_total_supply': ETHER,
+        'users': {
+            ALICE: {'balance': ETHER // 2, 'weight': 70},
+            BOB: {'balance': ETHER // 2, 'weight': 30},
+        }
+    }
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(indexer, 'read_reward_snapshot', reward_snapshot)
+
+    with models.db_session() as conn:
+        conn.execute(
+            'INSERT INTO user_epoch_stats (user_address, epoch_id, correct_predictions, total_predictions, weight) VALUES (?, 1, 7, 10, 70)',
+            (ALICE,)
+        )
+
+    app = Flask(__name__)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    yield app.test_client()
+
+
+def test_snapshot_is_stored_per_epoch(client):
+    columns = tasks.snapshot_epoch_rewards(1)
+    assert columns['addresses'] == [ALICE, BOB]
+    assert columns['rewards'] == [7 * ETHER // 100, 3 * ETHER // 100]
+
+    summary = models.get_epoch_reward_snapshot()
+    assert summary['epoch_id'] == 1 and summary['block_number'] == 500
+    assert summary['epoch_rewards'] == ETHER // 10 and summary['users'] == 2
+
+    rows = models.get_epoch_rewards(1, limit=10)
+    assert [row['user_address'] for row in rows] == [ALICE, BOB]
+    assert rows[0]['accuracy'] == 0.7 and rows[0]['rewards'] == 7 * ETHER // 100
+    assert rows[1]['total_predictions'] is None
+
+
+def test_rewards_endpoint_pages_and_caches(client):
+    assert client.get('/api/rewards/apy').status_code == 404
+    tasks.snapshot_epoch_rewards(1)
+
+    response = client.get('/api/rewards/apy?per_page=1&display_scale_factor=2')
+    data = response.get_json()
+    assert data['epoch_id'] == 1 and data['total_users'] == 2 and data['epoch_rewards'] == ETHER // 10
+    assert list(data['users']) == [ALICE]
+    alice = data['users'][ALICE]
+    assert alice['weight'] == 70 and alice['correct_predictions'] == 7
+    assert alice['display_apy'] == alice['annualized_apy'] * 2
+    assert response.cache_control.max_age == config.REWARDS_CACHE_SECONDS
+
+    data = client.get('/api/rewards/apy?epoch_id=1&per_page=1&page=2').get_json()
+    assert list(data['users']) == [BOB] and 'weight' not in data['users'][BOB]
+
+    # Unchanged snapshot: the ETag answers with 304
+    etag = response.headers['ETag']
+    again = client.get('/api/rewards/apy?per_page=1&display_scale_factor=2', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+
+    assert client.get('/api/rewards/apy?per_page=0').status_code == 400
+    assert client.get('/api/rewards/apy?epoch_id=2').status_code == 404
@@ -22,6 +22,7 @@ sys.path.append(project_dir)
 # Import backend modules
 from backend.src import blockchain
 from backend.src import models
+from backend.src import outbox
 from backend.config import config
 
 # Fix ABI path issue
@@ -73,9 +74,10 @@ def test_weight_update():
     
     # Update weights on the blockchain
     logger.info("Updating weights on the blockchain...")
-    success = blockchain.update_user_weights(addresses, weights)
+    outbox_id = blockchain.update_user_weights(addresses, weights)
+    tx = outbox.wait_for(outbox_id, timeout=120) if outbox_id else None
     
-    if not success:
+    if not tx or tx['status'] != 'confirmed':
         logger.error("Failed to update weights on the blockchain")
         return False
     
@@ -39,6 +39,60 @@ try:
 except ImportError as e:
     print(f"✗ backend.src.blockchain: {e}")
 
+try:
+    from backend.src import multicall
+    print("✓ backend.src.multicall")
+except ImportError as e:
+    print(f"✗ backend.src.multicall: {e}")
+
+try:
+    from backend.src import rewards
+    print("✓ backend.src.rewards")
+except ImportError as e:
+    print(f"✗ backend.src.rewards: {e}")
+
+try:
+    from backend.src import chaincache
+    print("✓ backend.src.chaincache")
+except ImportError as e:
+    print(f"✗ backend.src.chaincache: {e}")
+
+try:
+    from backend.src import indexer
+    print("✓ backend.src.indexer")
+except ImportError as e:
+    print(f"✗ backend.src.indexer: {e}")
+
+try:
+    from backend.src import publisher
+    print("✓ backend.src.publisher")
+except ImportError as e:
+    print(f"✗ backend.src.publisher: {e}")
+
+try:
+    from backend.src import outbox
+    print("✓ backend.src.outbox")
+except ImportError as e:
+    print(f"✗ backend.src.outbox: {e}")
+
+try:
+    from backend.src import lifecycle
+    print("✓ backend.src.lifecycle")
+except ImportError as e:
+    print(f"✗ backend.src.lifecycle: {e}")
+
+try:
+    from backend.src import lanes
+    print("✓ backend.src.lanes")
+except ImportError as e:
+    print(f"✗ backend.src.lanes: {e}")
+
+try:
+    from backend.src import leader
+    print("✓ backend.src.leader")
+except ImportError as e:
+    print(f"✗ backend.src.leader: {e}")
+
 try:
     from backend.src import routes
     print("✓ backend.src.routes")
@@ -51,6 +105,24 @@ try:
 except ImportError as e:
     print(f"✗ backend.src.tasks: {e}")
 
+try:
+    from backend.src import prices
+    print("✓ backend.src.prices")
+except ImportError as e:
+    print(f"✗ backend.src.prices: {e}")
+
+try:
+    from backend.src import httpclient
+    print("✓ backend.src.httpclient")
+except ImportError as e:
+    print(f"✗ backend.src.httpclient: {e}")
+
+try:
+    from backend.src import pricesources
+    print("✓ backend.src.pricesources")
+except ImportError as e:
+    print(f"✗ backend.src.pricesources: {e}")
+
 try:
     from backend.src import utils
     print("✓ backend.src.utils")